@@ -4,9 +4,10 @@ from __future__ import annotations
 
 import json
 import os
+import tempfile
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, validator
@@ -29,12 +30,29 @@ class AppSettings(BaseModel):
     transcript_dir: Path = PROJECT_ROOT / "docs" / "examples"
 
 
+class CpuInferenceProfile(BaseModel):
+    """CPU-only acceleration options for the transformers backend."""
+
+    enabled: bool = False
+    # Dynamic int8 quantization of nn.Linear layers (float32 weights only)
+    quantize_int8: bool = False
+    num_threads: Optional[int] = Field(None, ge=1, le=256)
+    num_interop_threads: Optional[int] = Field(None, ge=1, le=64)
+    attn_implementation: Literal["auto", "sdpa", "eager"] = "auto"
+    torch_compile: bool = False
+
+
 class ModelSettings(BaseModel):
     """Runtime configuration for the selected LLM backend."""
 
     provider: Literal["transformers", "ollama", "mlx", "llama.cpp", "gemini"] = "ollama"
     model_name: str = "gemma:latest"
     ollama_api_url: str = "http://localhost:11434/api/generate"
+    # How long Ollama keeps the model (and its prompt KV cache) loaded
+    ollama_keep_alive: str = "30m"
+    # Preload the model when the app starts and re-ping it in the background
+    ollama_preload: bool = True
+    ollama_keep_warm_seconds: float = Field(600.0, ge=0.0, le=86400.0)
     gemini_api_key: Optional[str] = None
     gemini_model_name: str = "gemini-2.5-flash"
     revision: Optional[str] = None
@@ -44,6 +62,19 @@ class ModelSettings(BaseModel):
     device: str = "auto"
     dtype: Literal["auto", "float32", "bfloat16", "float16"] = "auto"
     cache_dir: Path = PROJECT_ROOT / "models" / "cache"
+    # Memory budget for cached prompt-prefix KV states (transformers); 0 disables
+    kv_prefix_cache_mb: int = Field(512, ge=0, le=65536)
+    # Cross-session dynamic batching for transformers; 1 disables the batching server
+    batch_max_size: int = Field(1, ge=1, le=64)
+    batch_wait_ms: float = Field(20.0, ge=0.0, le=1000.0)
+    cpu_profile: CpuInferenceProfile = CpuInferenceProfile()
+    # llama.cpp: GGUF file (defaults to model_name when it ends with .gguf)
+    llama_model_path: Optional[Path] = None
+    llama_n_ctx: int = Field(8192, ge=512, le=131072)
+    llama_n_threads: Optional[int] = Field(None, ge=1, le=256)
+    llama_n_batch: int = Field(512, ge=1, le=8192)
+    # In-RAM prompt state cache; 0 disables it
+    llama_prompt_cache_mb: int = Field(1024, ge=0, le=65536)
 
     @validator("cache_dir", pre=True)
     def _expand_cache_dir(cls, value: Any) -> Path:  # noqa: D401
@@ -59,6 +90,165 @@ class OrchestratorSettings(BaseModel):
     default_language: str = "ru"
     allow_partial_generation: bool = True
     pdf_output_dir: Path = PROJECT_ROOT / "docs" / "examples"
+    pdf_workers: int = Field(2, ge=1, le=16)
+    pdf_cache_dir: Path = Path(tempfile.gettempdir()) / "ai_ba_agent" / "pdf"
+    pdf_cache_size: int = Field(32, ge=1, le=1024)
+    pdf_wait_seconds: float = Field(5.0, ge=0.0, le=300.0)
+    pdf_retry_seconds: float = Field(30.0, ge=0.0, le=3600.0)
+    pdf_image_dpi: int = Field(150, ge=72, le=600)
+    pdf_image_quantize: bool = False
+    pdf_large_table_rows: int = Field(30, ge=0, le=10000)
+
+
+class ProviderLimits(BaseModel):
+    """Call limits for one LLM provider; 0 means unlimited."""
+
+    requests_per_minute: int = Field(0, ge=0, le=100000)
+    tokens_per_minute: int = Field(0, ge=0, le=100000000)
+    max_in_flight: int = Field(4, ge=1, le=256)
+
+
+def _default_provider_limits() -> Dict[str, ProviderLimits]:
+    return {
+        "gemini": ProviderLimits(requests_per_minute=60, tokens_per_minute=1000000, max_in_flight=8),
+        "ollama": ProviderLimits(max_in_flight=2),
+        "transformers": ProviderLimits(max_in_flight=4),
+        "llama.cpp": ProviderLimits(max_in_flight=1),
+    }
+
+
+class GovernorSettings(BaseModel):
+    """Process-wide shaping of LLM calls across all sessions."""
+
+    enabled: bool = True
+    queue_timeout_seconds: float = Field(120.0, ge=1.0, le=3600.0)
+    # Concurrent identical requests share one provider call
+    coalesce_identical: bool = True
+    # A queued call gains one priority level per this many seconds of waiting
+    aging_seconds: float = Field(30.0, ge=1.0, le=3600.0)
+    # In-flight slots only high-priority (interactive) calls may take
+    interactive_reserve: int = Field(1, ge=0, le=64)
+    # Fair share between sessions: concurrent calls per user (0 = unlimited)
+    per_user_max_in_flight: int = Field(2, ge=0, le=256)
+    # Soft token budget per user and window; over it a user drops one priority level
+    user_token_budget: int = Field(200000, ge=0, le=100000000)
+    budget_window_seconds: float = Field(600.0, ge=10.0, le=86400.0)
+    # Relative share per user id (default 1.0)
+    user_weights: Dict[str, float] = Field(default_factory=dict)
+    providers: Dict[str, ProviderLimits] = Field(default_factory=_default_provider_limits)
+    default_limits: ProviderLimits = ProviderLimits()
+
+    def limits_for(self, provider: str) -> ProviderLimits:
+        return self.providers.get(provider, self.default_limits)
+
+
+class RoutingSettings(BaseModel):
+    """Request-time failover between providers.
+
+    ``providers`` is the ordered list of real providers to route between;
+    empty means only ``model.provider`` is used.
+    """
+
+    providers: List[str] = Field(default_factory=list)
+    # Consecutive failures that open a provider's circuit
+    failure_threshold: int = Field(3, ge=1, le=100)
+    # How long an open circuit rejects traffic before it may be probed
+    open_seconds: float = Field(30.0, ge=1.0, le=3600.0)
+    probe_interval_seconds: float = Field(15.0, ge=1.0, le=3600.0)
+    # Calls kept per provider for error rate and p95 latency
+    window: int = Field(50, ge=5, le=10000)
+
+
+class HedgingSettings(BaseModel):
+    """Duplicate slow interactive calls to cut tail latency (opt-in)."""
+
+    enabled: bool = False
+    # Call profiles (see app.core.call_context) that may be hedged
+    profiles: List[str] = Field(default_factory=lambda: ["interactive"])
+    # Hedge once a call has run longer than this percentile of recent latencies
+    percentile: float = Field(0.9, gt=0.0, lt=1.0)
+    initial_delay_seconds: float = Field(4.0, ge=0.1, le=600.0)
+    min_delay_seconds: float = Field(0.5, ge=0.0, le=600.0)
+    min_samples: int = Field(20, ge=1, le=10000)
+    window: int = Field(200, ge=10, le=100000)
+    # At most this share of recent hedgeable calls may send a duplicate
+    budget_ratio: float = Field(0.1, ge=0.0, le=1.0)
+    # Send duplicates to this provider instead of the primary one
+    backup_provider: Optional[str] = None
+
+
+def _default_task_tiers() -> Dict[str, Literal["fast", "selected"]]:
+    return {
+        "classification": "fast",
+        "extraction": "fast",
+        "merge": "fast",
+        "qa": "selected",
+        "document": "selected",
+        "general": "selected",
+    }
+
+
+class TieringSettings(BaseModel):
+    """Send cheap task classes to a fast model, documents to the selected one."""
+
+    enabled: bool = True
+    # Task class (see app.core.call_context) -> "fast" or "selected"
+    tasks: Dict[str, Literal["fast", "selected"]] = Field(default_factory=_default_task_tiers)
+    # Fast model per provider; providers without an entry use the selected model
+    fast_models: Dict[str, str] = Field(default_factory=lambda: {"gemini": "gemini-2.5-flash"})
+
+    def tier_for(self, task: str) -> str:
+        return self.tasks.get(task, "selected")
+
+
+def _default_profile_timeouts() -> Dict[str, float]:
+    return {"interactive": 60.0, "document": 300.0, "batch": 600.0}
+
+
+class TimeoutSettings(BaseModel):
+    """Adaptive LLM call timeouts and per-action deadlines."""
+
+    # Used until a provider's tokens/s has been observed
+    default_seconds: float = Field(120.0, ge=1.0, le=3600.0)
+    min_seconds: float = Field(10.0, ge=1.0, le=3600.0)
+    # Connection and prefill time added to the decode estimate
+    overhead_seconds: float = Field(5.0, ge=0.0, le=600.0)
+    # Headroom over max_new_tokens / observed tokens per second
+    safety_factor: float = Field(2.0, ge=1.0, le=20.0)
+    # Ceiling per call profile (see app.core.call_context)
+    profile_max_seconds: Dict[str, float] = Field(default_factory=_default_profile_timeouts)
+    # Deadlines for whole UI actions
+    interactive_deadline_seconds: float = Field(90.0, ge=5.0, le=3600.0)
+    document_deadline_seconds: float = Field(900.0, ge=30.0, le=7200.0)
+    render_seconds: float = Field(30.0, ge=1.0, le=600.0)
+
+    def max_for(self, profile: str) -> float:
+        return self.profile_max_seconds.get(profile, max(self.profile_max_seconds.values(), default=self.default_seconds))
+
+
+class OverloadSettings(BaseModel):
+    """Load shedding: degrade generation step by step as queues grow."""
+
+    enabled: bool = True
+    # Queued LLM calls (all providers) at which levels 1..4 start:
+    # short output, fast model, deferred diagram, rejected generations
+    llm_queue_levels: List[int] = Field(default_factory=lambda: [4, 8, 12, 20])
+    # Queued and running PDF builds at which the same levels start
+    render_queue_levels: List[int] = Field(default_factory=lambda: [4, 8, 12, 16])
+    # Share of max_new_tokens left to document and QA calls under load
+    short_output_ratio: float = Field(0.5, gt=0.0, le=1.0)
+    short_output_tasks: List[str] = Field(default_factory=lambda: ["document", "qa"])
+    # Pressure must stay below a level this long before stepping down one level
+    hold_seconds: float = Field(30.0, ge=0.0, le=3600.0)
+    retry_after_seconds: float = Field(60.0, ge=1.0, le=3600.0)
+
+
+class PregenerationSettings(BaseModel):
+    """Speculative document generation once the dialog state is complete."""
+
+    enabled: bool = True
+    # Background jobs running at once across all sessions
+    workers: int = Field(2, ge=1, le=32)
 
 
 class Settings(BaseModel):
@@ -68,6 +258,13 @@ class Settings(BaseModel):
     app: AppSettings = AppSettings()
     model: ModelSettings = ModelSettings()
     orchestrator: OrchestratorSettings = OrchestratorSettings()
+    governor: GovernorSettings = GovernorSettings()
+    routing: RoutingSettings = RoutingSettings()
+    hedging: HedgingSettings = HedgingSettings()
+    tiering: TieringSettings = TieringSettings()
+    timeouts: TimeoutSettings = TimeoutSettings()
+    overload: OverloadSettings = OverloadSettings()
+    pregeneration: PregenerationSettings = PregenerationSettings()
 
 
 def _load_model_config_from_disk() -> Dict[str, Any]:
@@ -91,7 +288,9 @@ def _settings_from_env() -> Dict[str, Any]:
         "AI_BA_MODEL_TEMPERATURE": "temperature",
         "AI_BA_MODEL_MAX_NEW_TOKENS": "max_new_tokens",
         "AI_BA_OLLAMA_URL": "ollama_api_url",
+        "AI_BA_OLLAMA_KEEP_ALIVE": "ollama_keep_alive",
         "AI_BA_GEMINI_API_KEY": "gemini_api_key",
+        "AI_BA_LLAMA_MODEL_PATH": "llama_model_path",
     }
 
     for env_key, field_name in env_map.items():
@@ -108,6 +307,16 @@ def _settings_from_env() -> Dict[str, Any]:
     if model_overrides:
         overrides["model"] = model_overrides
 
+    pdf_workers = os.getenv("AI_BA_PDF_WORKERS")
+    if pdf_workers is not None:
+        overrides.setdefault("orchestrator", {})["pdf_workers"] = int(pdf_workers)
+
+    fallback_providers = os.getenv("AI_BA_FALLBACK_PROVIDERS")
+    if fallback_providers is not None:
+        overrides.setdefault("routing", {})["providers"] = [
+            name.strip() for name in fallback_providers.split(",") if name.strip()
+        ]
+
     app_debug = os.getenv("AI_BA_DEBUG")
     if app_debug is not None:
         overrides.setdefault("app", {})["debug"] = app_debug.lower() in {"1", "true", "yes"}
@@ -135,6 +344,14 @@ def get_settings() -> Settings:
             # Обычное обновление для не-словарей
             merged[key] = value
 
+    # AI_BA_FAST_MODEL applies to the provider in use, which may come from the file config
+    fast_model = os.getenv("AI_BA_FAST_MODEL")
+    if fast_model is not None:
+        provider = merged.get("model", {}).get("provider", ModelSettings().provider)
+        tiering = merged.setdefault("tiering", {})
+        fast_models = {**TieringSettings().fast_models, **tiering.get("fast_models", {})}
+        tiering["fast_models"] = {**fast_models, provider: fast_model}
+
     return Settings(**merged)
 
 
@@ -0,0 +1,178 @@
+"""Per-call metadata that travels with an LLM request.
+
+UI and dialog code describe *what kind* of call they are making (an
+interactive dialog turn or a document; a classification or an extraction) with
+``call_context(...)``; engine wrappers read ``current_call()`` to decide how
+to treat it. The value lives in a ``contextvars.ContextVar``, so it follows
+the call into threads started with ``run_in_context``.
+
+A context may carry a deadline (``deadline_after``) and a cancel event.
+Long operations call ``check_deadline()`` between steps, and engines size
+their I/O timeouts from ``remaining_time()``, so a call that can no longer
+finish in time fails fast instead of holding a slot. ``max_new_tokens``
+caps the generated output of calls made under load (``output_limit``).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Iterator, Optional
+
+PROFILE_INTERACTIVE = "interactive"
+PROFILE_DOCUMENT = "document"
+PROFILE_BATCH = "batch"
+
+# Scheduling priorities, lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+_PROFILE_PRIORITY = {
+    PROFILE_INTERACTIVE: PRIORITY_HIGH,
+    PROFILE_DOCUMENT: PRIORITY_NORMAL,
+    PROFILE_BATCH: PRIORITY_LOW,
+}
+
+# Task classes, used to pick the model tier
+TASK_CLASSIFICATION = "classification"
+TASK_EXTRACTION = "extraction"
+TASK_MERGE = "merge"
+TASK_QA = "qa"
+TASK_DOCUMENT = "document"
+TASK_GENERAL = "general"
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's deadline passed before it could finish."""
+
+
+class CallCancelled(RuntimeError):
+    """The call was cancelled through its cancel event."""
+
+
+@dataclass(frozen=True)
+class CallContext:
+    profile: str = PROFILE_DOCUMENT
+    task: str = TASK_GENERAL
+    # Streamlit session (or user) the call is made for, for fair sharing
+    user: str = "anonymous"
+    # Called with the number of calls ahead while the call waits in a queue
+    on_queued: Optional[Callable[[int], None]] = None
+    # Absolute time.monotonic() deadline
+    deadline: Optional[float] = None
+    cancel: Optional[threading.Event] = None
+    # Cap on generated tokens, set when the overload controller shortens output
+    max_new_tokens: Optional[int] = None
+    # Set when a user starts waiting for a background call: it then runs no
+    # lower than document priority
+    promoted: Optional[threading.Event] = None
+
+    @property
+    def priority(self) -> int:
+        priority = _PROFILE_PRIORITY.get(self.profile, PRIORITY_NORMAL)
+        if self.promoted is not None and self.promoted.is_set():
+            return min(priority, PRIORITY_NORMAL)
+        return priority
+
+
+_current: contextvars.ContextVar[CallContext] = contextvars.ContextVar("llm_call_context", default=CallContext())
+
+
+def current_call() -> CallContext:
+    return _current.get()
+
+
+@contextmanager
+def call_context(**changes: Any) -> Iterator[CallContext]:
+    """Override fields of the current context for the duration of the block."""
+    context = replace(_current.get(), **changes)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def deadline_after(seconds: float) -> Iterator[CallContext]:
+    """Give the block ``seconds`` to finish; never extends an outer deadline."""
+    deadline = time.monotonic() + seconds
+    outer = _current.get().deadline
+    with call_context(deadline=deadline if outer is None else min(outer, deadline)) as context:
+        yield context
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds until the current deadline, None without one."""
+    deadline = _current.get().deadline
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raise if the current call was cancelled or its deadline has passed."""
+    context = _current.get()
+    if context.cancel is not None and context.cancel.is_set():
+        raise CallCancelled("LLM call cancelled")
+    if context.deadline is not None and time.monotonic() >= context.deadline:
+        raise DeadlineExceeded("LLM call deadline exceeded")
+
+
+class _ChildEvent(threading.Event):
+    """Set on its own or while its parent is set; consumers poll ``is_set``."""
+
+    def __init__(self, parent: Optional[threading.Event]):
+        super().__init__()
+        self._parent = parent
+
+    def is_set(self) -> bool:
+        return super().is_set() or (self._parent is not None and self._parent.is_set())
+
+
+def child_cancel() -> threading.Event:
+    """Cancel event for a sub-call: setting it spares the caller, cancelling the caller stops it."""
+    return _ChildEvent(_current.get().cancel)
+
+
+def output_limit(default: int) -> int:
+    """``default`` capped by the current context's ``max_new_tokens``."""
+    limit = _current.get().max_new_tokens
+    return default if limit is None else min(default, limit)
+
+
+def run_in_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind ``fn`` to a copy of the caller's context, for use in another thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+__all__ = [
+    "CallCancelled",
+    "CallContext",
+    "DeadlineExceeded",
+    "PROFILE_BATCH",
+    "PROFILE_DOCUMENT",
+    "PROFILE_INTERACTIVE",
+    "PRIORITY_HIGH",
+    "PRIORITY_LOW",
+    "PRIORITY_NAMES",
+    "PRIORITY_NORMAL",
+    "TASK_CLASSIFICATION",
+    "TASK_DOCUMENT",
+    "TASK_EXTRACTION",
+    "TASK_GENERAL",
+    "TASK_MERGE",
+    "TASK_QA",
+    "call_context",
+    "check_deadline",
+    "child_cancel",
+    "current_call",
+    "deadline_after",
+    "output_limit",
+    "remaining_time",
+    "run_in_context",
+]
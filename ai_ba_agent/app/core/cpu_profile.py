@@ -0,0 +1,100 @@
+"""CPU inference profile for the transformers backend.
+
+Applies ``ModelSettings.cpu_profile``: intra/inter-op thread counts, the
+attention implementation, dynamic int8 quantization of linear layers and
+``torch.compile``. Unsupported combinations are rejected at load time with a
+``ValueError`` instead of failing on the first request.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from app.config import CpuInferenceProfile, ModelSettings
+from app.utils.logger import logger
+
+
+def validate_cpu_profile(model_cfg: ModelSettings) -> List[str]:
+    """Return human-readable problems with the profile in this environment."""
+    import torch
+
+    profile = model_cfg.cpu_profile
+    problems: List[str] = []
+    if not profile.enabled:
+        return problems
+
+    if model_cfg.device not in ("cpu", "auto"):
+        problems.append(f"cpu_profile requires device 'cpu' or 'auto', got '{model_cfg.device}'")
+    if profile.quantize_int8:
+        if model_cfg.dtype not in ("auto", "float32"):
+            problems.append("quantize_int8 needs float32 weights, set dtype to 'auto' or 'float32'")
+        engines = [engine for engine in torch.backends.quantized.supported_engines if engine != "none"]
+        if not engines:
+            problems.append("this torch build has no quantized engine (fbgemm/qnnpack/x86)")
+    if profile.attn_implementation == "sdpa" and not hasattr(torch.nn.functional, "scaled_dot_product_attention"):
+        problems.append("attn_implementation 'sdpa' needs torch>=2.0")
+    if profile.torch_compile:
+        if not hasattr(torch, "compile"):
+            problems.append("torch_compile needs torch>=2.0")
+        if profile.quantize_int8:
+            problems.append("torch_compile does not support dynamically quantized modules, pick one")
+    return problems
+
+
+def apply_thread_settings(profile: CpuInferenceProfile) -> None:
+    """Set torch thread pools; must run before the first parallel op."""
+    import torch
+
+    if profile.num_threads:
+        torch.set_num_threads(profile.num_threads)
+    if profile.num_interop_threads:
+        try:
+            torch.set_num_interop_threads(profile.num_interop_threads)
+        except RuntimeError as exc:
+            # Only settable once per process, before inter-op work started
+            logger.warning("Could not set inter-op threads: %s", exc)
+    logger.info(
+        "CPU threads: intra-op %s, inter-op %s",
+        torch.get_num_threads(), torch.get_num_interop_threads(),
+    )
+
+
+def loading_kwargs(profile: CpuInferenceProfile) -> Dict[str, Any]:
+    """Extra ``from_pretrained`` arguments for the profile."""
+    if profile.enabled and profile.attn_implementation != "auto":
+        return {"attn_implementation": profile.attn_implementation}
+    return {}
+
+
+def optimize_model(model: Any, profile: CpuInferenceProfile) -> Any:
+    """Quantize and/or compile a loaded model according to the profile."""
+    import torch
+
+    if not profile.enabled:
+        return model
+    if profile.quantize_int8:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info("Applied dynamic int8 quantization to linear layers")
+    if profile.torch_compile:
+        model.forward = torch.compile(model.forward, dynamic=True)
+        logger.info("Wrapped model.forward with torch.compile")
+    return model
+
+
+def prepare_cpu_profile(model_cfg: ModelSettings) -> None:
+    """Validate the profile and apply process-level settings before loading."""
+    if not model_cfg.cpu_profile.enabled:
+        return
+    problems = validate_cpu_profile(model_cfg)
+    if problems:
+        raise ValueError("Unsupported CPU inference profile: " + "; ".join(problems))
+    apply_thread_settings(model_cfg.cpu_profile)
+
+
+__all__ = [
+    "apply_thread_settings",
+    "loading_kwargs",
+    "optimize_model",
+    "prepare_cpu_profile",
+    "validate_cpu_profile",
+]
@@ -0,0 +1,494 @@
+"""Process-wide governor for LLM calls.
+
+Every Streamlit session shares one ``LLMGovernor``. Per provider it enforces
+token buckets for requests and tokens per minute and a cap on concurrent
+calls; callers over the limits wait in a queue until capacity frees up or
+their queue deadline passes. Load is shaped instead of failing on provider
+quota errors. Counters (queue depth, in flight, throttle events, timeouts)
+are exposed for the UI.
+
+The queue is priority-aware: interactive calls go before document
+generation, which goes before batch work (see ``CallContext.priority``).
+Waiting calls age one level per ``aging_seconds`` so low priorities are not
+starved, and ``interactive_reserve`` in-flight slots are kept free for
+high-priority calls. Within a priority level, users are served in weighted
+fair order: the user with the least recent token usage per weight goes
+first. Each user has a cap on concurrent calls, and a soft token budget per
+window; once over budget, the user's calls drop one priority level.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.config import GovernorSettings, ProviderLimits, settings
+from app.core.call_context import (
+    PRIORITY_HIGH,
+    PRIORITY_NAMES,
+    PRIORITY_NORMAL,
+    CallCancelled,
+    check_deadline,
+    current_call,
+    remaining_time,
+)
+from app.core.llm_engine import LLMEngine
+from app.core.prompt_builder import Prompt, estimate_tokens
+from app.utils.logger import logger
+
+Clock = Callable[[], float]
+
+# Queue wait samples kept per priority for the p95 metric
+WAIT_WINDOW = 200
+# How often a queued call with a cancel event checks it
+CANCEL_POLL_SECONDS = 0.25
+
+
+class LLMQueueTimeout(RuntimeError):
+    """The call did not get a slot before its queue deadline."""
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units evenly over a minute; may go into debt."""
+
+    def __init__(self, per_minute: int, clock: Clock = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available (0 if they are now)."""
+        self._refill()
+        # Requests bigger than the bucket pass once it is full
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+
+class UserUsage:
+    """Sliding-window token usage per user, shared by all provider governors."""
+
+    def __init__(
+        self,
+        window_seconds: float = 600.0,
+        token_budget: int = 0,
+        weights: Optional[Dict[str, float]] = None,
+        clock: Clock = time.monotonic,
+    ):
+        self.window_seconds = window_seconds
+        self.token_budget = token_budget
+        self.weights = weights or {}
+        self._clock = clock
+        self._events: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._totals: Dict[str, int] = {}
+        self._swept_at = clock()
+        self._lock = threading.Lock()
+
+    def _prune(self, user: str, now: float) -> None:
+        events = self._events.get(user)
+        while events and now - events[0][0] > self.window_seconds:
+            self._totals[user] -= events.popleft()[1]
+        if user in self._events and not events:
+            # Sessions come and go; forget users whose window is empty
+            del self._events[user]
+            del self._totals[user]
+
+    def record(self, user: str, tokens: int) -> None:
+        with self._lock:
+            now = self._clock()
+            if now - self._swept_at > self.window_seconds:
+                self._swept_at = now
+                for other in list(self._events):
+                    self._prune(other, now)
+            self._events.setdefault(user, deque()).append((now, tokens))
+            self._totals[user] = self._totals.get(user, 0) + tokens
+
+    def used(self, user: str) -> int:
+        with self._lock:
+            self._prune(user, self._clock())
+            return self._totals.get(user, 0)
+
+    def share(self, user: str) -> float:
+        """Usage normalised by the user's weight; lower is served first."""
+        return self.used(user) / self.weights.get(user, 1.0)
+
+    def over_budget(self, user: str) -> bool:
+        return bool(self.token_budget) and self.used(user) > self.token_budget
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            users = list(self._events)
+        return {user: self.used(user) for user in users}
+
+
+@dataclass(eq=False)
+class Ticket:
+    """A queued or admitted call; ``completion_tokens`` is settled on release."""
+
+    tokens: int
+    enqueued_at: float
+    priority: int = PRIORITY_NORMAL
+    user: str = "anonymous"
+    completion_tokens: int = 0
+    # See CallContext.promoted: lifts a queued background call to document priority
+    promoted: Optional[threading.Event] = None
+
+    @property
+    def current_priority(self) -> int:
+        if self.promoted is not None and self.promoted.is_set():
+            return min(self.priority, PRIORITY_NORMAL)
+        return self.priority
+
+
+class ProviderGovernor:
+    """Token buckets, in-flight cap and wait queue for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        limits: ProviderLimits,
+        clock: Clock = time.monotonic,
+        aging_seconds: float = 30.0,
+        interactive_reserve: int = 0,
+        per_user_max_in_flight: int = 0,
+        usage: Optional[UserUsage] = None,
+    ):
+        self.name = name
+        self.limits = limits
+        self.aging_seconds = aging_seconds
+        self.per_user_max_in_flight = per_user_max_in_flight
+        self.usage = usage or UserUsage(clock=clock)
+        # Never reserve every slot, low priorities must still make progress
+        self.interactive_reserve = min(interactive_reserve, limits.max_in_flight - 1)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._waiting: List[Ticket] = []
+        self._requests = TokenBucket(limits.requests_per_minute, clock) if limits.requests_per_minute else None
+        self._tokens = TokenBucket(limits.tokens_per_minute, clock) if limits.tokens_per_minute else None
+        self.in_flight = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.timed_out = 0
+        self._waits: Dict[int, Deque[float]] = {priority: deque(maxlen=WAIT_WINDOW) for priority in PRIORITY_NAMES}
+        self._user_in_flight: Dict[str, int] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def _effective_priority(self, ticket: Ticket, now: float) -> float:
+        return ticket.current_priority - (now - ticket.enqueued_at) / self.aging_seconds
+
+    def _order_key(self, ticket: Ticket, now: float) -> Tuple[int, float, float]:
+        """Priority level (aged, demoted over budget), then fair share, then arrival."""
+        level = math.ceil(self._effective_priority(ticket, now))
+        if self.usage.over_budget(ticket.user):
+            level += 1
+        return level, self.usage.share(ticket.user), ticket.enqueued_at
+
+    def _slot_limit(self, ticket: Ticket) -> int:
+        # Aging orders the queue but never opens the reserve to non-interactive calls
+        if ticket.priority > PRIORITY_HIGH:
+            return self.limits.max_in_flight - self.interactive_reserve
+        return self.limits.max_in_flight
+
+    def _eligible(self, ticket: Ticket) -> bool:
+        """Whether a slot is free for ``ticket``; only eligible tickets can be next.
+
+        A ticket kept out by the interactive reserve or its user's cap must not
+        hold up tickets behind it that could run.
+        """
+        if self.in_flight >= self._slot_limit(ticket):
+            return False
+        if not self.per_user_max_in_flight:
+            return True
+        return self._user_in_flight.get(ticket.user, 0) < self.per_user_max_in_flight
+
+    def _next_ticket(self) -> Optional[Ticket]:
+        now = self._clock()
+        candidates = [ticket for ticket in self._waiting if self._eligible(ticket)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda ticket: self._order_key(ticket, now))
+
+    def _calls_ahead(self, ticket: Ticket) -> int:
+        now = self._clock()
+        own = self._order_key(ticket, now)
+        return sum(1 for other in self._waiting if other is not ticket and self._order_key(other, now) < own)
+
+    def _admission_wait(self, ticket: Ticket) -> Optional[float]:
+        """0 to admit now, seconds to wait for the buckets, None to wait for a release."""
+        if self._next_ticket() is not ticket:
+            return None
+        waits = [0.0]
+        if self._requests is not None:
+            waits.append(self._requests.wait_time(1))
+        if self._tokens is not None:
+            waits.append(self._tokens.wait_time(ticket.tokens))
+        return max(waits)
+
+    def acquire(
+        self,
+        tokens: int,
+        timeout: float,
+        priority: int = PRIORITY_NORMAL,
+        user: str = "anonymous",
+        on_queued: Optional[Callable[[int], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        promoted: Optional[threading.Event] = None,
+    ) -> Ticket:
+        ticket = Ticket(tokens, self._clock(), priority, user, promoted=promoted)
+        deadline = ticket.enqueued_at + timeout
+        with self._cond:
+            self._waiting.append(ticket)
+            # Queued callers re-check their place, a newcomer may sort ahead of them
+            self._cond.notify_all()
+            waited = False
+            was_next = False
+            reported: Optional[int] = None
+            try:
+                while True:
+                    is_next = self._next_ticket() is ticket
+                    if was_next and not is_next:
+                        # Aging promoted another ticket while this one slept on a bucket
+                        self._cond.notify_all()
+                    was_next = is_next
+                    wait = self._admission_wait(ticket)
+                    if wait == 0:
+                        break
+                    if not waited:
+                        waited = True
+                        self.throttled += 1
+                    if on_queued is not None:
+                        ahead = self._calls_ahead(ticket)
+                        if ahead != reported:
+                            reported = ahead
+                            # The callback writes to the UI; never hold the provider lock meanwhile
+                            self._cond.release()
+                            try:
+                                on_queued(ahead)
+                            finally:
+                                self._cond.acquire()
+                            # A release may have been signalled while unlocked: re-check
+                            continue
+                    if cancel is not None and cancel.is_set():
+                        raise CallCancelled(f"{self.name}: cancelled while queued")
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise LLMQueueTimeout(
+                            f"{self.name}: no LLM capacity within {timeout:.0f}s "
+                            f"({self.queue_depth} queued, {self.in_flight} in flight)"
+                        )
+                    sleep = remaining if wait is None else min(wait, remaining)
+                    if cancel is not None:
+                        sleep = min(sleep, CANCEL_POLL_SECONDS)
+                    self._cond.wait(sleep)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+            self.in_flight += 1
+            self.admitted += 1
+            self._user_in_flight[user] = self._user_in_flight.get(user, 0) + 1
+            self._waits[ticket.current_priority].append(self._clock() - ticket.enqueued_at)
+            self.usage.record(user, tokens)
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._user_in_flight[ticket.user] -= 1
+            if not self._user_in_flight[ticket.user]:
+                del self._user_in_flight[ticket.user]
+            if ticket.completion_tokens:
+                self.usage.record(ticket.user, ticket.completion_tokens)
+                if self._tokens is not None:
+                    self._tokens.take(ticket.completion_tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(
+        self,
+        tokens: int,
+        timeout: float,
+        priority: int = PRIORITY_NORMAL,
+        user: str = "anonymous",
+        on_queued: Optional[Callable[[int], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        promoted: Optional[threading.Event] = None,
+    ) -> Iterator[Ticket]:
+        ticket = self.acquire(tokens, timeout, priority, user, on_queued, cancel, promoted)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for ticket in self._waiting:
+                queued[PRIORITY_NAMES[ticket.current_priority]] += 1
+            wait_p95 = {
+                PRIORITY_NAMES[priority]: _p95(samples) for priority, samples in self._waits.items()
+            }
+            return {
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "timed_out": self.timed_out,
+                "queued_by_priority": queued,
+                "wait_p95_by_priority": wait_p95,
+            }
+
+
+def _p95(samples: Deque[float]) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+class LLMGovernor:
+    """Registry of ``ProviderGovernor`` objects, one per provider."""
+
+    def __init__(self, config: GovernorSettings, clock: Clock = time.monotonic):
+        self.config = config
+        self._clock = clock
+        self.usage = UserUsage(config.budget_window_seconds, config.user_token_budget, config.user_weights, clock)
+        self._providers: Dict[str, ProviderGovernor] = {}
+        self._lock = threading.Lock()
+
+    def for_provider(self, provider: str) -> ProviderGovernor:
+        with self._lock:
+            governor = self._providers.get(provider)
+            if governor is None:
+                governor = ProviderGovernor(
+                    provider,
+                    self.config.limits_for(provider),
+                    self._clock,
+                    aging_seconds=self.config.aging_seconds,
+                    interactive_reserve=self.config.interactive_reserve,
+                    per_user_max_in_flight=self.config.per_user_max_in_flight,
+                    usage=self.usage,
+                )
+                self._providers[provider] = governor
+            return governor
+
+    def queue_depth(self) -> int:
+        """Calls waiting for a slot across all providers."""
+        with self._lock:
+            providers = list(self._providers.values())
+        return sum(governor.queue_depth for governor in providers)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = dict(self._providers)
+        return {name: governor.snapshot() for name, governor in providers.items()}
+
+
+@lru_cache(maxsize=1)
+def get_governor() -> LLMGovernor:
+    return LLMGovernor(settings.governor)
+
+
+class GovernedEngine(LLMEngine):
+    """Runs every call of ``engine`` through the provider's governor slot."""
+
+    def __init__(self, engine: LLMEngine, provider: str, governor: Optional[LLMGovernor] = None):
+        self.engine = engine
+        self.provider = provider
+        self.governor = governor or get_governor()
+
+    def __getattr__(self, name: str) -> Any:
+        # Provider-specific attributes (last_stats, stream, model_name, ...)
+        return getattr(self.engine, name)
+
+    @contextmanager
+    def _slot(self, text: str) -> Iterator[Ticket]:
+        provider_governor = self.governor.for_provider(self.provider)
+        check_deadline()
+        timeout = self.governor.config.queue_timeout_seconds
+        remaining = remaining_time()
+        if remaining is not None:
+            # Do not wait in the queue for a slot the call could not use in time
+            timeout = min(timeout, remaining)
+        context = current_call()
+        with provider_governor.slot(
+            estimate_tokens(text),
+            timeout,
+            context.priority,
+            context.user,
+            context.on_queued,
+            context.cancel,
+            context.promoted,
+        ) as ticket:
+            waited = self.governor._clock() - ticket.enqueued_at
+            if waited > 1.0:
+                logger.info("LLM call to %s waited %.1fs in the governor queue", self.provider, waited)
+            yield ticket
+
+    def _governed(self, text: str, call: Callable[[], str]) -> str:
+        with self._slot(text) as ticket:
+            result = call()
+            ticket.completion_tokens = estimate_tokens(result)
+            return result
+
+    def ask(self, prompt: str) -> str:
+        return self._governed(prompt, lambda: self.engine.ask(prompt))
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        return self._governed(prompt.text, lambda: self.engine.ask_prompt(prompt))
+
+    def stream(self, prompt: str, *args: Any, **kwargs: Any) -> Iterator[str]:
+        """``engine.stream`` holding a slot until the stream ends or is closed."""
+        # Not part of LLMEngine: only some engines stream (llama.cpp)
+        engine_stream: Callable[..., Iterator[str]] = getattr(self.engine, "stream")
+        with self._slot(prompt) as ticket:
+            chunks: List[str] = []
+            try:
+                for chunk in engine_stream(prompt, *args, **kwargs):
+                    chunks.append(chunk)
+                    yield chunk
+            finally:
+                # Charge what was generated, also for an abandoned stream
+                if chunks:
+                    ticket.completion_tokens = estimate_tokens("".join(chunks))
+
+    def warm_up(self) -> None:
+        self.engine.warm_up()
+
+
+__all__ = [
+    "GovernedEngine",
+    "LLMGovernor",
+    "LLMQueueTimeout",
+    "ProviderGovernor",
+    "TokenBucket",
+    "UserUsage",
+    "estimate_tokens",
+    "get_governor",
+]
@@ -0,0 +1,207 @@
+"""Hedged requests for interactive LLM calls.
+
+Dialog turns are short, but a small share of provider calls take many times
+the median. For call profiles listed in ``settings.hedging.profiles``,
+``HedgedEngine`` starts the call in a worker thread; if it has not finished
+after the observed p90 latency of that profile, a duplicate is sent (to the
+same engine or to ``backup_provider``) and whichever answers first wins.
+Each attempt runs in its own thread with its own cancel event, set for the
+loser so it leaves the governor queue or stops between generation steps. A
+loser already waiting on a Gemini or Ollama HTTP response cannot be
+interrupted: it runs to completion and keeps its governor slot until then.
+Queue callbacks of the attempts are passed back to the calling thread, so
+UI callbacks run where the Streamlit script context is. A budget keeps
+duplicates to ``budget_ratio`` of recent hedgeable calls.
+"""
+
+from __future__ import annotations
+
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Optional, Set
+
+from app.config import HedgingSettings, settings
+from app.core.call_context import call_context, child_cancel, current_call, run_in_context
+from app.core.llm_engine import LLMEngine
+from app.core.prompt_builder import Prompt
+from app.utils.logger import logger
+
+
+class HedgePolicy:
+    """Process-wide latency history, hedge delay and duplicate budget."""
+
+    def __init__(self, config: HedgingSettings):
+        self.config = config
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._recent: Deque[bool] = deque(maxlen=config.window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def applies_to(self, profile: str) -> bool:
+        return self.config.enabled and profile in self.config.profiles
+
+    def delay(self, profile: str) -> float:
+        """Seconds to wait for the primary call before hedging."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(profile, ()))
+        if len(latencies) < self.config.min_samples:
+            return self.config.initial_delay_seconds
+        index = min(len(latencies) - 1, math.ceil(self.config.percentile * len(latencies)) - 1)
+        return max(self.config.min_delay_seconds, latencies[index])
+
+    def try_hedge(self) -> bool:
+        with self._lock:
+            spent = sum(self._recent)
+            if spent + 1 > self.config.budget_ratio * (len(self._recent) + 1):
+                return False
+            self.hedged += 1
+            return True
+
+    def record(self, profile: str, latency: float, hedged: bool, hedge_won: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.hedge_wins += int(hedge_won)
+            self._recent.append(hedged)
+            self._latencies.setdefault(profile, deque(maxlen=self.config.window)).append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "hedged": self.hedged, "hedge_wins": self.hedge_wins}
+
+
+@lru_cache(maxsize=1)
+def get_hedge_policy() -> HedgePolicy:
+    return HedgePolicy(settings.hedging)
+
+
+class HedgedEngine(LLMEngine):
+    """Sends a duplicate of slow hedgeable calls and returns the first answer."""
+
+    def __init__(
+        self,
+        engine: LLMEngine,
+        backup: Optional[LLMEngine] = None,
+        policy: Optional[HedgePolicy] = None,
+    ):
+        self.engine = engine
+        self.backup = backup or engine
+        self.policy = policy or get_hedge_policy()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.engine, name)
+
+    @staticmethod
+    def _attempt(
+        call: Callable[[LLMEngine], str],
+        engine: LLMEngine,
+        cancels: Dict[Future, threading.Event],
+        updates: queue.Queue[Optional[int]],
+    ) -> Future:
+        """Start ``call`` in its own thread, never behind other calls in a pool.
+
+        ``updates`` gets the attempt's queue positions, and None once it finished.
+        """
+        cancel = child_cancel()
+        changes: Dict[str, Any] = {"cancel": cancel}
+        if current_call().on_queued is not None:
+            changes["on_queued"] = updates.put
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+
+        def run() -> None:
+            with call_context(**changes):
+                try:
+                    result = call(engine)
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+
+        future.add_done_callback(lambda _: updates.put(None))
+        threading.Thread(target=run_in_context(run), name="llm-hedge", daemon=True).start()
+        cancels[future] = cancel
+        return future
+
+    @staticmethod
+    def _wait(
+        ready: Callable[[], bool], updates: queue.Queue[Optional[int]], timeout: Optional[float] = None
+    ) -> None:
+        """Block until ``ready()`` or ``timeout``, running queue callbacks on this thread."""
+        on_queued = current_call().on_queued
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Report positions queued before the attempt finished, too
+            done = ready()
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                ahead = updates.get(block=not done and remaining != 0, timeout=remaining)
+            except queue.Empty:
+                return
+            if ahead is not None and on_queued is not None:
+                on_queued(ahead)
+
+    def _hedged(self, call: Callable[[LLMEngine], str]) -> str:
+        profile = current_call().profile
+        if not self.policy.applies_to(profile):
+            return call(self.engine)
+
+        started = time.perf_counter()
+        cancels: Dict[Future, threading.Event] = {}
+        updates: queue.Queue[Optional[int]] = queue.Queue()
+        primary = self._attempt(call, self.engine, cancels, updates)
+        self._wait(primary.done, updates, timeout=self.policy.delay(profile))
+        if primary.done() or not self.policy.try_hedge():
+            self._wait(primary.done, updates)
+            result = primary.result()
+            self.policy.record(profile, time.perf_counter() - started, hedged=False, hedge_won=False)
+            return result
+
+        logger.debug("Hedging %s call after %.2fs", profile, time.perf_counter() - started)
+        hedge = self._attempt(call, self.backup, cancels, updates)
+        pending: Set[Future] = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            self._wait(lambda: any(future.done() for future in pending), updates)
+            done = {future for future in pending if future.done()}
+            pending -= done
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return self._finish(future, hedge, pending, cancels, profile, started)
+        assert error is not None
+        raise error
+
+    def _finish(
+        self,
+        winner: Future,
+        hedge: Future,
+        pending: Set[Future],
+        cancels: Dict[Future, threading.Event],
+        profile: str,
+        started: float,
+    ) -> str:
+        for future in pending:
+            # Stops the loser while it is queued or between steps; an HTTP call
+            # already sent runs to completion
+            cancels[future].set()
+        self.policy.record(profile, time.perf_counter() - started, hedged=True, hedge_won=winner is hedge)
+        return winner.result()
+
+    def ask(self, prompt: str) -> str:
+        return self._hedged(lambda engine: engine.ask(prompt))
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        return self._hedged(lambda engine: engine.ask_prompt(prompt))
+
+    def warm_up(self) -> None:
+        self.engine.warm_up()
+
+
+__all__ = ["HedgePolicy", "HedgedEngine", "get_hedge_policy"]
@@ -0,0 +1,189 @@
+"""In-process dynamic batching for local model inference.
+
+All sessions submit prompts to one queue; a single worker thread groups the
+requests that arrive within ``max_wait_ms`` of each other into batches of up
+to ``max_batch_size`` and runs them through one ``generate_batch`` call on
+the shared model. Callers get a ``Future`` per prompt.
+
+Each request may carry its own output cap and deadline. Only requests with
+the same cap share a batch; others wait for a later batch. A batch runs until
+the earliest deadline among its requests. When that limit stops generation,
+only the requests whose own deadline has passed fail with
+``DeadlineExceeded``; the rest are queued again for the next batch.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, List, Optional
+
+from app.core.call_context import DeadlineExceeded
+from app.utils.logger import logger
+
+
+@dataclass(frozen=True)
+class BatchLimits:
+    """Limits one batch runs under; None means no limit."""
+
+    max_new_tokens: Optional[int] = None
+    max_seconds: Optional[float] = None
+
+
+# prompts, limits -> one result per prompt, same order; raises DeadlineExceeded
+# when ``max_seconds`` stopped generation
+BatchGenerator = Callable[[List[str], BatchLimits], List[Any]]
+
+
+@dataclass
+class _Request:
+    prompt: str
+    max_new_tokens: Optional[int] = None
+    # Absolute time.monotonic() deadline
+    deadline: Optional[float] = None
+    future: Future = field(default_factory=Future)
+
+
+    def expired(self, now: float) -> bool:
+        return self.deadline is not None and self.deadline <= now
+
+
+def _batch_limits(batch: List[_Request], now: float) -> BatchLimits:
+    """The batch's shared cap and the time until its earliest deadline."""
+    deadlines = [request.deadline for request in batch if request.deadline is not None]
+    return BatchLimits(
+        max_new_tokens=batch[0].max_new_tokens,
+        max_seconds=min(deadlines) - now if deadlines else None,
+    )
+
+
+class BatchingInferenceServer:
+    """Queue + worker thread that batches prompts for ``generate_batch``."""
+
+    def __init__(self, generate_batch: BatchGenerator, max_batch_size: int = 4, max_wait_ms: float = 20.0):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches_run = 0
+        self.requests_served = 0
+        self.largest_batch = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        # Taken from the queue but not served yet: held back by a different
+        # cap, or queued again after a batch stopped at another request's deadline
+        self._pending: Deque[_Request] = deque()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._loop, name="inference-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(
+        self, prompt: str, max_new_tokens: Optional[int] = None, max_seconds: Optional[float] = None
+    ) -> Future:
+        """Queue ``prompt``; ``max_seconds`` counts from now and includes the queue wait."""
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        request = _Request(prompt, max_new_tokens, deadline)
+        self._queue.put(request)
+        return request.future
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+
+    def _next(self, timeout: Optional[float] = None) -> Optional[_Request]:
+        """Next pending or queued request; None on shutdown or timeout."""
+        if self._pending:
+            return self._pending.popleft()
+        while True:
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if request is None:
+                # Serve what we have, then stop
+                self._stopping = True
+                return None
+            if request.future.set_running_or_notify_cancel():
+                return request
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        """``first`` plus requests with the same cap, arriving within ``max_wait``."""
+        batch = [first]
+        held: List[_Request] = []
+        for request in list(self._pending):
+            if len(batch) < self.max_batch_size and request.max_new_tokens == first.max_new_tokens:
+                self._pending.remove(request)
+                batch.append(request)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and not self._stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._stopping = True
+                break
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if request.max_new_tokens == first.max_new_tokens:
+                batch.append(request)
+            else:
+                held.append(request)
+        self._pending.extend(held)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._next(timeout=0 if self._stopping else None)
+            if first is None:
+                if self._stopping and not self._pending:
+                    return
+                continue
+            now = time.monotonic()
+            batch = []
+            for request in self._collect(first):
+                if request.expired(now):
+                    request.future.set_exception(DeadlineExceeded("deadline passed while waiting for a batch"))
+                else:
+                    batch.append(request)
+            if batch:
+                self._run(batch, now)
+
+    def _run(self, batch: List[_Request], now: float) -> None:
+        try:
+            completions = self.generate_batch([request.prompt for request in batch], _batch_limits(batch, now))
+        except DeadlineExceeded as exc:
+            finished = time.monotonic()
+            expired = [request for request in batch if request.expired(finished)]
+            if not expired:
+                # Stopped by the generator's own ceiling, not by a request deadline
+                expired = batch
+            for request in expired:
+                request.future.set_exception(exc)
+            # Retried first, in their original order
+            self._pending.extendleft(reversed([request for request in batch if request not in expired]))
+            return
+        except Exception as exc:
+            logger.error("Batched generation of %s prompts failed: %s", len(batch), exc)
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+        if len(completions) != len(batch):
+            error = RuntimeError(f"batch of {len(batch)} prompts returned {len(completions)} completions")
+            logger.error("Batched generation failed: %s", error)
+            for request in batch:
+                request.future.set_exception(error)
+            return
+        for request, completion in zip(batch, completions):
+            request.future.set_result(completion)
+        self.batches_run += 1
+        self.requests_served += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+
+__all__ = ["BatchLimits", "BatchingInferenceServer", "BatchGenerator"]
@@ -7,7 +7,10 @@ import re
 from dataclasses import dataclass
 from typing import Dict, List
 
+from app.core.call_context import PROFILE_INTERACTIVE, TASK_EXTRACTION, TASK_MERGE, call_context
 from app.core.llm_engine import LLMEngine
+from app.core.prompt_builder import Prompt, PromptTemplate
+from app.utils.history import ROLE_LABELS, BoundedHistory
 from app.utils.logger import logger
 from app.utils.state import (
     ConversationState,
@@ -27,24 +30,20 @@ class DialogAnalysis:
     interpretation_options: Dict[str, List[str]]  # Field -> list of 3 interpretation options
 
 
-CONTEXT_UNDERSTANDING_PROMPT = """Ты — опытный бизнес-аналитик, который собирает требования через диалог.
+# Field list is static, so it belongs to the cached prompt prefix
+FIELD_DESCRIPTIONS = "\n".join(
+    f"- {field}: {field_label(field)} ({FIELD_METADATA[field]['question']})" for field in FIELD_SEQUENCE
+)
+
+CONTEXT_UNDERSTANDING_PROMPT = PromptTemplate(
+    prefix=f"""Ты — опытный бизнес-аналитик, который собирает требования через диалог.
 
 Твоя задача — анализировать сообщения пользователя и извлекать информацию для Business Requirements Document (BRD).
 
 Доступные поля для заполнения:
-{field_descriptions}
+{FIELD_DESCRIPTIONS}
 
-Текущее состояние заполнения:
-{current_state}
-
-История диалога (последние сообщения):
-{conversation_history}
-{last_question_context}
-
-Новое сообщение пользователя:
-{user_message}
-
-Проанализируй сообщение и выполни следующие задачи:
+Проанализируй новое сообщение пользователя (приведено в конце вместе с текущим состоянием и историей диалога) и выполни следующие задачи:
 
 1. Определи, какую информацию пользователь предоставил
 2. Извлеки эту информацию и сопоставь с соответствующими полями из списка выше
@@ -131,7 +130,45 @@ CONTEXT_UNDERSTANDING_PROMPT = """Ты — опытный бизнес-анал
   * Варианты должны отличаться уровнем детализации и полноты
   * Варианты должны быть краткими (до 100 символов каждый) но содержательными
   * Если поле не в extracted_info - НЕ включай его в interpretation_options
-"""
+""",
+    suffix="""
+Текущее состояние заполнения:
+{current_state}
+
+История диалога (последние сообщения):
+{conversation_history}
+{last_question_context}
+
+Новое сообщение пользователя:
+{user_message}
+
+Верни ответ ТОЛЬКО в формате JSON, описанном выше.
+""",
+    response_format="json",
+)
+
+
+FIELD_MERGE_PROMPT = PromptTemplate(
+    prefix="""Ты — опытный бизнес-аналитик, который обрабатывает требования.
+
+Задача: Объедини исходное сообщение пользователя и его уточнение (приведены ниже) в ОДНУ правильную формулировку для указанного поля.
+
+ВАЖНО:
+- Склей информацию из исходного сообщения и уточнения естественным образом
+- Результат должен быть конкретным и полным
+- Длина результата должна быть разумной (100-200 символов, если возможно)
+- Результат должен отвечать на вопрос поля
+- Верни ТОЛЬКО финальную формулировку, без дополнительных комментариев
+""",
+    suffix="""
+Поле: {label} ({field})
+Вопрос для этого поля: {question}
+
+Исходное сообщение пользователя: {original_message}
+
+Пользователь дополнил/уточнил свое сообщение: {custom_value}
+""",
+)
 
 
 class IntelligentDialogManager:
@@ -140,7 +177,7 @@ class IntelligentDialogManager:
     def __init__(self, state: ConversationState, llm_engine: LLMEngine):
         self.state = state
         self.llm_engine = llm_engine
-        self.conversation_history: List[Dict[str, str]] = []
+        self.conversation_history = BoundedHistory()
         self.pending_options: Dict[str, List[str]] = {}  # Store pending interpretation options
 
     def process_message(self, user_message: str) -> tuple[str, Dict[str, List[str]]]:
@@ -187,7 +224,7 @@ class IntelligentDialogManager:
         # КРИТИЧЕСКИ ВАЖНО: Определяем, про какое поле был задан последний вопрос
         last_question_field = None
         if self.conversation_history:
-            for msg in reversed(self.conversation_history[-3:]):
+            for msg in reversed(self.conversation_history.recent(3)):
                 if msg["role"] == "assistant":
                     last_question = msg["content"]
                     # Проверяем, про какое поле был вопрос
@@ -405,26 +442,17 @@ class IntelligentDialogManager:
             return
         
         # Use LLM to combine context and custom input into a well-formed value
-        prompt = f"""Ты — опытный бизнес-аналитик, который обрабатывает требования.
-
-Поле: {field_label(field)} ({field})
-Вопрос для этого поля: {FIELD_METADATA[field]["question"]}
-
-Исходное сообщение пользователя: {original_message[:200] if original_message else "не указано"}
-
-Пользователь дополнил/уточнил свое сообщение: {custom_value}
-
-Задача: Объедини исходное сообщение и уточнение пользователя в ОДНУ правильную формулировку для поля "{field_label(field)}".
-
-ВАЖНО:
-- Склей информацию из исходного сообщения и уточнения естественным образом
-- Результат должен быть конкретным и полным
-- Длина результата должна быть разумной (100-200 символов, если возможно)
-- Результат должен отвечать на вопрос поля
-- Верни ТОЛЬКО финальную формулировку, без дополнительных комментариев"""
+        prompt = FIELD_MERGE_PROMPT.build(
+            label=field_label(field),
+            field=field,
+            question=FIELD_METADATA[field]["question"],
+            original_message=original_message[:200] if original_message else "не указано",
+            custom_value=custom_value,
+        )
 
         try:
-            processed_value = self.llm_engine.ask(prompt).strip()
+            with call_context(profile=PROFILE_INTERACTIVE, task=TASK_MERGE):
+                processed_value = self.llm_engine.ask_prompt(prompt).strip()
             
             # Clean up - remove quotes if LLM wrapped it
             if processed_value.startswith('"') and processed_value.endswith('"'):
@@ -478,7 +506,8 @@ class IntelligentDialogManager:
         prompt = self._build_analysis_prompt(user_message)
         
         try:
-            response = self.llm_engine.ask(prompt)
+            with call_context(profile=PROFILE_INTERACTIVE, task=TASK_EXTRACTION):
+                response = self.llm_engine.ask_prompt(prompt)
             # Try to extract JSON from response
             analysis_data = self._extract_json(response)
             
@@ -584,15 +613,8 @@ class IntelligentDialogManager:
             )
             return fallback_analysis
 
-    def _build_analysis_prompt(self, user_message: str) -> str:
-        """Build prompt for LLM analysis."""
-        # Format field descriptions
-        field_descriptions = []
-        for field in FIELD_SEQUENCE:
-            label = field_label(field)
-            question = FIELD_METADATA[field]["question"]
-            field_descriptions.append(f"- {field}: {label} ({question})")
-        
+    def _build_analysis_prompt(self, user_message: str) -> Prompt:
+        """Build prompt for LLM analysis: static rules prefix + per-turn suffix."""
         # Format current state
         current_state_lines = []
         for field in FIELD_SEQUENCE:
@@ -603,17 +625,18 @@ class IntelligentDialogManager:
             else:
                 current_state_lines.append(f"- {label}: не заполнено")
         
-        # Format conversation history (last 5 messages)
+        # Format conversation history: summary of older turns + last 5 messages
         history_lines = []
-        for msg in self.conversation_history[-5:]:
-            role = "Пользователь" if msg["role"] == "user" else "Аналитик"
-            history_lines.append(f"{role}: {msg['content']}")
+        if self.conversation_history.summary:
+            history_lines.append(f"Кратко о более ранних сообщениях:\n{self.conversation_history.summary}\n")
+        for msg in self.conversation_history.recent(5):
+            history_lines.append(f"{ROLE_LABELS.get(msg.role, 'Аналитик')}: {msg.content}")
         
         # Определяем, какой вопрос был задан последним (если есть)
         last_question_context = ""
         if self.conversation_history:
             # Ищем последнее сообщение от аналитика
-            for msg in reversed(self.conversation_history[-5:]):
+            for msg in reversed(self.conversation_history.recent(5)):
                 if msg["role"] == "assistant":
                     last_question = msg["content"]
                     # Проверяем, про какое поле был вопрос
@@ -625,8 +648,7 @@ class IntelligentDialogManager:
                             break
                     break
         
-        return CONTEXT_UNDERSTANDING_PROMPT.format(
-            field_descriptions="\n".join(field_descriptions),
+        return CONTEXT_UNDERSTANDING_PROMPT.build(
             current_state="\n".join(current_state_lines),
             conversation_history="\n".join(history_lines) if history_lines else "Диалог только начинается",
             user_message=user_message,
@@ -0,0 +1,90 @@
+"""Memory-bounded LRU of prompt-prefix KV caches for the transformers backend.
+
+Prefilling the shared prompt prefix (system prompt + document template,
+thousands of tokens) dominates CPU latency. The engine computes
+``past_key_values`` for a prefix once, stores it here keyed by the prefix
+hash and forks a copy for every continuation, so only the suffix is
+prefilled on later calls.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class PrefixEntry:
+    """KV state of one tokenized prefix."""
+
+    input_ids: Any  # tensor of shape [1, prefix_tokens]
+    past_key_values: Any
+    nbytes: int
+
+    @property
+    def tokens(self) -> int:
+        return int(self.input_ids.shape[-1])
+
+
+def cache_nbytes(past_key_values: Any) -> int:
+    """Size of a transformers KV cache (``DynamicCache`` or legacy tuples)."""
+    layers = getattr(past_key_values, "layers", None)
+    if layers is not None:
+        tensors = [tensor for layer in layers for tensor in (layer.keys, layer.values) if tensor is not None]
+    elif hasattr(past_key_values, "key_cache"):
+        tensors = list(past_key_values.key_cache) + list(past_key_values.value_cache)
+    else:
+        tensors = [tensor for layer in past_key_values for tensor in layer]
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class PrefixKVCache:
+    """LRU of ``PrefixEntry`` bounded by total tensor bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._entries: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[PrefixEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.tokens_saved += entry.tokens
+            return entry
+
+    def put(self, key: str, entry: PrefixEntry) -> bool:
+        """Store ``entry``; returns False if it alone exceeds the budget."""
+        if entry.nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.nbytes
+            self._entries[key] = entry
+            self.total_bytes += entry.nbytes
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+__all__ = ["PrefixEntry", "PrefixKVCache", "cache_nbytes"]
@@ -2,38 +2,97 @@
 
 from __future__ import annotations
 
+import copy
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import requests
 
-from app.config import settings
+from app.config import ModelSettings, settings
 from app.core import prompt_templates
+from app.core.call_context import (
+    PROFILE_BATCH,
+    PROFILE_DOCUMENT,
+    TASK_CLASSIFICATION,
+    TASK_DOCUMENT,
+    CallCancelled,
+    DeadlineExceeded,
+    call_context,
+    current_call,
+    output_limit,
+)
+from app.core.cpu_profile import loading_kwargs, optimize_model, prepare_cpu_profile
+from app.core.inference_server import BatchingInferenceServer, BatchLimits
+from app.core.kv_cache import PrefixEntry, PrefixKVCache, cache_nbytes
+from app.core.prompt_builder import Prompt, estimate_tokens
+from app.core.timeouts import observe_generation, request_timeout
 from app.utils.logger import logger
 
 
+# Shorter prefixes are cheaper to prefill than to deep-copy from the cache
+MIN_PREFIX_TOKENS = 64
+
+
+@dataclass
+class GenerationStats:
+    """Token counts and timing of one generation call."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    prefill_tokens_saved: int = 0
+    prefill_seconds: float = 0.0
+    decode_seconds: float = 0.0
+
+    @property
+    def decode_tokens_per_second(self) -> float:
+        if self.decode_seconds <= 0:
+            return 0.0
+        return self.completion_tokens / self.decode_seconds
+
+
 class LLMEngine:
     """Interface for all LLM providers."""
 
     def ask(self, prompt: str) -> str:  # pragma: no cover - interface
         raise NotImplementedError
 
+    def warm_up(self) -> None:
+        """Make sure the model is loaded; engines that load lazily override this."""
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        """Ask with a prefix-split prompt.
+
+        Engines with prompt/KV caching override this to reuse work for
+        ``prompt.prefix`` (keyed by ``prompt.prefix_hash``); by default the
+        full text is sent, which still lets provider-side prefix caches hit.
+        """
+        return self.ask(prompt.text)
+
     def generate_brd(self, context: str) -> str:
-        prompt = prompt_templates.BRD_TEMPLATE.format(context=context)
-        return self.ask(prompt)
+        prompt = prompt_templates.BRD_TEMPLATE.build(context=context)
+        with call_context(task=TASK_DOCUMENT):
+            return self.ask_prompt(prompt)
 
     def generate_usecase(self, context: str) -> str:
-        prompt = prompt_templates.USE_CASE_TEMPLATE.format(context=context)
-        return self.ask(prompt)
+        prompt = prompt_templates.USE_CASE_TEMPLATE.build(context=context)
+        with call_context(task=TASK_DOCUMENT):
+            return self.ask_prompt(prompt)
 
     def generate_userstories(self, context: str) -> str:
-        prompt = prompt_templates.USER_STORIES_TEMPLATE.format(context=context)
-        return self.ask(prompt)
+        prompt = prompt_templates.USER_STORIES_TEMPLATE.build(context=context)
+        with call_context(task=TASK_DOCUMENT):
+            return self.ask_prompt(prompt)
 
     def generate_plantuml(self, context: str) -> str:
         # Сначала определяем тип диаграммы
-        analysis_prompt = prompt_templates.PLANTUML_DIAGRAM_TYPE_ANALYSIS.format(context=context)
-        diagram_type_raw = self.ask(analysis_prompt).strip().lower()
+        analysis_prompt = prompt_templates.PLANTUML_DIAGRAM_TYPE_ANALYSIS.build(context=context)
+        with call_context(task=TASK_CLASSIFICATION):
+            diagram_type_raw = self.ask_prompt(analysis_prompt).strip().lower()
         
         # Извлекаем тип диаграммы (может быть с пояснениями)
         diagram_type = "activity"  # по умолчанию
@@ -45,8 +104,9 @@ class LLMEngine:
         logger.info("Selected PlantUML diagram type: %s (from analysis: %s)", diagram_type, diagram_type_raw[:100])
         
         # Генерируем диаграмму выбранного типа
-        prompt = prompt_templates.PLANTUML_TEMPLATE.format(context=context, diagram_type=diagram_type)
-        return self.ask(prompt)
+        prompt = prompt_templates.PLANTUML_TEMPLATE.build(context=context, diagram_type=diagram_type)
+        with call_context(task=TASK_DOCUMENT):
+            return self.ask_prompt(prompt)
 
 
 @dataclass
@@ -61,84 +121,542 @@ class MockLLMEngine(LLMEngine):
         return f"{header}\n\n{prompt_templates.MOCK_COMPLETION_SUFFIX}"
 
 
-class TransformersEngine(LLMEngine):
-    """Runs inference via HuggingFace transformers."""
+def load_transformers_model(model_cfg: ModelSettings) -> Tuple[Any, Any]:
+    """Load tokenizer and model for ``model_cfg``, applying the CPU profile."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    logger.info("Loading transformers model %s", model_cfg.model_name)
+    prepare_cpu_profile(model_cfg)
+
+    torch_dtype = None
+    if model_cfg.dtype != "auto":
+        torch_dtype = getattr(torch, model_cfg.dtype)
+
+    tokenizer = AutoTokenizer.from_pretrained(
+        model_cfg.model_name,
+        revision=model_cfg.revision,
+        cache_dir=model_cfg.cache_dir,
+    )
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    # Decoder-only models need left padding for batched generation
+    tokenizer.padding_side = "left"
+
+    model = AutoModelForCausalLM.from_pretrained(
+        model_cfg.model_name,
+        revision=model_cfg.revision,
+        cache_dir=model_cfg.cache_dir,
+        torch_dtype=torch_dtype,
+        device_map=model_cfg.device,
+        **loading_kwargs(model_cfg.cpu_profile),
+    )
+    model.eval()
+    return tokenizer, optimize_model(model, model_cfg.cpu_profile)
+
+
+@lru_cache(maxsize=1)
+def _load_transformers_model() -> Tuple[Any, Any]:
+    """Load tokenizer and model once per process; all sessions share them."""
+    return load_transformers_model(settings.model)
+
+
+def _generation_kwargs(tokenizer: Any) -> Dict[str, Any]:
+    model_cfg = settings.model
+    return {
+        "temperature": model_cfg.temperature,
+        "top_p": model_cfg.top_p,
+        "max_new_tokens": model_cfg.max_new_tokens,
+        "do_sample": True,
+        "pad_token_id": tokenizer.pad_token_id,
+        "eos_token_id": tokenizer.eos_token_id,
+    }
+
+
+class _TimingStreamer:
+    """Records when the first new token appears.
+
+    Duck-types ``transformers`` ``BaseStreamer``: ``generate`` calls ``put``
+    once with the prompt ids and then once per decoding step, so the first
+    step after the prompt marks the end of prefill.
+    """
 
     def __init__(self) -> None:
-        import torch
-        from transformers import AutoModelForCausalLM, AutoTokenizer
+        self.first_token_at: Optional[float] = None
+        self._seen_prompt = False
+
+    def put(self, value: Any) -> None:
+        if not self._seen_prompt:
+            self._seen_prompt = True
+        elif self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def end(self) -> None:
+        pass
+
+
+def _generate(
+    model: Any,
+    tokenizer: Any,
+    input_ids: Any,
+    attention_mask: Any,
+    generation_kwargs: Dict[str, Any],
+    past_key_values: Any = None,
+) -> Tuple[List[str], List[GenerationStats]]:
+    """Run ``generate`` and decode only the new tokens of every row."""
+    import torch
+
+    streamer = _TimingStreamer()
+    started = time.perf_counter()
+    with torch.no_grad():
+        output_ids = model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=past_key_values,
+            streamer=streamer,
+            **generation_kwargs,
+        )
+    finished = time.perf_counter()
+    first_token_at = streamer.first_token_at or finished
+
+    # Prompts are left-padded to one width, so slicing ids by it drops the
+    # prompt without detokenizing it
+    new_ids = output_ids[:, input_ids.shape[-1]:]
+    completions = tokenizer.batch_decode(new_ids, skip_special_tokens=True)
+    stats = [
+        GenerationStats(
+            prompt_tokens=int(attention_mask[row].sum()),
+            completion_tokens=int((new_ids[row] != tokenizer.pad_token_id).sum()),
+            prefill_seconds=first_token_at - started,
+            decode_seconds=finished - first_token_at,
+        )
+        for row in range(new_ids.shape[0])
+    ]
+    return [completion.strip() for completion in completions], stats
 
-        model_cfg = settings.model
-        logger.info("Loading transformers model %s", model_cfg.model_name)
 
-        torch_dtype = None
-        if model_cfg.dtype != "auto":
-            torch_dtype = getattr(torch, model_cfg.dtype)
+def _generate_batch(prompts: List[str], limits: BatchLimits) -> List[Tuple[str, GenerationStats]]:
+    """Run one padded ``generate`` call for several prompts on the shared model.
+
+    Hitting the time limit raises ``DeadlineExceeded`` instead of returning
+    truncated answers; the server then fails only the requests whose own
+    deadline passed and retries the others.
+    """
+    tokenizer, model = _load_transformers_model()
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+    generation_kwargs = _generation_kwargs(tokenizer)
+    if limits.max_new_tokens is not None:
+        generation_kwargs["max_new_tokens"] = min(generation_kwargs["max_new_tokens"], limits.max_new_tokens)
+    max_time = settings.timeouts.max_for(PROFILE_DOCUMENT)
+    if limits.max_seconds is not None:
+        max_time = min(max_time, limits.max_seconds)
+    generation_kwargs["max_time"] = max_time
+    completions, stats = _generate(
+        model, tokenizer, inputs["input_ids"], inputs["attention_mask"], generation_kwargs
+    )
+    if stats and stats[0].prefill_seconds + stats[0].decode_seconds >= max_time:
+        raise DeadlineExceeded(f"transformers: batched generation stopped at the {max_time:.0f}s limit")
+    return list(zip(completions, stats))
+
+
+@lru_cache(maxsize=1)
+def get_transformers_server() -> BatchingInferenceServer:
+    """Process-wide batching server over the shared transformers model."""
+    model_cfg = settings.model
+    return BatchingInferenceServer(
+        _generate_batch,
+        max_batch_size=model_cfg.batch_max_size,
+        max_wait_ms=model_cfg.batch_wait_ms,
+    )
+
+
+@lru_cache(maxsize=1)
+def _shared_prefix_cache() -> Optional[PrefixKVCache]:
+    cache_bytes = settings.model.kv_prefix_cache_mb * 1024 * 1024
+    return PrefixKVCache(cache_bytes) if cache_bytes else None
+
+
+class TransformersEngine(LLMEngine):
+    """Runs inference via HuggingFace transformers.
+
+    The model, tokenizer and prefix KV cache are shared by all engine
+    instances. With ``model.batch_max_size > 1`` calls go through the
+    batching server instead of one ``generate`` per session; prefix KV
+    reuse only applies to unbatched calls.
+    """
+
+    def __init__(self) -> None:
+        self.tokenizer, self.model = _load_transformers_model()
+        self.generation_kwargs = _generation_kwargs(self.tokenizer)
+        self.prefix_cache = _shared_prefix_cache()
+        self.server = get_transformers_server() if settings.model.batch_max_size > 1 else None
+        self.last_stats = GenerationStats()
 
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            model_cfg.model_name,
-            revision=model_cfg.revision,
-            cache_dir=model_cfg.cache_dir,
+    def ask(self, prompt: str) -> str:
+        return self.ask_with_stats(prompt)[0]
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        return self.ask_with_stats(prompt)[0]
+
+    def ask_with_stats(self, prompt: Union[str, Prompt]) -> Tuple[str, GenerationStats]:
+        """Generate and also return token counts and prefill/decode timing.
+
+        Generation stops at the adaptive timeout (``max_time``); hitting it
+        raises ``DeadlineExceeded`` instead of returning a truncated answer.
+        """
+        text = prompt.text if isinstance(prompt, Prompt) else prompt
+        timeout = request_timeout(
+            "transformers",
+            settings.model.model_name,
+            output_limit(self.generation_kwargs["max_new_tokens"]),
+            estimate_tokens(text),
         )
-        if self.tokenizer.pad_token_id is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_cfg.model_name,
-            revision=model_cfg.revision,
-            cache_dir=model_cfg.cache_dir,
-            torch_dtype=torch_dtype,
-            device_map=model_cfg.device,
+        if self.server is not None:
+            try:
+                future = self.server.submit(
+                    text, output_limit(self.generation_kwargs["max_new_tokens"]), timeout
+                )
+                completion, stats = future.result(timeout=timeout)
+            except FutureTimeout as exc:
+                raise DeadlineExceeded(f"transformers: no result within {timeout:.0f}s") from exc
+        elif isinstance(prompt, Prompt):
+            completion, stats = self._ask_with_prefix(prompt, timeout)
+        else:
+            completion, stats = self._ask_text(prompt, timeout)
+        elapsed = stats.prefill_seconds + stats.decode_seconds
+        if self.server is None and elapsed >= timeout:
+            raise DeadlineExceeded(f"transformers: generation stopped at the {timeout:.0f}s limit")
+        observe_generation(
+            "transformers", settings.model.model_name, stats.completion_tokens, stats.decode_seconds,
+            stats.prompt_tokens - stats.prefill_tokens_saved, stats.prefill_seconds,
         )
-        self.generation_kwargs = {
-            "temperature": model_cfg.temperature,
-            "top_p": model_cfg.top_p,
-            "max_new_tokens": model_cfg.max_new_tokens,
-            "do_sample": True,
-            "pad_token_id": self.tokenizer.pad_token_id,
-            "eos_token_id": self.tokenizer.eos_token_id,
-        }
+        self.last_stats = stats
+        logger.info(
+            "Transformers call: %s prompt tokens (%s from prefix cache), %s new tokens, "
+            "prefill %.2fs, decode %.2fs (%.1f tok/s)",
+            stats.prompt_tokens, stats.prefill_tokens_saved, stats.completion_tokens,
+            stats.prefill_seconds, stats.decode_seconds, stats.decode_tokens_per_second,
+        )
+        return completion, stats
 
-    def ask(self, prompt: str) -> str:
-        import torch
+    def _call_kwargs(self, timeout: Optional[float]) -> Dict[str, Any]:
+        kwargs = dict(self.generation_kwargs, max_new_tokens=output_limit(self.generation_kwargs["max_new_tokens"]))
+        if timeout is not None:
+            kwargs["max_time"] = timeout
+        return kwargs
 
+    def _ask_text(self, prompt: str, timeout: Optional[float] = None) -> Tuple[str, GenerationStats]:
         inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        completions, stats = _generate(
+            self.model, self.tokenizer, inputs["input_ids"], inputs["attention_mask"], self._call_kwargs(timeout)
+        )
+        return completions[0], stats[0]
+
+    def _prefix_entry(self, prompt: Prompt) -> Tuple[Optional[PrefixEntry], bool]:
+        """Return ``(entry, hit)`` with the KV state of ``prompt.prefix``."""
+        import torch
+
+        if self.prefix_cache is None:
+            return None, False
+        entry = self.prefix_cache.get(prompt.prefix_hash)
+        if entry is not None:
+            return entry, True
+
+        prefix_ids = self.tokenizer(prompt.prefix, return_tensors="pt").input_ids.to(self.model.device)
+        if prefix_ids.shape[-1] < MIN_PREFIX_TOKENS:
+            return None, False
         with torch.no_grad():
-            output_ids = self.model.generate(**inputs, **self.generation_kwargs)
-        generated = self.tokenizer.decode(output_ids[0], skip_special_tokens=True)
-        completion = generated[len(prompt) :].strip()
-        return completion or generated.strip()
+            past = self.model(input_ids=prefix_ids, use_cache=True).past_key_values
+        entry = PrefixEntry(prefix_ids, past, cache_nbytes(past))
+        if not self.prefix_cache.put(prompt.prefix_hash, entry):
+            logger.info("Prefix KV cache of %s bytes exceeds the budget, not cached", entry.nbytes)
+        return entry, False
+
+    def _ask_with_prefix(self, prompt: Prompt, timeout: Optional[float] = None) -> Tuple[str, GenerationStats]:
+        """Generate with the prefix KV state computed once and forked per call."""
+        import torch
+
+        started = time.perf_counter()
+        entry, hit = self._prefix_entry(prompt)
+        # On a miss this is the prefix forward pass, part of the call's prefill
+        prefix_seconds = time.perf_counter() - started
+        if entry is None:
+            return self._ask_text(prompt.text, timeout)
+
+        # Tokenize the suffix on its own so prefix tokens match the cached ones
+        suffix_ids = self.tokenizer(
+            prompt.suffix, return_tensors="pt", add_special_tokens=False
+        ).input_ids.to(self.model.device)
+        input_ids = torch.cat([entry.input_ids, suffix_ids], dim=-1)
+        # generate() appends to the cache in place, so every call gets a copy
+        past = copy.deepcopy(entry.past_key_values)
+        completions, stats = _generate(
+            self.model,
+            self.tokenizer,
+            input_ids,
+            torch.ones_like(input_ids),
+            self._call_kwargs(timeout),
+            past_key_values=past,
+        )
+        stats[0].prefill_tokens_saved = entry.tokens if hit else 0
+        stats[0].prefill_seconds += prefix_seconds
+        return completions[0], stats[0]
 
 
 class OllamaEngine(LLMEngine):
-    """Runs inference via Ollama REST API."""
+    """Runs inference via Ollama REST API.
 
-    def __init__(self) -> None:
+    Split prompts go to ``/api/chat`` with the static prefix as the system
+    message. With ``keep_alive`` the model stays loaded, and Ollama reuses
+    the KV cache of the identical prefix between calls, so each dialog turn
+    only prefills the short suffix instead of the whole prompt.
+    """
+
+    def __init__(self, model_name: str | None = None) -> None:
         model_cfg = settings.model
-        self.model_name = model_cfg.model_name
+        self.model_name = model_name or model_cfg.model_name
         self.api_url = model_cfg.ollama_api_url
+        self.chat_url = self.api_url.rsplit("/api/", 1)[0] + "/api/chat"
+        self.keep_alive = model_cfg.ollama_keep_alive
         self.generation_kwargs = {
             "temperature": model_cfg.temperature,
             "top_p": model_cfg.top_p,
             "num_predict": model_cfg.max_new_tokens,
         }
+        # Token counts and timing reported by the server for the last call
+        self.last_stats = GenerationStats()
         logger.info("Initialized Ollama engine for model %s at %s", self.model_name, self.api_url)
 
+    def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        text = payload.get("prompt") or "".join(message["content"] for message in payload.get("messages", ()))
+        timeout = request_timeout("ollama", self.model_name, payload["options"]["num_predict"], estimate_tokens(text))
+        try:
+            response = requests.post(url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+        except requests.exceptions.Timeout as exc:
+            logger.error("Ollama API request timed out after %.0fs", timeout)
+            raise DeadlineExceeded(f"Ollama API timeout after {timeout:.0f}s") from exc
+        except requests.exceptions.RequestException as exc:
+            logger.error("Ollama API request failed: %s", exc)
+            raise RuntimeError(f"Ollama API error: {exc}") from exc
+        # Durations are reported in nanoseconds
+        self.last_stats = GenerationStats(
+            prompt_tokens=result.get("prompt_eval_count", 0),
+            completion_tokens=result.get("eval_count", 0),
+            prefill_seconds=result.get("prompt_eval_duration", 0) / 1e9,
+            decode_seconds=result.get("eval_duration", 0) / 1e9,
+        )
+        observe_generation(
+            "ollama", self.model_name, self.last_stats.completion_tokens, self.last_stats.decode_seconds,
+            self.last_stats.prompt_tokens, self.last_stats.prefill_seconds,
+        )
+        logger.debug(
+            "Ollama call: %s prompt tokens evaluated, %s generated",
+            self.last_stats.prompt_tokens, self.last_stats.completion_tokens,
+        )
+        return result
+
+    def _options(self) -> Dict[str, Any]:
+        return dict(self.generation_kwargs, num_predict=output_limit(self.generation_kwargs["num_predict"]))
+
     def ask(self, prompt: str) -> str:
         payload = {
             "model": self.model_name,
             "prompt": prompt,
             "stream": False,
-            "options": self.generation_kwargs,
+            "keep_alive": self.keep_alive,
+            "options": self._options(),
         }
+        return self._post(self.api_url, payload).get("response", "").strip()
+
+    def warm_up(self) -> None:
+        """Load the model into memory (an empty prompt) and pin it for ``keep_alive``."""
+        payload = {"model": self.model_name, "prompt": "", "stream": False, "keep_alive": self.keep_alive}
+        # Nothing is generated, so no adaptive estimate applies: loading runs
+        # in the background and gets the batch ceiling
+        timeout = settings.timeouts.max_for(PROFILE_BATCH)
         try:
-            response = requests.post(self.api_url, json=payload, timeout=300)
+            response = requests.post(self.api_url, json=payload, timeout=timeout)
             response.raise_for_status()
-            result = response.json()
-            return result.get("response", "").strip()
         except requests.exceptions.RequestException as exc:
-            logger.error("Ollama API request failed: %s", exc)
-            raise RuntimeError(f"Ollama API error: {exc}") from exc
+            raise RuntimeError(f"Ollama preload failed: {exc}") from exc
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        payload = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": prompt.prefix},
+                {"role": "user", "content": prompt.suffix},
+            ],
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": self._options(),
+        }
+        result = self._post(self.chat_url, payload)
+        return result.get("message", {}).get("content", "").strip()
+
+
+def _llama_model_path(model_cfg: ModelSettings) -> Path:
+    if model_cfg.llama_model_path is not None:
+        return Path(model_cfg.llama_model_path).expanduser()
+    if model_cfg.model_name.endswith(".gguf"):
+        return Path(model_cfg.model_name).expanduser()
+    raise ValueError("llama.cpp needs a GGUF file: set llama_model_path or a model_name ending with .gguf")
+
+
+@lru_cache(maxsize=1)
+def _load_llama() -> Any:
+    """Load the GGUF model once per process; all sessions share it."""
+    try:
+        from llama_cpp import Llama, LlamaRAMCache
+    except ImportError:
+        raise ImportError(
+            "llama-cpp-python package is required for llama.cpp. "
+            "Install it with: pip install llama-cpp-python"
+        )
+
+    model_cfg = settings.model
+    model_path = _llama_model_path(model_cfg)
+    if not model_path.exists():
+        raise FileNotFoundError(f"GGUF model not found: {model_path}")
+
+    logger.info("Loading llama.cpp model %s", model_path)
+    llm = Llama(
+        model_path=str(model_path),
+        n_ctx=model_cfg.llama_n_ctx,
+        n_threads=model_cfg.llama_n_threads,
+        n_batch=model_cfg.llama_n_batch,
+        verbose=False,
+    )
+    if model_cfg.llama_prompt_cache_mb:
+        # Saved KV states keyed by token prefix; the static prompt prefix hits it
+        llm.set_cache(LlamaRAMCache(capacity_bytes=model_cfg.llama_prompt_cache_mb * 1024 * 1024))
+    return llm
+
+
+class _TimeLimit:
+    """llama.cpp stopping criterion: ends generation at ``deadline`` or on cancel.
+
+    ``started`` is the call start the deadline counts from; ``generation_started``
+    is set once the model lock is held, so timing stats leave out the lock wait.
+    """
+
+    def __init__(self, timeout: float):
+        self.started = time.perf_counter()
+        self.generation_started = self.started
+        self.deadline = self.started + timeout
+        self.cancel = current_call().cancel
+        self.hit = False
+
+    def __call__(self, input_ids: Any, logits: Any) -> bool:
+        if time.perf_counter() >= self.deadline or (self.cancel is not None and self.cancel.is_set()):
+            self.hit = True
+        return self.hit
+
+    def check(self) -> None:
+        """Raise if the criterion stopped generation."""
+        if not self.hit:
+            return
+        if self.cancel is not None and self.cancel.is_set():
+            raise CallCancelled("llama.cpp: generation cancelled")
+        raise DeadlineExceeded(f"llama.cpp: generation stopped after {time.perf_counter() - self.started:.0f}s")
+
+
+@lru_cache(maxsize=1)
+def _json_grammar() -> Any:
+    from llama_cpp.llama_grammar import JSON_GBNF, LlamaGrammar
+
+    return LlamaGrammar.from_string(JSON_GBNF, verbose=False)
+
+
+class LlamaCppEngine(LLMEngine):
+    """Runs quantized GGUF models on CPU via llama-cpp-python.
+
+    llama.cpp reuses the KV state of the longest matching token prefix of the
+    previous call and keeps older states in the RAM prompt cache, so the
+    static prompt prefix is prefilled once. A ``Llama`` instance is not
+    thread-safe, calls are serialized with a lock.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        model_cfg = settings.model
+        self.llm = _load_llama()
+        self.generation_kwargs = {
+            "temperature": model_cfg.temperature,
+            "top_p": model_cfg.top_p,
+            "max_tokens": model_cfg.max_new_tokens,
+        }
+        self.last_stats = GenerationStats()
+        logger.info("Initialized llama.cpp engine (%s threads, batch %s)", self.llm.n_threads, model_cfg.llama_n_batch)
+
+    def _completion_kwargs(self, stop: Optional[List[str]], json_mode: bool) -> Dict[str, Any]:
+        kwargs = dict(self.generation_kwargs, stop=stop or [], max_tokens=output_limit(self.generation_kwargs["max_tokens"]))
+        if json_mode:
+            kwargs["grammar"] = _json_grammar()
+        return kwargs
+
+    def _acquire(self, prompt: str) -> _TimeLimit:
+        """Take the model lock within the call's timeout; returns its stopping criterion."""
+        timeout = request_timeout(
+            "llama.cpp", settings.model.model_name, output_limit(self.generation_kwargs["max_tokens"]), estimate_tokens(prompt)
+        )
+        limit = _TimeLimit(timeout)
+        if not self._lock.acquire(timeout=timeout):
+            raise DeadlineExceeded(f"llama.cpp: model busy for {timeout:.0f}s")
+        limit.generation_started = time.perf_counter()
+        return limit
+
+    def ask(self, prompt: str, stop: Optional[List[str]] = None, json_mode: bool = False) -> str:
+        from llama_cpp import StoppingCriteriaList
+
+        limit = self._acquire(prompt)
+        try:
+            result = self.llm(
+                prompt, stopping_criteria=StoppingCriteriaList([limit]), **self._completion_kwargs(stop, json_mode)
+            )
+        finally:
+            self._lock.release()
+        limit.check()
+        usage = result.get("usage", {})
+        self.last_stats = GenerationStats(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            decode_seconds=time.perf_counter() - limit.generation_started,
+        )
+        observe_generation(
+            "llama.cpp", settings.model.model_name, self.last_stats.completion_tokens, self.last_stats.decode_seconds
+        )
+        return result["choices"][0]["text"].strip()
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        return self.ask(prompt.text, json_mode=prompt.response_format == "json")
+
+    def stream(self, prompt: str, stop: Optional[List[str]] = None, json_mode: bool = False) -> Iterator[str]:
+        """Yield completion text chunks as they are generated.
+
+        Honours the call's timeout and cancel event like ``ask``; a stopped
+        stream raises after the chunks generated so far.
+        """
+        from llama_cpp import StoppingCriteriaList
+
+        limit = self._acquire(prompt)
+        try:
+            chunks = self.llm(
+                prompt,
+                stream=True,
+                stopping_criteria=StoppingCriteriaList([limit]),
+                **self._completion_kwargs(stop, json_mode),
+            )
+            for chunk in chunks:
+                text = chunk["choices"][0]["text"]
+                if text:
+                    yield text
+        finally:
+            self._lock.release()
+        limit.check()
 
 
 class GeminiEngine(LLMEngine):
@@ -173,13 +691,20 @@ class GeminiEngine(LLMEngine):
     def ask(self, prompt: str) -> str:
         try:
             import google.generativeai as genai
+            from google.api_core import exceptions as google_exceptions
         except ImportError:
             raise ImportError("google-generativeai package is required for Gemini")
 
+        max_output_tokens = output_limit(self.generation_config["max_output_tokens"])
+        timeout = request_timeout("gemini", self.model_name, max_output_tokens, estimate_tokens(prompt))
+        started = time.perf_counter()
         try:
             response = self.model.generate_content(
                 prompt,
-                generation_config=genai.GenerationConfig(**self.generation_config)
+                generation_config=genai.GenerationConfig(
+                    **dict(self.generation_config, max_output_tokens=max_output_tokens)
+                ),
+                request_options={"timeout": timeout},
             )
             
             # Пытаемся получить текст ответа
@@ -187,6 +712,7 @@ class GeminiEngine(LLMEngine):
             try:
                 text = response.text
                 if text:
+                    self._observe(response, text, started)
                     return text.strip()
             except (ValueError, AttributeError):
                 pass
@@ -200,19 +726,35 @@ class GeminiEngine(LLMEngine):
                         if hasattr(part, 'text') and part.text:
                             parts_text.append(part.text)
                     if parts_text:
+                        self._observe(response, ' '.join(parts_text), started)
                         return ' '.join(parts_text).strip()
             
             logger.warning("Gemini returned empty response")
             return ""
             
+        except DeadlineExceeded:
+            raise
+        except (google_exceptions.DeadlineExceeded, TimeoutError) as exc:
+            logger.error("Gemini API request timed out after %.0fs", timeout)
+            raise DeadlineExceeded(f"Gemini API timeout after {timeout:.0f}s") from exc
         except Exception as exc:
             logger.error("Gemini API request failed: %s", exc)
             raise RuntimeError(f"Gemini API error: {exc}") from exc
 
+    def _observe(self, response: Any, text: str, started: float) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(text)
+        observe_generation("gemini", self.model_name, tokens, time.perf_counter() - started)
+
 
 def create_engine(model_name: str | None = "gemini-2.5-flash", **_ignored) -> LLMEngine:    
     """
     Create an LLM engine instance.
+
+    With several providers in ``settings.routing.providers`` the engine
+    routes each call between them and fails over on errors. Cheap task
+    classes go to the fast model tier (``settings.tiering``), and so does
+    everything else under heavy load (``settings.overload``).
     
     Args:
         model_name: Optional model name override. For Gemini, can be 'gemini-2.5-flash' or 'gemini-2.5-pro'.
@@ -221,26 +763,78 @@ def create_engine(model_name: str | None = "gemini-2.5-flash", **_ignored) -> LL
     Returns:
         LLMEngine instance
     """
-    provider = settings.model.provider
-    if provider == "ollama":
+    engine = _build_engine(model_name)
+    if engine is None:
+        return MockLLMEngine()
+    if not (settings.tiering.enabled or settings.overload.enabled):
+        return engine
+
+    from app.core.tiering import TieredEngine
+
+    return TieredEngine(engine, _build_engine(model_name, fast=True))
+
+
+def _build_engine(model_name: str | None, fast: bool = False) -> Optional[LLMEngine]:
+    """Provider engines wrapped in the governor, router, hedging and coalescing.
+
+    With ``fast=True`` providers use their ``settings.tiering.fast_models``
+    entry; returns None when no provider has a distinct fast model.
+    """
+    from app.core.governor import GovernedEngine
+    from app.core.hedging import HedgedEngine
+    from app.core.routing import RoutedEngine, get_router
+    from app.core.single_flight import SingleFlightEngine
+
+    providers = settings.routing.providers or [settings.model.provider]
+    engines: List[Tuple[str, LLMEngine]] = []
+    has_fast_model = False
+    for provider in providers:
+        fast_model = settings.tiering.fast_models.get(provider) if fast else None
+        selected_model = (model_name or settings.model.gemini_model_name) if provider == "gemini" else settings.model.model_name
+        if fast_model == selected_model:
+            fast_model = None
+        has_fast_model = has_fast_model or fast_model is not None
         try:
-            return OllamaEngine()
+            engine = _create_provider_engine(provider, model_name, fast_model)
         except Exception as exc:  # pragma: no cover - fallback
-            logger.error("Failed to init Ollama engine: %s", exc)
-            return MockLLMEngine()
+            logger.error("Failed to init %s engine: %s", provider, exc)
+            continue
+        if isinstance(engine, MockLLMEngine):
+            continue
+        if settings.governor.enabled:
+            engine = GovernedEngine(engine, provider)
+        engines.append((provider, engine))
+    if not engines or (fast and not has_fast_model):
+        return None
+
+    if len(engines) == 1:
+        provider, engine = engines[0]
+    else:
+        provider, engine = "routed", RoutedEngine(engines)
+        get_router().start_probing()
+    if settings.hedging.enabled:
+        backup = dict(engines).get(settings.hedging.backup_provider or "")
+        engine = HedgedEngine(engine, backup)
+    if settings.governor.coalesce_identical:
+        engine = SingleFlightEngine(engine, provider)
+    return engine
+
+
+def _create_provider_engine(provider: str, model_name: str | None, fast_model: str | None = None) -> LLMEngine:
+    """Bare engine for ``provider``; raises if it cannot be initialised.
+
+    ``fast_model`` overrides the model for providers that can serve several
+    models from one process (Gemini, Ollama).
+    """
+    if provider == "ollama":
+        return OllamaEngine(model_name=fast_model)
     if provider == "transformers":
-        try:
-            return TransformersEngine()
-        except Exception as exc:  # pragma: no cover - fallback
-            logger.error("Failed to init transformers engine: %s", exc)
-            return MockLLMEngine()
+        return TransformersEngine()
+    if provider == "llama.cpp":
+        return LlamaCppEngine()
     if provider == "gemini":
-        try:
-            return GeminiEngine(model_name=model_name)
-        except Exception as exc:  # pragma: no cover - fallback
-            logger.error("Failed to init Gemini engine: %s", exc)
-            return MockLLMEngine()
+        return GeminiEngine(model_name=fast_model or model_name)
     return MockLLMEngine()
 
 
-__all__ = ["LLMEngine", "MockLLMEngine", "TransformersEngine", "OllamaEngine", "GeminiEngine", "create_engine"]
+__all__ = ["LLMEngine", "GenerationStats", "MockLLMEngine", "TransformersEngine", "OllamaEngine", "LlamaCppEngine", "GeminiEngine", "create_engine"]
@@ -0,0 +1,94 @@
+"""Background model warm-up and keep-warm pings.
+
+The first request after a deploy or an idle period would otherwise pay the
+model load (10-30 s for Ollama). ``ModelWarmer`` preloads the model in a
+background thread when the app starts, re-pings it every
+``ollama_keep_warm_seconds`` so the server never evicts it, and exposes a
+readiness flag for the UI.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from app.config import settings
+from app.core.llm_engine import LLMEngine, OllamaEngine
+from app.utils.logger import logger
+
+# Failed warm-ups are retried sooner than the regular keep-warm interval
+RETRY_SECONDS = 30.0
+
+
+class ModelWarmer:
+    """Calls ``engine.warm_up()`` once and then every ``interval_seconds``."""
+
+    def __init__(self, engine: LLMEngine, interval_seconds: float):
+        self.engine = engine
+        self.interval_seconds = interval_seconds
+        self.last_error: Optional[str] = None
+        self.last_warm_at: Optional[float] = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self) -> None:
+        """Start the background thread; later calls are no-ops."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def warm_once(self) -> bool:
+        started = time.perf_counter()
+        try:
+            self.engine.warm_up()
+        except Exception as exc:
+            self._ready.clear()
+            self.last_error = str(exc)
+            logger.warning("Model warm-up failed: %s", exc)
+            return False
+        self.last_error = None
+        self.last_warm_at = time.time()
+        if not self._ready.is_set():
+            logger.info("Model warmed up in %.1fs", time.perf_counter() - started)
+        self._ready.set()
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            ok = self.warm_once()
+            if self.interval_seconds <= 0 and ok:
+                return
+            delay = self.interval_seconds if ok else min(self.interval_seconds or RETRY_SECONDS, RETRY_SECONDS)
+            self._stop.wait(delay)
+
+
+@lru_cache(maxsize=1)
+def get_model_warmer() -> Optional[ModelWarmer]:
+    """Process-wide warmer for providers that load models lazily (Ollama)."""
+    model_cfg = settings.model
+    if model_cfg.provider != "ollama" or not model_cfg.ollama_preload:
+        return None
+    warmer = ModelWarmer(OllamaEngine(), model_cfg.ollama_keep_warm_seconds)
+    warmer.start()
+    return warmer
+
+
+__all__ = ["ModelWarmer", "get_model_warmer"]
@@ -5,7 +5,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional
 
+from app.core.call_context import check_deadline
 from app.core.llm_engine import LLMEngine, create_engine
+from app.core.overload import LEVEL_DEFER_DIAGRAM, get_overload_controller
 from app.generators import (
     brd_generator,
     pdf_generator,
@@ -23,18 +25,26 @@ class DocumentBundle:
     usecase: str
     userstories: str
     plantuml: str
+    # The diagram was skipped under load; generate it later with generate_diagram
+    diagram_deferred: bool = False
 
     def as_dict(self) -> dict:
-        return {
+        sections = {
             "BRD": self.brd,
             "Use Case": self.usecase,
             "User Stories": self.userstories,
-            "PlantUML": self.plantuml,
         }
+        if not self.diagram_deferred:
+            sections["PlantUML"] = self.plantuml
+        return sections
 
     def to_pdf(self, project_name: str = "Business Requirements Document") -> bytes:
         return pdf_generator.markdown_to_pdf_bytes(self.as_dict(), project_name=project_name)
 
+    def write_pdf(self, output: pdf_generator.PdfOutput, project_name: str = "Business Requirements Document"):
+        """Stream the PDF into a file path or binary stream instead of returning bytes."""
+        return pdf_generator.write_pdf(self.as_dict(), output, project_name=project_name)
+
 
 class Orchestrator:
     def __init__(self, engine: Optional[LLMEngine] = None, model_name: Optional[str] = None):
@@ -44,18 +54,33 @@ class Orchestrator:
         return state.is_complete()
 
     def generate_documents(self, state: ConversationState) -> DocumentBundle:
+        """Generate all documents; raises ``OverloadRejected`` when overloaded."""
         if not self.is_ready(state):
             raise ValueError("Не все поля заполнены")
 
+        defer_diagram = get_overload_controller().admit() >= LEVEL_DEFER_DIAGRAM
         context = state.as_markdown_context()
         logger.info("Generating documents for %s fields", len(state.answers))
 
-        return DocumentBundle(
-            brd=brd_generator.generate_brd(context, self.engine),
-            usecase=usecase_generator.generate_usecase(context, self.engine),
-            userstories=userstories_generator.generate_userstories(context, self.engine),
-            plantuml=plantuml_generator.generate_plantuml(context, self.engine),
+        steps = (
+            ("brd", brd_generator.generate_brd),
+            ("usecase", usecase_generator.generate_usecase),
+            ("userstories", userstories_generator.generate_userstories),
+            ("plantuml", plantuml_generator.generate_plantuml),
         )
+        if defer_diagram:
+            logger.info("Overloaded: deferring the PlantUML diagram")
+            steps = steps[:-1]
+        documents = {"plantuml": ""}
+        for name, generate in steps:
+            # Stop between documents once the caller's deadline passed or it cancelled
+            check_deadline()
+            documents[name] = generate(context, self.engine)
+        return DocumentBundle(**documents, diagram_deferred=defer_diagram)
+
+    def generate_diagram(self, state: ConversationState) -> str:
+        """Generate the PlantUML diagram deferred by ``generate_documents``."""
+        return plantuml_generator.generate_plantuml(state.as_markdown_context(), self.engine)
 
 
 __all__ = ["Orchestrator", "DocumentBundle"]
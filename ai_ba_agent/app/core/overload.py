@@ -0,0 +1,161 @@
+"""Load shedding and graceful degradation.
+
+``OverloadController`` watches the LLM queue (calls waiting in the governor)
+and the render queue (PDF builds not yet finished) and maps their depth to a
+degradation level:
+
+1. shorter output for document and QA calls (``max_new_tokens`` scaled down);
+2. every task on the fast model tier instead of the selected model;
+3. the PlantUML diagram is skipped and can be generated later on request;
+4. new document generations are rejected with a retry-after hint.
+
+A level applies together with all levels below it. The controller steps up
+as soon as a queue crosses a threshold and steps down one level at a time
+after the pressure stayed lower for ``hold_seconds``, so it does not flap
+around a threshold. Levels, transitions, time per level, degraded calls and
+rejections are kept for the sidebar.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.config import OverloadSettings, settings
+from app.utils.logger import logger
+
+LEVEL_NORMAL = 0
+LEVEL_SHORT_OUTPUT = 1
+LEVEL_FAST_MODEL = 2
+LEVEL_DEFER_DIAGRAM = 3
+LEVEL_REJECT = 4
+LEVEL_NAMES = {
+    LEVEL_NORMAL: "normal",
+    LEVEL_SHORT_OUTPUT: "short_output",
+    LEVEL_FAST_MODEL: "fast_model",
+    LEVEL_DEFER_DIAGRAM: "defer_diagram",
+    LEVEL_REJECT: "reject",
+}
+
+Clock = Callable[[], float]
+# Returns (LLM queue depth, render queue depth)
+Signals = Callable[[], Tuple[int, int]]
+
+
+class OverloadRejected(RuntimeError):
+    """A new generation was refused because the service is overloaded."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"service overloaded, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def _queue_signals() -> Tuple[int, int]:
+    from app.core.governor import get_governor
+    from app.generators.pdf_service import get_pdf_service
+
+    return get_governor().queue_depth(), get_pdf_service().queue_depth
+
+
+def _level_for(depth: int, thresholds: List[int]) -> int:
+    return min(LEVEL_REJECT, sum(1 for threshold in thresholds if depth >= threshold))
+
+
+class OverloadController:
+    """Current degradation level and its history."""
+
+    def __init__(self, config: OverloadSettings, signals: Signals = _queue_signals, clock: Clock = time.monotonic):
+        self.config = config
+        self._signals = signals
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.level = LEVEL_NORMAL
+        self.llm_queue = 0
+        self.render_queue = 0
+        now = clock()
+        self._entered_at = now
+        # Last time the queues called for the current level or higher
+        self._pressure_at = now
+        self._seconds: Dict[int, float] = {level: 0.0 for level in LEVEL_NAMES}
+        self._transitions: Dict[int, int] = {level: 0 for level in LEVEL_NAMES}
+        self._degraded: Dict[int, int] = {level: 0 for level in LEVEL_NAMES}
+        self.rejected = 0
+
+    def evaluate(self) -> int:
+        """Sample the queues, update and return the level."""
+        if not self.config.enabled:
+            return LEVEL_NORMAL
+        llm_queue, render_queue = self._signals()
+        target = max(
+            _level_for(llm_queue, self.config.llm_queue_levels),
+            _level_for(render_queue, self.config.render_queue_levels),
+        )
+        with self._lock:
+            now = self._clock()
+            self.llm_queue, self.render_queue = llm_queue, render_queue
+            if target >= self.level:
+                self._pressure_at = now
+                if target > self.level:
+                    self._enter(target, now)
+            elif now - self._pressure_at >= self.config.hold_seconds:
+                self._pressure_at = now
+                self._enter(self.level - 1, now)
+            return self.level
+
+    def _enter(self, level: int, now: float) -> None:
+        self._seconds[self.level] += now - self._entered_at
+        logger.warning(
+            "Overload level %s -> %s (LLM queue %s, render queue %s)",
+            LEVEL_NAMES[self.level], LEVEL_NAMES[level], self.llm_queue, self.render_queue,
+        )
+        self.level = level
+        self._entered_at = now
+        self._transitions[level] += 1
+
+    def admit(self) -> int:
+        """Level for a new generation; raises ``OverloadRejected`` at the last level."""
+        level = self.evaluate()
+        if level >= LEVEL_REJECT:
+            with self._lock:
+                self.rejected += 1
+            raise OverloadRejected(self.config.retry_after_seconds)
+        return level
+
+    def record_degraded(self, level: int) -> None:
+        with self._lock:
+            self._degraded[level] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            seconds = dict(self._seconds)
+            seconds[self.level] += self._clock() - self._entered_at
+            return {
+                "level": self.level,
+                "level_name": LEVEL_NAMES[self.level],
+                "llm_queue": self.llm_queue,
+                "render_queue": self.render_queue,
+                "transitions": {LEVEL_NAMES[level]: count for level, count in self._transitions.items()},
+                "seconds_in_level": {LEVEL_NAMES[level]: value for level, value in seconds.items()},
+                "degraded_calls": {LEVEL_NAMES[level]: count for level, count in self._degraded.items()},
+                "rejected": self.rejected,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_overload_controller() -> OverloadController:
+    return OverloadController(settings.overload)
+
+
+__all__ = [
+    "LEVEL_DEFER_DIAGRAM",
+    "LEVEL_FAST_MODEL",
+    "LEVEL_NAMES",
+    "LEVEL_NORMAL",
+    "LEVEL_REJECT",
+    "LEVEL_SHORT_OUTPUT",
+    "OverloadController",
+    "OverloadRejected",
+    "get_overload_controller",
+]
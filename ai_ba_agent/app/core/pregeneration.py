@@ -0,0 +1,146 @@
+"""Speculative background generation of the document bundle.
+
+Documents used to start only when the user clicked "Сгенерировать отчет",
+so the whole pipeline ran while they waited. ``Pregenerator`` starts the
+bundle in the background as soon as the dialog state is complete, keyed by
+``ConversationState.version`` and the selected model. Any change of the
+state or the model cancels the running job through its cancel event, so it
+stops at the next governor wait or between documents. The button then
+takes the finished bundle or joins the job in flight.
+
+Jobs run at batch priority and are not started while the overload
+controller degrades generation. A job joined by the user is promoted to
+document priority for its remaining calls.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+from app.config import settings
+from app.core.call_context import (
+    PROFILE_BATCH,
+    DeadlineExceeded,
+    call_context,
+    deadline_after,
+    remaining_time,
+    run_in_context,
+)
+from app.core.orchestrator import DocumentBundle, Orchestrator
+from app.core.overload import LEVEL_NORMAL, get_overload_controller
+from app.utils.logger import logger
+from app.utils.state import ConversationState
+
+# Builds the orchestrator for a model name
+OrchestratorFactory = Callable[[str], Orchestrator]
+
+
+@lru_cache(maxsize=1)
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=settings.pregeneration.workers, thread_name_prefix="pregenerate")
+
+
+@dataclass(eq=False)
+class PregenerationJob:
+    version: int
+    model_name: str
+    future: Future
+    cancel: threading.Event = field(default_factory=threading.Event)
+    promoted: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def key(self) -> Tuple[int, str]:
+        return self.version, self.model_name
+
+
+class Pregenerator:
+    """One session's background generation job."""
+
+    def __init__(
+        self,
+        orchestrator_factory: OrchestratorFactory = lambda model_name: Orchestrator(model_name=model_name),
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.orchestrator_factory = orchestrator_factory
+        self.executor = executor or _executor()
+        self._job: Optional[PregenerationJob] = None
+        self._lock = threading.Lock()
+        self.started = 0
+        self.cancelled = 0
+        self.joined = 0
+
+    def sync(self, state: ConversationState, model_name: str) -> None:
+        """Cancel a job for another version or model; start one for a complete state."""
+        with self._lock:
+            job = self._job
+            if job is not None and job.key == (state.version, model_name):
+                return
+            self._cancel(job)
+            if not settings.pregeneration.enabled or not state.is_complete():
+                return
+            if get_overload_controller().evaluate() != LEVEL_NORMAL:
+                return
+            self._job = self._start(state, model_name)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel(self._job)
+
+    def _cancel(self, job: Optional[PregenerationJob]) -> None:
+        self._job = None
+        if job is None or job.future.done():
+            return
+        job.cancel.set()
+        job.future.cancel()
+        self.cancelled += 1
+        logger.info("Cancelled background generation for state version %s", job.version)
+
+    def _start(self, state: ConversationState, model_name: str) -> PregenerationJob:
+        # The session keeps editing its state; the job works on a copy
+        snapshot = ConversationState(answers=dict(state.answers))
+        cancel, promoted = threading.Event(), threading.Event()
+
+        def generate() -> DocumentBundle:
+            with call_context(profile=PROFILE_BATCH, cancel=cancel, promoted=promoted), deadline_after(
+                settings.timeouts.document_deadline_seconds
+            ):
+                return self.orchestrator_factory(model_name).generate_documents(snapshot)
+
+        future = self.executor.submit(run_in_context(generate))
+        self.started += 1
+        logger.info("Started background generation for state version %s", state.version)
+        return PregenerationJob(state.version, model_name, future, cancel, promoted)
+
+    def join(self, state: ConversationState, model_name: str) -> Optional[DocumentBundle]:
+        """Bundle of the job for this version and model, waiting while it runs.
+
+        Returns None when there is no such job or it failed, so the caller
+        generates in the foreground. Waits no longer than the caller's deadline.
+        """
+        with self._lock:
+            job = self._job
+        if job is None or job.key != (state.version, model_name):
+            return None
+        job.promoted.set()
+        try:
+            bundle = job.future.result(timeout=remaining_time())
+        except FutureTimeout as exc:
+            raise DeadlineExceeded("deadline passed while waiting for background generation") from exc
+        except Exception as exc:
+            logger.warning("Background generation failed, generating in the foreground: %s", exc)
+            return None
+        self.joined += 1
+        return bundle
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self._job is not None and not self._job.future.done()
+
+
+__all__ = ["Pregenerator", "PregenerationJob"]
@@ -0,0 +1,76 @@
+"""Prefix-stable prompt assembly.
+
+Every prompt is split into a static prefix (system prompt, document template,
+rules) that is byte-identical between calls and a variable suffix (collected
+context, history, user message). Providers reuse work for a repeated prefix:
+Gemini implicit/explicit context caching, Ollama and llama.cpp prompt caches,
+and KV-cache reuse in the transformers backend. ``prefix_hash`` lets engines
+key their caches without comparing thousands of characters.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; Cyrillic text averages about three characters per token."""
+    return max(1, len(text) // 3)
+
+
+def prefix_hash(prefix: str) -> str:
+    """Short content hash of a static prompt prefix."""
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """A built prompt: static ``prefix`` followed by the variable ``suffix``.
+
+    ``response_format="json"`` tells engines that can constrain decoding
+    (llama.cpp grammars) that only a JSON object is expected.
+    """
+
+    prefix: str
+    suffix: str
+    response_format: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+    @property
+    def prefix_hash(self) -> str:
+        return prefix_hash(self.prefix)
+
+    def __str__(self) -> str:
+        return self.text
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """Static prefix plus a ``str.format`` template for the suffix.
+
+    The prefix is used verbatim (it is never formatted), so it may contain
+    literal braces such as JSON examples.
+    """
+
+    prefix: str
+    suffix: str
+    response_format: Optional[str] = None
+
+    @property
+    def prefix_hash(self) -> str:
+        return prefix_hash(self.prefix)
+
+    def build(self, **values: object) -> Prompt:
+        return Prompt(self.prefix, self.suffix.format(**values), self.response_format)
+
+    def format(self, **values: object) -> str:
+        """Full prompt text, for callers that still work with plain strings."""
+        return self.build(**values).text
+
+
+__all__ = ["Prompt", "PromptTemplate", "estimate_tokens", "prefix_hash"]
@@ -1,7 +1,13 @@
-"""Prompt templates for BRD, Use Case, User Stories and PlantUML."""
+"""Prompt templates for BRD, Use Case, User Stories and PlantUML.
+
+Each template is a ``PromptTemplate``: a static prefix (system prompt,
+markdown template, rules) shared byte-for-byte by all calls, and a short
+suffix with the variable context, so provider-side prefix caches can hit.
+"""
 
 from pathlib import Path
 
+from app.core.prompt_builder import PromptTemplate
 from app.core.templates import load_template
 
 SYSTEM_PROMPT = """Ты — опытный бизнес-аналитик.
@@ -31,12 +37,10 @@ BRD_MARKDOWN_TEMPLATE = load_template("brd")
 USECASE_MARKDOWN_TEMPLATE = load_template("usecase")
 USERSTORIES_MARKDOWN_TEMPLATE = load_template("userstories")
 
-BRD_TEMPLATE = (
-    SYSTEM_PROMPT
+BRD_TEMPLATE = PromptTemplate(
+    prefix=SYSTEM_PROMPT
     + f"""
-Сформируй Business Requirements Document (BRD) по следующему контексту:
-
-{{context}}
+Сформируй Business Requirements Document (BRD) по контексту, приведенному в конце.
 
 ОБЯЗАТЕЛЬНО используй ТОЧНО такую же структуру и форматирование как в шаблоне ниже.
 
@@ -57,15 +61,18 @@ BRD_TEMPLATE = (
 - Для раздела Scope: используй поля "В рамках" и "Вне рамок" из контекста
 - Раздел 7 - это "Риски", раздел 8 - это "Нефункциональные требования" - ОБЯЗАТЕЛЬНО включи оба раздела
 - Продолжай нумерацию последовательно: если последний заголовок был 1.2, следующий должен быть 2.
-"""
+""",
+    suffix="""
+Контекст:
+
+{context}
+""",
 )
 
-USE_CASE_TEMPLATE = (
-    SYSTEM_PROMPT
+USE_CASE_TEMPLATE = PromptTemplate(
+    prefix=SYSTEM_PROMPT
     + f"""
-Сформируй Use Case по следующему контексту:
-
-{{context}}
+Сформируй Use Case по контексту, приведенному в конце.
 
 ОБЯЗАТЕЛЬНО используй ТОЧНО такую же структуру и форматирование как в шаблоне ниже.
 
@@ -79,15 +86,18 @@ USE_CASE_TEMPLATE = (
 - КРИТИЧЕСКИ ВАЖНО: ВСЕ заголовки должны быть пронумерованы последовательно: ## 1. Название, ## 2. Акторы, ## 3. Предусловия, ## 4. Основной поток, ## 5. Альтернативные потоки, ## 6. Постусловия
 - Подзаголовки в разделе 5 должны быть: ### 5.1 [Название], ### 5.2 [Название] - с нумерацией
 - НЕ используй нумерацию только в одном месте - либо везде, либо нигде. В данном случае - ВЕЗДЕ с нумерацией
-"""
+""",
+    suffix="""
+Контекст:
+
+{context}
+""",
 )
 
-USER_STORIES_TEMPLATE = (
-    SYSTEM_PROMPT
+USER_STORIES_TEMPLATE = PromptTemplate(
+    prefix=SYSTEM_PROMPT
     + f"""
-Сгенерируй до 5 user stories по следующему контексту:
-
-{{context}}
+Сгенерируй до 5 user stories по контексту, приведенному в конце.
 
 ОБЯЗАТЕЛЬНО используй ТОЧНО такую же структуру и форматирование как в шаблоне ниже.
 
@@ -99,10 +109,16 @@ USER_STORIES_TEMPLATE = (
 - Заполни все поля реальными данными из контекста
 - СТРОГО следуй структуре заголовков из шаблона - используй ТОЧНО такую же нумерацию (1., 1.1, 2., 2.1, и т.д.)
 - Продолжай нумерацию последовательно
-"""
+""",
+    suffix="""
+Контекст:
+
+{context}
+""",
 )
 
-PLANTUML_DIAGRAM_TYPE_ANALYSIS = """Ты — эксперт по анализу бизнес-процессов и выбору типов диаграмм PlantUML.
+PLANTUML_DIAGRAM_TYPE_ANALYSIS = PromptTemplate(
+    prefix="""Ты — эксперт по анализу бизнес-процессов и выбору типов диаграмм PlantUML.
 
 Проанализируй предоставленный контекст проекта и определи, какой тип (или комбинацию типов) PlantUML диаграмм лучше всего подходит для визуализации.
 
@@ -116,12 +132,15 @@ PLANTUML_DIAGRAM_TYPE_ANALYSIS = """Ты — эксперт по анализу
 Верни ТОЛЬКО название типа диаграммы (activity, sequence, usecase, state, component) или "activity" по умолчанию.
 Если нужна комбинация, верни основной тип, который лучше всего описывает процесс.
 
-Контекст:
+""",
+    suffix="""Контекст:
 {context}
 
-Тип диаграммы:"""
+Тип диаграммы:""",
+)
 
-PLANTUML_TEMPLATE = """Ты — эксперт по PlantUML диаграммам. Твоя задача — создать PlantUML код для диаграммы типа: {diagram_type}
+PLANTUML_TEMPLATE = PromptTemplate(
+    prefix="""Ты — эксперт по PlantUML диаграммам. Твоя задача — создать PlantUML код для диаграммы типа, указанного в конце.
 
 КРИТИЧЕСКИ ВАЖНО:
 - Верни ТОЛЬКО код PlantUML, БЕЗ markdown блоков, БЕЗ объяснений, БЕЗ текста до или после кода
@@ -129,7 +148,7 @@ PLANTUML_TEMPLATE = """Ты — эксперт по PlantUML диаграмма
 - Начни сразу с @startuml и закончи @enduml
 - Это ДОЛЖЕН БЫТЬ КОД, а не документ!
 
-На основе контекста создай PlantUML диаграмму типа "{diagram_type}".
+На основе контекста создай PlantUML диаграмму указанного типа.
 
 ПРАВИЛЬНЫЕ ФОРМАТЫ ДИАГРАММ:
 
@@ -221,7 +240,7 @@ component [База данных]
 9. Покажи процесс детально - лучше больше деталей, чем слишком упрощенная схема
 10. НЕ используй fork/endfork в activity diagram - они часто вызывают ошибки синтаксиса. Используй только if/then/else/endif
 
-ВАЖНО: Используй синтаксис ТОЛЬКО для выбранного типа диаграммы "{diagram_type}".
+ВАЖНО: Используй синтаксис ТОЛЬКО для выбранного типа диаграммы.
 
 Для ACTIVITY:
 - Используй: start, stop, :действие;, if/then/else/endif
@@ -248,13 +267,35 @@ component [База данных]
 - Для ACTIVITY: все действия ДОЛЖНЫ заканчиваться точкой с запятой ;
 - НЕ смешивай синтаксис разных типов диаграмм!
 
-ПОМНИ: Цель - создать правильную диаграмму типа "{diagram_type}" с ключевыми элементами процесса!
-
+ПОМНИ: Цель - создать правильную диаграмму выбранного типа с ключевыми элементами процесса!
+""",
+    suffix="""
 Контекст:
 {context}
 
 Тип диаграммы для генерации: {diagram_type}
-"""
+""",
+)
+
+ANALYTICAL_QA_TEMPLATE = PromptTemplate(
+    prefix="""Ты — опытный бизнес-аналитик. У тебя есть полная информация о проекте, собранная в ходе диалога с пользователем.
+
+Проанализируй вопрос пользователя на основе собранных данных (приведены ниже) и дай развернутый, полезный ответ. 
+Если в вопросе есть что-то, что не покрыто собранными данными, честно скажи об этом и предложи, как можно дополнить информацию.
+
+Ответ должен быть:
+- Конкретным и основанным на собранных данных
+- Полезным для пользователя
+- Написанным на русском языке
+- Структурированным (используй списки, если уместно)
+""",
+    suffix="""
+Собранные данные о проекте:
+{context}
+
+Вопрос пользователя: {question}
+""",
+)
 
 MOCK_COMPLETION_SUFFIX = (
     "_placeholder_\n\n"
@@ -269,5 +310,6 @@ __all__ = [
     "USER_STORIES_TEMPLATE",
     "PLANTUML_DIAGRAM_TYPE_ANALYSIS",
     "PLANTUML_TEMPLATE",
+    "ANALYTICAL_QA_TEMPLATE",
     "MOCK_COMPLETION_SUFFIX",
 ]
@@ -0,0 +1,281 @@
+"""Request-time failover between LLM providers.
+
+``RoutedEngine`` holds an ordered list of real provider engines. Every call
+records the outcome and latency in a process-wide ``ProviderHealth`` kept
+per provider and model, so the fast tier and the selected model of the same
+provider trip their circuits independently; a
+streak of failures opens the provider's circuit so later requests skip it
+instead of waiting for its timeout. Traffic goes to the healthy provider with
+the lowest p95 latency, falling through to the next one on error. A
+background prober sends a tiny request to open circuits after a cool-down
+and closes them again once the provider answers.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.config import RoutingSettings, settings
+from app.core.call_context import CallCancelled, DeadlineExceeded, current_call, remaining_time
+from app.core.governor import LLMQueueTimeout
+from app.core.llm_engine import LLMEngine
+from app.core.prompt_builder import Prompt
+from app.utils.logger import logger
+
+Clock = Callable[[], float]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+PROBE_PROMPT = "Ответь одним словом: ok"
+
+# Errors that may be the call's own rather than the provider's: engines also
+# raise DeadlineExceeded for their provider I/O timeouts, see ``_caller_gave_up``
+CALLER_ERRORS = (CallCancelled, DeadlineExceeded, LLMQueueTimeout)
+
+# Health is kept per (provider, model); model is None for engines without one
+HealthKey = Tuple[str, Optional[str]]
+
+
+def _caller_gave_up(exc: Exception) -> bool:
+    """True when ``exc`` ended the call itself, so it is not held against the provider.
+
+    A queue timeout never reached the provider; a cancellation or timeout only
+    counts as the caller's once its own cancel event is set or its own deadline
+    has passed. A provider that hangs until its I/O timeout is a failure.
+    """
+    if not isinstance(exc, CALLER_ERRORS):
+        return False
+    if isinstance(exc, LLMQueueTimeout):
+        return True
+    cancel = current_call().cancel
+    if cancel is not None and cancel.is_set():
+        return True
+    remaining = remaining_time()
+    return remaining is not None and remaining <= 0
+
+
+def _health_name(key: HealthKey) -> str:
+    provider, model = key
+    return provider if model is None else f"{provider}/{model}"
+
+
+class ProviderHealth:
+    """Sliding window of call outcomes and the circuit state of one provider."""
+
+    def __init__(self, name: str, config: RoutingSettings, clock: Clock = time.monotonic):
+        self.name = name
+        self.config = config
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self._clock = clock
+        self._samples: Deque[Tuple[bool, float]] = deque(maxlen=config.window)
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            self._samples.append((ok, latency))
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != CLOSED:
+                    logger.info("Provider %s recovered, closing circuit", self.name)
+                self.state = CLOSED
+                self.opened_at = None
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.config.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(
+                        "Opening circuit for %s after %d consecutive failures",
+                        self.name, self.consecutive_failures,
+                    )
+                self.state = OPEN
+                self.opened_at = self._clock()
+
+    @property
+    def available(self) -> bool:
+        return self.state == CLOSED
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for ok, _ in self._samples if not ok) / len(self._samples)
+
+    @property
+    def p95_latency(self) -> Optional[float]:
+        """95th percentile latency of successful calls, None until one succeeded."""
+        with self._lock:
+            latencies = sorted(latency for ok, latency in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+
+    def begin_probe(self) -> bool:
+        """Move an open circuit whose cool-down passed to half-open."""
+        with self._lock:
+            if self.state != OPEN or self.opened_at is None:
+                return False
+            if self._clock() - self.opened_at < self.config.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate, 3),
+            "p95_latency": self.p95_latency,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class ProviderRouter:
+    """Process-wide provider health and the background circuit prober."""
+
+    def __init__(self, config: RoutingSettings, clock: Clock = time.monotonic):
+        self.config = config
+        self._clock = clock
+        self._health: Dict[HealthKey, ProviderHealth] = {}
+        self._probe_engines: Dict[HealthKey, LLMEngine] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def health(self, provider: str, model: Optional[str] = None) -> ProviderHealth:
+        key = (provider, model)
+        with self._lock:
+            health = self._health.get(key)
+            if health is None:
+                health = ProviderHealth(_health_name(key), self.config, self._clock)
+                self._health[key] = health
+            return health
+
+    def register(self, provider: str, engine: LLMEngine, model: Optional[str] = None) -> None:
+        """Remember an engine the prober can use for ``provider`` and ``model``."""
+        with self._lock:
+            self._probe_engines.setdefault((provider, model), engine)
+
+    def start_probing(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="provider-prober", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def probe_once(self) -> None:
+        with self._lock:
+            engines = list(self._probe_engines.items())
+        for key, engine in engines:
+            health = self.health(*key)
+            if not health.begin_probe():
+                continue
+            started = self._clock()
+            try:
+                engine.ask(PROBE_PROMPT)
+            except Exception as exc:
+                logger.info("Probe of %s failed: %s", health.name, exc)
+                health.record(False, self._clock() - started)
+            else:
+                health.record(True, self._clock() - started)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.config.probe_interval_seconds):
+            self.probe_once()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            health = dict(self._health)
+        return {item.name: item.snapshot() for item in health.values()}
+
+
+@lru_cache(maxsize=1)
+def get_router() -> ProviderRouter:
+    return ProviderRouter(settings.routing)
+
+
+class RoutedEngine(LLMEngine):
+    """Sends each call to the healthiest, fastest provider and fails over on error."""
+
+    def __init__(self, engines: List[Tuple[str, LLMEngine]], router: Optional[ProviderRouter] = None):
+        if not engines:
+            raise ValueError("RoutedEngine needs at least one provider engine")
+        self.engines = engines
+        self.router = router or get_router()
+        self.last_provider = engines[0][0]
+        self._last_engine = engines[0][1]
+        for provider, engine in engines:
+            self.router.register(provider, engine, self._model(engine))
+
+    def __getattr__(self, name: str) -> Any:
+        # Provider-specific attributes of whichever engine answered last
+        return getattr(self._last_engine, name)
+
+    @staticmethod
+    def _model(engine: LLMEngine) -> Optional[str]:
+        return getattr(engine, "model_name", None)
+
+    def _health(self, provider: str, engine: LLMEngine) -> ProviderHealth:
+        return self.router.health(provider, self._model(engine))
+
+    def route(self) -> List[Tuple[str, LLMEngine]]:
+        """Healthy providers, fastest first; all providers if every circuit is open."""
+        ranked = []
+        for index, (provider, engine) in enumerate(self.engines):
+            health = self._health(provider, engine)
+            if health.available:
+                latency = health.p95_latency
+                # Unmeasured providers go first so each gets a latency estimate;
+                # providers that have only failed so far go last
+                failing = latency is None and health.error_rate > 0
+                ranked.append((failing, latency or 0.0, index, provider, engine))
+        if not ranked:
+            return list(self.engines)
+        return [(provider, engine) for _, _, _, provider, engine in sorted(ranked)]
+
+    def _routed(self, call: Callable[[LLMEngine], str]) -> str:
+        last_error: Optional[Exception] = None
+        for provider, engine in self.route():
+            health = self._health(provider, engine)
+            started = self.router._clock()
+            try:
+                result = call(engine)
+            except Exception as exc:
+                if _caller_gave_up(exc):
+                    raise
+                health.record(False, self.router._clock() - started)
+                logger.warning("Provider %s failed, trying the next one: %s", provider, exc)
+                last_error = exc
+                continue
+            health.record(True, self.router._clock() - started)
+            self.last_provider = provider
+            self._last_engine = engine
+            return result
+        assert last_error is not None
+        raise last_error
+
+    def ask(self, prompt: str) -> str:
+        return self._routed(lambda engine: engine.ask(prompt))
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        return self._routed(lambda engine: engine.ask_prompt(prompt))
+
+    def warm_up(self) -> None:
+        for _, engine in self.engines:
+            engine.warm_up()
+
+
+__all__ = ["ProviderHealth", "ProviderRouter", "RoutedEngine", "get_router"]
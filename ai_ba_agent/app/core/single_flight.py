@@ -0,0 +1,142 @@
+"""Coalescing of identical in-flight LLM requests.
+
+When several sessions send the same prompt with the same generation
+settings at the same time (a scenario auto-fill, a demo click, two tabs of
+one user), only the first caller goes to the provider; the others wait for
+its result. Nothing is cached after the call completes: a later identical
+request is sent again.
+
+A leader that fails only because of its own cancel event, deadline or queue
+timeout does not fail its followers: each one with time left retries, and one
+of them becomes the new leader.
+Calls of different priorities are not coalesced, so an interactive call
+never waits behind a batch call at batch priority.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import lru_cache
+from typing import Any, Callable, Dict, Tuple
+
+from app.config import settings
+from app.core.call_context import (
+    CallCancelled,
+    DeadlineExceeded,
+    check_deadline,
+    current_call,
+    output_limit,
+    remaining_time,
+)
+from app.core.governor import LLMQueueTimeout
+from app.core.llm_engine import LLMEngine
+from app.core.prompt_builder import Prompt
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Failures of the leader's own call rather than of the request, see module docstring
+LEADER_ERRORS = (CallCancelled, DeadlineExceeded, LLMQueueTimeout)
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace runs so formatting noise does not split keys."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares its outcome with duplicates."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """The in-flight future for ``key`` and whether the caller leads it."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def do(self, key: str, call: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            # Followers keep their own deadline while waiting for the leader
+            try:
+                return future.result(timeout=remaining_time())
+            except FutureTimeout as exc:
+                raise DeadlineExceeded("deadline passed while waiting for an identical call") from exc
+            except LEADER_ERRORS:
+                # The leader gave up for its own reasons; retry unless we must too
+                check_deadline()
+
+        try:
+            result = call()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
+
+
+@lru_cache(maxsize=1)
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+class SingleFlightEngine(LLMEngine):
+    """Shares in-flight calls of ``engine`` with concurrent identical calls."""
+
+    def __init__(self, engine: LLMEngine, provider: str, flight: SingleFlight | None = None):
+        self.engine = engine
+        self.provider = provider
+        self.flight = flight or get_single_flight()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.engine, name)
+
+    def request_key(self, text: str, response_format: str | None = None) -> str:
+        model_cfg = settings.model
+        parts = [
+            self.provider,
+            str(getattr(self.engine, "model_name", model_cfg.model_name)),
+            f"{model_cfg.temperature}/{model_cfg.top_p}/{output_limit(model_cfg.max_new_tokens)}",
+            str(current_call().priority),
+            response_format or "",
+            normalize_prompt(text),
+        ]
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def ask(self, prompt: str) -> str:
+        return self.flight.do(self.request_key(prompt), lambda: self.engine.ask(prompt))
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        key = self.request_key(prompt.text, prompt.response_format)
+        return self.flight.do(key, lambda: self.engine.ask_prompt(prompt))
+
+    def warm_up(self) -> None:
+        self.engine.warm_up()
+
+
+__all__ = ["SingleFlight", "SingleFlightEngine", "get_single_flight", "normalize_prompt"]
@@ -0,0 +1,130 @@
+"""Task-aware model tiering and per-task latency accounting.
+
+Diagram-type classification, JSON field extraction and interpretation
+merges do not need the model the user picked for documents. ``TieredEngine``
+reads the task class from ``current_call()`` and sends it to the fast tier
+or the selected tier according to ``settings.tiering.tasks``. Every call's
+latency is recorded per task and model in ``TaskLatencyStats``, so the
+savings can be compared directly.
+
+Under load (see ``app.core.overload``) the engine also shortens document
+and QA output and, from the fast-model level on, sends every task to the
+fast tier.
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from app.config import TieringSettings, settings
+from app.core.call_context import call_context, current_call
+from app.core.llm_engine import LLMEngine
+from app.core.overload import LEVEL_FAST_MODEL, LEVEL_NORMAL, OverloadController, get_overload_controller
+from app.core.prompt_builder import Prompt
+
+WINDOW = 500
+
+
+class TaskLatencyStats:
+    """Latency samples per (task, model)."""
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._calls: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, task: str, model: str, seconds: float) -> None:
+        key = (task, model)
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+            self._calls[key] = self._calls.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """``{task: {model: {calls, p50, p95, total}}}`` with seconds over the window."""
+        with self._lock:
+            items = [(key, sorted(samples), self._calls[key]) for key, samples in self._samples.items()]
+        report: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (task, model), samples, calls in items:
+            report.setdefault(task, {})[model] = {
+                "calls": calls,
+                "p50": statistics.median(samples),
+                "p95": samples[min(len(samples) - 1, int(0.95 * len(samples)))],
+                "total": sum(samples),
+            }
+        return report
+
+
+@lru_cache(maxsize=1)
+def get_task_stats() -> TaskLatencyStats:
+    return TaskLatencyStats()
+
+
+class TieredEngine(LLMEngine):
+    """Dispatches each call to the fast or the selected engine by task class."""
+
+    def __init__(
+        self,
+        selected: LLMEngine,
+        fast: Optional[LLMEngine] = None,
+        config: Optional[TieringSettings] = None,
+        stats: Optional[TaskLatencyStats] = None,
+        overload: Optional[OverloadController] = None,
+    ):
+        self.selected = selected
+        self.fast = fast or selected
+        self.config = config or settings.tiering
+        self.stats = stats or get_task_stats()
+        self.overload = overload or get_overload_controller()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.selected, name)
+
+    def engine_for(self, task: str, level: int = LEVEL_NORMAL) -> LLMEngine:
+        if level >= LEVEL_FAST_MODEL:
+            return self.fast
+        return self.fast if self.config.enabled and self.config.tier_for(task) == "fast" else self.selected
+
+    def _output_limit(self, task: str, level: int) -> Optional[int]:
+        overload_cfg = self.overload.config
+        if level == LEVEL_NORMAL or task not in overload_cfg.short_output_tasks:
+            return None
+        limit = max(1, int(settings.model.max_new_tokens * overload_cfg.short_output_ratio))
+        outer = current_call().max_new_tokens
+        return limit if outer is None else min(limit, outer)
+
+    def _tiered(self, call: Callable[[LLMEngine], str]) -> str:
+        task = current_call().task
+        level = self.overload.evaluate()
+        engine = self.engine_for(task, level)
+        limit = self._output_limit(task, level)
+        if level != LEVEL_NORMAL:
+            self.overload.record_degraded(level)
+        started = time.perf_counter()
+        try:
+            if limit is None:
+                return call(engine)
+            with call_context(max_new_tokens=limit):
+                return call(engine)
+        finally:
+            model = str(getattr(engine, "model_name", None) or "unknown")
+            self.stats.record(task, model, time.perf_counter() - started)
+
+    def ask(self, prompt: str) -> str:
+        return self._tiered(lambda engine: engine.ask(prompt))
+
+    def ask_prompt(self, prompt: Prompt) -> str:
+        return self._tiered(lambda engine: engine.ask_prompt(prompt))
+
+    def warm_up(self) -> None:
+        self.selected.warm_up()
+        if self.fast is not self.selected:
+            self.fast.warm_up()
+
+
+__all__ = ["TaskLatencyStats", "TieredEngine", "get_task_stats"]
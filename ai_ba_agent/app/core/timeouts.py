@@ -0,0 +1,113 @@
+"""Adaptive per-call timeouts.
+
+Instead of a fixed timeout per provider, each call gets
+``overhead + (max_new_tokens / decode speed + prompt tokens / prefill speed)
+* safety_factor``, clamped to the ceiling of its call profile and to the
+time left before the call's deadline. Speeds are moving averages per
+provider and model, so the fast and the selected tier of one provider do
+not share an estimate. Engines report completed generations with
+``observe_generation``; those that time prefill separately (Ollama,
+transformers) keep the two speeds apart.
+"""
+
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from app.config import TimeoutSettings, settings
+from app.core.call_context import DeadlineExceeded, current_call, remaining_time
+
+# Weight of the newest observation in the tokens/s moving averages
+EWMA_ALPHA = 0.2
+# Prefill speed relative to decode speed until a model reports prefill timing
+PREFILL_SPEEDUP = 10.0
+
+Key = Tuple[str, str]
+
+
+class AdaptiveTimeouts:
+    """Tokens/s moving averages per (provider, model) and the timeouts derived from them."""
+
+    def __init__(self, config: TimeoutSettings):
+        self.config = config
+        self._decode: Dict[Key, float] = {}
+        self._prefill: Dict[Key, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _update(speeds: Dict[Key, float], key: Key, tokens: int, seconds: float) -> None:
+        if tokens <= 0 or seconds <= 0:
+            return
+        speed = tokens / seconds
+        previous = speeds.get(key)
+        speeds[key] = speed if previous is None else previous + EWMA_ALPHA * (speed - previous)
+
+    def observe(
+        self,
+        provider: str,
+        model: str,
+        completion_tokens: int,
+        seconds: float,
+        prompt_tokens: int = 0,
+        prefill_seconds: float = 0.0,
+    ) -> None:
+        """Record a call; ``seconds`` is decode time if ``prefill_seconds`` is given, else wall time."""
+        key = (provider, model)
+        with self._lock:
+            self._update(self._decode, key, completion_tokens, seconds)
+            self._update(self._prefill, key, prompt_tokens, prefill_seconds)
+
+    def tokens_per_second(self, provider: str, model: str) -> Optional[float]:
+        with self._lock:
+            return self._decode.get((provider, model))
+
+    def timeout_for(
+        self, provider: str, model: str, profile: str, max_new_tokens: int, prompt_tokens: int = 0
+    ) -> float:
+        with self._lock:
+            decode = self._decode.get((provider, model))
+            prefill = self._prefill.get((provider, model))
+        if decode is None:
+            estimate = self.config.default_seconds
+        else:
+            prefill = prefill or decode * PREFILL_SPEEDUP
+            seconds = max_new_tokens / decode + prompt_tokens / prefill
+            estimate = self.config.overhead_seconds + seconds * self.config.safety_factor
+        return min(max(estimate, self.config.min_seconds), self.config.max_for(profile))
+
+
+@lru_cache(maxsize=1)
+def get_timeouts() -> AdaptiveTimeouts:
+    return AdaptiveTimeouts(settings.timeouts)
+
+
+def request_timeout(
+    provider: str, model: str, max_new_tokens: Optional[int] = None, prompt_tokens: int = 0
+) -> float:
+    """Timeout for the current call; raises if its deadline already passed."""
+    context = current_call()
+    timeout = get_timeouts().timeout_for(
+        provider, model, context.profile, max_new_tokens or settings.model.max_new_tokens, prompt_tokens
+    )
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded(f"{provider}: deadline passed before the call started")
+    return min(timeout, remaining)
+
+
+def observe_generation(
+    provider: str,
+    model: str,
+    completion_tokens: int,
+    seconds: float,
+    prompt_tokens: int = 0,
+    prefill_seconds: float = 0.0,
+) -> None:
+    get_timeouts().observe(provider, model, completion_tokens, seconds, prompt_tokens, prefill_seconds)
+
+
+__all__ = ["AdaptiveTimeouts", "get_timeouts", "observe_generation", "request_timeout"]
@@ -1,10 +1,18 @@
 """Exports for generator modules."""
 
-from . import brd_generator, pdf_generator, plantuml_generator, usecase_generator, userstories_generator
+from . import (
+    brd_generator,
+    pdf_generator,
+    pdf_service,
+    plantuml_generator,
+    usecase_generator,
+    userstories_generator,
+)
 
 __all__ = [
     "brd_generator",
     "pdf_generator",
+    "pdf_service",
     "plantuml_generator",
     "usecase_generator",
     "userstories_generator",
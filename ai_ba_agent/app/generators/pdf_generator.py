@@ -5,8 +5,10 @@ from __future__ import annotations
 import io
 import os
 import re
+import tempfile
 from datetime import datetime
-from typing import Dict, List
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Union
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -15,6 +17,7 @@ from reportlab.lib.units import mm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import (
+    LongTable,
     Paragraph,
     Spacer,
     Table,
@@ -23,6 +26,22 @@ from reportlab.platypus import (
     SimpleDocTemplate,
 )
 
+from app.config import settings
+from app.utils.image_prep import prepare_diagram_image
+from app.utils.logger import logger
+
+
+PdfOutput = Union[str, os.PathLike, IO[bytes]]
+
+# Documents up to this size stay in memory in markdown_to_pdf_spooled
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+# Column sizing for large tables: characters are clamped to this range
+# before being turned into width weights
+MIN_COLUMN_CHARS = 4
+MAX_COLUMN_CHARS = 120
+MIN_COLUMN_WIDTH = 15 * mm
+
 
 # ReportLab's built-in Helvetica doesn't support Cyrillic well
 # We need to register a TTF font that supports Unicode/Cyrillic
@@ -387,11 +406,57 @@ def _parse_markdown_table(lines: List[str], start_idx: int) -> tuple[List[List[s
     return table_data, idx
 
 
-def _render_table(story: List, table_data: List[List[str]]) -> None:
-    """Render a markdown table in PDF."""
+def _compute_column_widths(table_data: List[List[str]], total_width: float) -> List[float]:
+    """Distribute ``total_width`` by per-column text-length statistics.
+
+    One pass over the cells collects the mean length of data cells and the
+    longest header word per column. Columns with long prose get more room,
+    short code-like columns (IDs, priorities) stay narrow instead of taking an
+    equal share and forcing very tall rows elsewhere.
+    """
+    num_cols = len(table_data[0])
+    totals = [0] * num_cols
+    header_words = [0] * num_cols
+    
+    for row_idx, row in enumerate(table_data):
+        for col_idx, cell in enumerate(row[:num_cols]):
+            if row_idx == 0:
+                header_words[col_idx] = max((len(word) for word in str(cell).split()), default=0)
+            else:
+                totals[col_idx] += len(str(cell))
+    
+    data_rows = max(1, len(table_data) - 1)
+    weights = []
+    for col_idx in range(num_cols):
+        mean_length = totals[col_idx] / data_rows
+        weight = min(max(mean_length, header_words[col_idx], MIN_COLUMN_CHARS), MAX_COLUMN_CHARS)
+        weights.append(weight)
+    
+    # Guarantee a minimum width, then share the rest proportionally
+    min_width = min(MIN_COLUMN_WIDTH, total_width / num_cols)
+    spare_width = total_width - min_width * num_cols
+    weight_sum = sum(weights)
+    return [min_width + spare_width * weight / weight_sum for weight in weights]
+
+
+def _render_table(
+    story: List,
+    table_data: List[List[str]],
+    large_table_rows: Optional[int] = None,
+) -> None:
+    """Render a markdown table in PDF.
+    
+    Tables with more than ``large_table_rows`` data rows (``pdf_large_table_rows``
+    from settings by default, 0 disables) are rendered as a single ``LongTable``
+    with a repeated header row and content-aware column widths.
+    """
     if not table_data:
         return
     
+    if large_table_rows is None:
+        large_table_rows = settings.orchestrator.pdf_large_table_rows
+    large_mode = bool(large_table_rows) and len(table_data) - 1 > large_table_rows
+    
     # Calculate table width to fit page
     page_width = A4[0] - 30*mm  # Page width minus margins
     num_cols = len(table_data[0]) if table_data else 1
@@ -443,7 +508,10 @@ def _render_table(story: List, table_data: List[List[str]]) -> None:
         para_data.append(para_row)
     
     # Create table with calculated column widths
-    col_widths = [page_width / num_cols] * num_cols
+    if large_mode:
+        col_widths = _compute_column_widths(table_data, page_width)
+    else:
+        col_widths = [page_width / num_cols] * num_cols
     
     # Style the table - less bold, better design (определяем ДО использования)
     style = TableStyle([
@@ -463,6 +531,14 @@ def _render_table(story: List, table_data: List[List[str]]) -> None:
         ('RIGHTPADDING', (0, 0), (-1, -1), 4),
     ])
     
+    if large_mode:
+        # LongTable раскладывает строки за один проход и повторяет заголовок на каждой странице
+        pdf_table = LongTable(para_data, colWidths=col_widths, repeatRows=1)
+        pdf_table.setStyle(style)
+        story.append(pdf_table)
+        story.append(Spacer(1, 6*mm))
+        return
+    
     # Разбиваем большие таблицы на части (максимум 30 строк за раз)
     MAX_ROWS_PER_TABLE = 30
     if len(para_data) > MAX_ROWS_PER_TABLE:
@@ -797,8 +873,17 @@ def _add_section(story: List, section_title: str, content: str, heading_counters
     story.append(Spacer(1, 10*mm))
 
 
-def markdown_to_pdf_bytes(sections: Dict[str, str], project_name: str = "Business Requirements Document") -> bytes:
-    """Generate professional PDF from markdown sections with full Unicode support."""
+def write_pdf(
+    sections: Dict[str, str],
+    output: PdfOutput,
+    project_name: str = "Business Requirements Document",
+) -> PdfOutput:
+    """Render markdown sections straight into ``output`` and return it.
+
+    ``output`` is a file path or a writable binary stream (an open file, a
+    ``SpooledTemporaryFile``, an HTTP response body). Nothing is buffered in
+    memory on top of what ReportLab itself keeps while building.
+    """
     global _document_heading_counters
     
     # Reset global heading counters for new document
@@ -806,11 +891,11 @@ def markdown_to_pdf_bytes(sections: Dict[str, str], project_name: str = "Busines
     
     from reportlab.platypus import Image as RLImage
     
-    buffer = io.BytesIO()
+    target = os.fspath(output) if isinstance(output, (str, os.PathLike)) else output
     
     # Create PDF document
     doc = SimpleDocTemplate(
-        buffer,
+        target,
         pagesize=A4,
         rightMargin=15*mm,
         leftMargin=15*mm,
@@ -849,37 +934,26 @@ def markdown_to_pdf_bytes(sections: Dict[str, str], project_name: str = "Busines
             png_bytes = render_plantuml_to_png(content)
             if png_bytes:
                 try:
-                    from PIL import Image as PILImage
-                    
                     # Calculate available dimensions
                     page_width = A4[0] - 30*mm  # Page width minus margins
                     page_height = A4[1] - 60*mm  # Page height minus margins (top + bottom)
                     
-                    # Get actual image dimensions
-                    img_buffer = io.BytesIO(png_bytes)
-                    pil_img = PILImage.open(img_buffer)
-                    img_width_pt, img_height_pt = pil_img.size
-                    
-                    # Convert pixels to points (1 pixel = 0.75 points approximately)
-                    # But better to use actual DPI - PIL images usually 72 DPI
-                    # So 1 pixel = 1 point at 72 DPI
-                    img_width_points = img_width_pt
-                    img_height_points = img_height_pt
-                    
-                    # Calculate scaling factors
-                    width_scale = page_width / img_width_points if img_width_points > 0 else 1
-                    height_scale = page_height / img_height_points if img_height_points > 0 else 1
-                    
-                    # Use the smaller scale to ensure image fits both dimensions
-                    scale = min(width_scale, height_scale, 1.0)  # Don't enlarge, only shrink
-                    
-                    # Calculate final dimensions
-                    final_width = img_width_points * scale
-                    final_height = img_height_points * scale
+                    # Size comes from the PNG header; oversized bitmaps are downsampled
+                    # to the target DPI instead of being embedded at full resolution
+                    orchestrator_cfg = settings.orchestrator
+                    prepared = prepare_diagram_image(
+                        png_bytes,
+                        max_width=page_width,
+                        max_height=page_height,
+                        dpi=orchestrator_cfg.pdf_image_dpi,
+                        quantize=orchestrator_cfg.pdf_image_quantize,
+                    )
                     
-                    # Create image from bytes with proper dimensions
-                    img_buffer.seek(0)  # Reset buffer position
-                    img = RLImage(img_buffer, width=final_width, height=final_height)
+                    img = RLImage(
+                        io.BytesIO(prepared.data),
+                        width=prepared.display_width,
+                        height=prepared.display_height,
+                    )
                     story.append(img)
                     story.append(Spacer(1, 4*mm))
                 except Exception as e:
@@ -911,8 +985,35 @@ def markdown_to_pdf_bytes(sections: Dict[str, str], project_name: str = "Busines
     # Build PDF
     doc.build(story)
     
-    buffer.seek(0)
-    return buffer.read()
+    return output
+
+
+def markdown_to_pdf_bytes(sections: Dict[str, str], project_name: str = "Business Requirements Document") -> bytes:
+    """Generate professional PDF from markdown sections with full Unicode support."""
+    buffer = io.BytesIO()
+    write_pdf(sections, buffer, project_name=project_name)
+    return buffer.getvalue()
+
+
+def markdown_to_pdf_spooled(
+    sections: Dict[str, str],
+    project_name: str = "Business Requirements Document",
+    directory: Optional[Path] = None,
+    max_memory: int = SPOOL_MAX_MEMORY,
+) -> IO[bytes]:
+    """Render into a spooled temp file and return it rewound for reading.
+
+    Small documents stay in memory, large ones roll over to ``directory``
+    (for example the artifact directory) instead of living in RAM.
+    """
+    spooled = tempfile.SpooledTemporaryFile(
+        max_size=max_memory,
+        mode="w+b",
+        dir=os.fspath(directory) if directory else None,
+    )
+    write_pdf(sections, spooled, project_name=project_name)
+    spooled.seek(0)
+    return spooled
 
 
-__all__ = ["markdown_to_pdf_bytes"]
+__all__ = ["markdown_to_pdf_bytes", "markdown_to_pdf_spooled", "write_pdf"]
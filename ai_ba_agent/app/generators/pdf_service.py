@@ -0,0 +1,278 @@
+"""Out-of-process PDF builder with a shared, content-addressed result cache.
+
+ReportLab layout is CPU-bound and holds the GIL, so building PDFs inside the
+Streamlit script thread freezes reruns of every other session. The service
+below runs builds in a ``ProcessPoolExecutor`` and keeps finished documents in a
+process-wide cache keyed by the bundle hash, so identical bundles coming from
+different sessions are built only once.
+
+Workers write the PDF straight into the artifact directory, so the bytes never
+travel back through the pool or sit in ``st.session_state``; downloads are
+served from an open file handle.
+
+Failed builds are remembered in a bounded LRU like the results, and a failed
+bundle is not rebuilt on every rerun: ``submit`` keeps reporting the failure
+until ``retry_seconds`` have passed since it happened.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import logger
+
+STATUS_MISSING = "missing"
+STATUS_PENDING = "pending"
+STATUS_BUILDING = "building"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class PdfBuildStatus:
+    """Snapshot of a PDF build, suitable for showing in the UI."""
+
+    key: str
+    state: str
+    error: Optional[str] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == STATUS_READY
+
+    @property
+    def is_failed(self) -> bool:
+        return self.state == STATUS_FAILED
+
+
+def bundle_hash(sections: Dict[str, str], project_name: str) -> str:
+    """Return a stable content hash for a document bundle.
+
+    Section order is part of the key because it defines page order in the PDF.
+    """
+    payload = json.dumps(
+        {"project_name": project_name, "sections": list(sections.items())},
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _build_pdf(sections: Dict[str, str], project_name: str, target: str) -> int:
+    """Worker entrypoint executed in a child process.
+
+    Writes to a temporary name and renames, so readers never see a partial file.
+    Returns the size of the written PDF.
+    """
+    from app.generators.pdf_generator import write_pdf
+
+    partial = f"{target}.{os.getpid()}.part"
+    try:
+        write_pdf(sections, partial, project_name=project_name)
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+    return os.path.getsize(target)
+
+
+class PdfBuildService:
+    """Builds PDFs in worker processes and caches the results by bundle hash."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_workers: int = 2,
+        cache_size: int = 32,
+        retry_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.retry_seconds = retry_seconds
+        self._clock = clock
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, Path]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        # Failed builds: key -> (error message, time of the failure)
+        self._errors: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.builds_started = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Builds scheduled or running and not yet published."""
+        with self._lock:
+            return len(self._in_flight)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the Streamlit server is multi-threaded, forking it is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info("Started PDF build pool with %s workers", self.max_workers)
+        return self._executor
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def _adopt_existing(self, key: str) -> bool:
+        """Pick up a PDF left in the artifact directory by an earlier process."""
+        path = self._path_for(key)
+        if key in self._in_flight or not path.exists():
+            return False
+        self._results[key] = path
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        while len(self._results) > self.cache_size:
+            _, path = self._results.popitem(last=False)
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def submit(self, sections: Dict[str, str], project_name: str) -> str:
+        """Schedule a build unless the bundle is already cached or in flight.
+
+        Returns the bundle hash used as the key for ``status`` and ``result``.
+        """
+        key = bundle_hash(sections, project_name)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return key
+            if key in self._in_flight or self._adopt_existing(key):
+                return key
+            failure = self._errors.get(key)
+            if failure is not None and self._clock() - failure[1] < self.retry_seconds:
+                return key
+            self._errors.pop(key, None)
+            future = self._get_executor().submit(
+                _build_pdf, dict(sections), project_name, str(self._path_for(key))
+            )
+            self._in_flight[key] = future
+            self.builds_started += 1
+        future.add_done_callback(lambda done, key=key: self._on_done(key, done))
+        logger.info("Scheduled PDF build %s", key[:12])
+        return key
+
+    def _on_done(self, key: str, future: Future) -> None:
+        """Publish a finished build; safe to call more than once."""
+        with self._lock:
+            if self._in_flight.get(key) is not future:
+                return
+            del self._in_flight[key]
+            try:
+                size = future.result()
+            except Exception as exc:
+                logger.error("PDF build %s failed: %s", key[:12], exc)
+                self._errors[key] = (str(exc), self._clock())
+                self._errors.move_to_end(key)
+                while len(self._errors) > self.cache_size:
+                    self._errors.popitem(last=False)
+                return
+            self._results[key] = self._path_for(key)
+            self._results.move_to_end(key)
+            self._evict()
+        logger.info("PDF build %s ready (%s bytes)", key[:12], size)
+
+    def status(self, key: str) -> PdfBuildStatus:
+        with self._lock:
+            if key in self._results or self._adopt_existing(key):
+                return PdfBuildStatus(key, STATUS_READY)
+            if key in self._errors:
+                return PdfBuildStatus(key, STATUS_FAILED, self._errors[key][0])
+            future = self._in_flight.get(key)
+        if future is None:
+            return PdfBuildStatus(key, STATUS_MISSING)
+        if future.done():
+            self._on_done(key, future)
+            return self.status(key)
+        return PdfBuildStatus(key, STATUS_BUILDING if future.running() else STATUS_PENDING)
+
+    def wait(self, key: str, timeout: Optional[float] = None) -> PdfBuildStatus:
+        """Block until the build finishes or ``timeout`` seconds pass."""
+        with self._lock:
+            future = self._in_flight.get(key)
+        if future is not None:
+            try:
+                future.exception(timeout=timeout)
+            except FutureTimeoutError:
+                pass
+        return self.status(key)
+
+    def result_path(self, key: str) -> Optional[Path]:
+        """Return the path of a finished PDF or ``None`` if it is not ready."""
+        with self._lock:
+            path = self._results.get(key)
+            if path is None or not path.exists():
+                return None
+            self._results.move_to_end(key)
+            return path
+
+    def open_result(self, key: str) -> Optional[BinaryIO]:
+        """Open a finished PDF for streaming; the caller closes the handle."""
+        path = self.result_path(key)
+        if path is None:
+            return None
+        try:
+            return path.open("rb")
+        except FileNotFoundError:
+            return None
+
+    def result(self, key: str) -> Optional[bytes]:
+        """Read a finished PDF into memory; prefer ``open_result`` for downloads."""
+        handle = self.open_result(key)
+        if handle is None:
+            return None
+        with handle:
+            return handle.read()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+@lru_cache(maxsize=1)
+def get_pdf_service() -> PdfBuildService:
+    """Return the process-wide PDF build service shared by all sessions."""
+    cfg = settings.orchestrator
+    return PdfBuildService(
+        cache_dir=cfg.pdf_cache_dir,
+        max_workers=cfg.pdf_workers,
+        cache_size=cfg.pdf_cache_size,
+        retry_seconds=cfg.pdf_retry_seconds,
+    )
+
+
+__all__ = [
+    "PdfBuildService",
+    "PdfBuildStatus",
+    "bundle_hash",
+    "get_pdf_service",
+    "STATUS_MISSING",
+    "STATUS_PENDING",
+    "STATUS_BUILDING",
+    "STATUS_READY",
+    "STATUS_FAILED",
+]
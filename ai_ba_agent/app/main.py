@@ -3,20 +3,56 @@
 from __future__ import annotations
 
 import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Iterator
+
 import streamlit as st
 
 from app.config import settings
 from app.core.dialog_manager import DialogManager
+from app.core import prompt_templates
+from app.core.call_context import PROFILE_INTERACTIVE, TASK_QA, DeadlineExceeded, call_context, deadline_after
+from app.core.governor import get_governor
+from app.core.hedging import get_hedge_policy
 from app.core.intelligent_dialog_manager import IntelligentDialogManager
 from app.core.llm_engine import create_engine
+from app.core.model_warmup import get_model_warmer
 from app.core.orchestrator import DocumentBundle, Orchestrator
+from app.core.overload import (
+    LEVEL_DEFER_DIAGRAM,
+    LEVEL_FAST_MODEL,
+    LEVEL_NORMAL,
+    LEVEL_REJECT,
+    LEVEL_SHORT_OUTPUT,
+    OverloadRejected,
+    get_overload_controller,
+)
+from app.core.pregeneration import Pregenerator
+from app.core.routing import get_router
+from app.core.single_flight import get_single_flight
+from app.core.tiering import get_task_stats
+from app.generators.pdf_service import STATUS_PENDING, get_pdf_service
+from app.utils.history import BoundedHistory
 from app.utils.logger import logger
 from app.utils.state import ConversationState, FIELD_SEQUENCE, field_label, FIELD_METADATA
 
 PAGE_TITLE = settings.app.name
 
+OVERLOAD_MESSAGES = {
+    LEVEL_SHORT_OUTPUT: "Высокая нагрузка: ответы и документы могут быть короче обычного.",
+    LEVEL_FAST_MODEL: "Высокая нагрузка: временно используется быстрая модель, качество ответов может быть ниже.",
+    LEVEL_DEFER_DIAGRAM: "Высокая нагрузка: диаграмма PlantUML не строится вместе с документами, её можно сгенерировать позже.",
+    LEVEL_REJECT: "Сервис перегружен: новые генерации документов временно не принимаются.",
+}
+
 
 def init_session_state() -> None:
+    # Preload the local model on the first session of the process
+    get_model_warmer()
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = uuid.uuid4().hex[:12]
     if "conversation_state" not in st.session_state:
         st.session_state.conversation_state = ConversationState()
     if "dialog_mode" not in st.session_state:
@@ -27,9 +63,11 @@ def init_session_state() -> None:
         selected_model = st.session_state.get("selected_gemini_model", "gemini-2.5-flash")
         st.session_state.orchestrator = Orchestrator(model_name=selected_model)
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = BoundedHistory()
     if "documents" not in st.session_state:
         st.session_state.documents: DocumentBundle | None = None
+    if "pregenerator" not in st.session_state:
+        st.session_state.pregenerator = Pregenerator()
     if "greeting_shown" not in st.session_state:
         st.session_state.greeting_shown = False
     if "pending_interpretations" not in st.session_state:
@@ -61,19 +99,15 @@ def _init_dialog_manager() -> None:
 
 
 def reset_dialog() -> None:
+    st.session_state.pregenerator.cancel()
     st.session_state.conversation_state = ConversationState()
-    st.session_state.chat_history = []
+    st.session_state.chat_history = BoundedHistory()
     st.session_state.documents = None
     st.session_state.greeting_shown = False
     st.session_state.pending_interpretations = {}
     st.session_state.waiting_for_custom_input = None
     st.session_state.custom_input_context = {}
     st.session_state.analytical_mode = False  # Сбрасываем аналитический режим
-    # Очищаем кэш PDF и PlantUML при сбросе
-    if "pdf_data_cache" in st.session_state:
-        del st.session_state.pdf_data_cache
-    if "pdf_data_cache_id" in st.session_state:
-        del st.session_state.pdf_data_cache_id
     # Очищаем кэш PlantUML (все ключи начинающиеся с plantuml_png_)
     keys_to_delete = [key for key in st.session_state.keys() if key.startswith("plantuml_png_")]
     for key in keys_to_delete:
@@ -109,8 +143,105 @@ def enqueue_next_question() -> None:
     history.append({"role": "assistant", "content": question.text, "field": question.field})
 
 
+@contextmanager
+def queue_feedback() -> Iterator[None]:
+    """Show the session's place while its LLM calls wait in the shared queue."""
+    placeholder = st.empty()
+
+    def on_queued(ahead: int) -> None:
+        if ahead:
+            placeholder.info(f"⏳ Запрос в очереди, перед вами: {ahead}")
+        else:
+            placeholder.info("⏳ Запрос в очереди, ожидаем свободную модель")
+
+    try:
+        with call_context(on_queued=on_queued):
+            yield
+    finally:
+        placeholder.empty()
+
+
+@contextmanager
+def interactive_deadline() -> Iterator[None]:
+    """Deadline for one chat turn or analytical question."""
+    with deadline_after(settings.timeouts.interactive_deadline_seconds):
+        yield
+
+
+def render_chat_history() -> None:
+    history: BoundedHistory = st.session_state.chat_history
+    if history.summary:
+        with st.expander("Ранее в диалоге"):
+            st.markdown(history.summary.replace("\n", "  \n"))
+    for message in history:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
 def render_sidebar(state: ConversationState) -> None:
     st.sidebar.header("Настройки")
+
+    warmer = get_model_warmer()
+    if warmer is not None:
+        if warmer.is_ready:
+            st.sidebar.caption(f"🟢 Модель {settings.model.model_name} загружена")
+        elif warmer.last_error:
+            st.sidebar.caption(f"🔴 Модель недоступна: {warmer.last_error}")
+        else:
+            st.sidebar.caption(f"🟡 Модель {settings.model.model_name} загружается...")
+
+    load = get_governor().snapshot()
+    flight = get_single_flight().snapshot()
+    if load or flight["calls"]:
+        with st.sidebar.expander("Нагрузка LLM"):
+            for provider, counters in load.items():
+                queued = counters["queued_by_priority"]
+                waits = counters["wait_p95_by_priority"]
+                st.caption(
+                    f"{provider}: в очереди {counters['queue_depth']} "
+                    f"(чат {queued['high']}, документы {queued['normal']}, фон {queued['low']}), "
+                    f"выполняется {counters['in_flight']}, задержано {counters['throttled']}, "
+                    f"таймаутов {counters['timed_out']}; ожидание p95 чата {waits['high']:.1f}s"
+                )
+            st.caption(f"Объединено одинаковых запросов: {flight['coalesced']} из {flight['calls']}")
+            governor_cfg = settings.governor
+            used = get_governor().usage.used(st.session_state.user_id)
+            budget = f" из {governor_cfg.user_token_budget}" if governor_cfg.user_token_budget else ""
+            st.caption(
+                f"Ваш расход за {governor_cfg.budget_window_seconds / 60:.0f} мин: ~{used}{budget} токенов"
+            )
+            hedging = get_hedge_policy().snapshot()
+            if hedging["hedged"]:
+                st.caption(f"Дублированных запросов: {hedging['hedged']}, из них быстрее: {hedging['hedge_wins']}")
+            for provider, health in get_router().snapshot().items():
+                latency = f"{health['p95_latency']:.1f}s" if health["p95_latency"] is not None else "—"
+                st.caption(
+                    f"{provider}: цепь {health['state']}, ошибок {health['error_rate']:.0%}, p95 {latency}"
+                )
+
+    overload = get_overload_controller().snapshot()
+    if overload["level"] != LEVEL_NORMAL or overload["rejected"] or any(overload["degraded_calls"].values()):
+        with st.sidebar.expander("Деградация под нагрузкой"):
+            st.caption(
+                f"Уровень: {overload['level']} ({overload['level_name']}), "
+                f"очередь LLM {overload['llm_queue']}, очередь рендеринга {overload['render_queue']}"
+            )
+            for name, count in overload["transitions"].items():
+                st.caption(
+                    f"{name}: входов {count}, {overload['seconds_in_level'][name]:.0f}s, "
+                    f"вызовов {overload['degraded_calls'][name]}"
+                )
+            st.caption(f"Отклонено генераций: {overload['rejected']}")
+
+    task_latency = get_task_stats().snapshot()
+    if task_latency:
+        with st.sidebar.expander("Время по задачам"):
+            for task, models in task_latency.items():
+                for model, item in models.items():
+                    st.caption(
+                        f"{task} · {model}: {item['calls']} вызовов, "
+                        f"p50 {item['p50']:.1f}s, p95 {item['p95']:.1f}s"
+                    )
     
     # Dialog mode selector
     mode = st.sidebar.radio(
@@ -136,7 +267,8 @@ def render_sidebar(state: ConversationState) -> None:
             ["gemini-2.5-flash", "gemini-2.5-pro"],
             index=0 if st.session_state.get("selected_gemini_model", "gemini-2.5-flash") == "gemini-2.5-flash" else 1,
             key="gemini_model_selector_sidebar",
-            help="Flash - быстрее и дешевле, Pro - более качественные ответы"
+            help="Flash - быстрее и дешевле, Pro - более качественные ответы. "
+                 "Классификация и извлечение полей всегда идут на быструю модель"
         )
         
         # Update manager and orchestrator if model changed
@@ -152,7 +284,7 @@ def render_sidebar(state: ConversationState) -> None:
     
     st.sidebar.header("Прогресс")
     st.sidebar.progress(state.progress_ratio())
-    st.sidebar.metric("Заполнено полей", f"{len(state.answers)}/{len(FIELD_SEQUENCE)}")
+    st.sidebar.metric("Заполнено полей", f"{state.filled_count()}/{len(FIELD_SEQUENCE)}")
     st.sidebar.header("Поля")
     
     # Определяем текущее поле (первое незаполненное)
@@ -188,11 +320,6 @@ def render_sidebar(state: ConversationState) -> None:
                         if new_value and new_value.strip():
                             state.update_field(field, new_value.strip())
                             st.session_state.documents = None
-                            # Очищаем кэш PDF и PlantUML при изменении данных
-                            if "pdf_data_cache" in st.session_state:
-                                del st.session_state.pdf_data_cache
-                            if "pdf_data_cache_id" in st.session_state:
-                                del st.session_state.pdf_data_cache_id
                             # Очищаем кэш PlantUML
                             keys_to_delete = [key for key in st.session_state.keys() if key.startswith("plantuml_png_")]
                             for key in keys_to_delete:
@@ -200,13 +327,8 @@ def render_sidebar(state: ConversationState) -> None:
                             st.rerun()
                 with col2:
                     if st.button("Очистить", key=f"clear_{field}"):
-                        state.answers.pop(field, None)
+                        state.clear_field(field)
                         st.session_state.documents = None
-                        # Очищаем кэш PDF и PlantUML при очистке поля
-                        if "pdf_data_cache" in st.session_state:
-                            del st.session_state.pdf_data_cache
-                        if "pdf_data_cache_id" in st.session_state:
-                            del st.session_state.pdf_data_cache_id
                         # Очищаем кэш PlantUML
                         keys_to_delete = [key for key in st.session_state.keys() if key.startswith("plantuml_png_")]
                         for key in keys_to_delete:
@@ -218,7 +340,33 @@ def render_sidebar(state: ConversationState) -> None:
     st.sidebar.button("Сбросить диалог", on_click=reset_dialog, type="secondary")
 
 
-def render_document_tabs(bundle: DocumentBundle) -> None:
+def render_overload_banner() -> None:
+    level = get_overload_controller().evaluate()
+    if level != LEVEL_NORMAL:
+        st.warning(OVERLOAD_MESSAGES[level])
+
+
+def render_deferred_diagram(bundle: DocumentBundle, state: ConversationState) -> None:
+    st.info("Диаграмма не была построена из-за высокой нагрузки.")
+    if st.button("Сгенерировать диаграмму", key="generate_deferred_diagram"):
+        selected_model = st.session_state.get("selected_gemini_model", "gemini-2.5-flash")
+        try:
+            with st.spinner("LLM генерирует диаграмму..."), queue_feedback(), deadline_after(
+                settings.timeouts.document_deadline_seconds
+            ):
+                plantuml = Orchestrator(model_name=selected_model).generate_diagram(state)
+        except DeadlineExceeded as exc:
+            logger.warning("Diagram deadline exceeded: %s", exc)
+            st.error("Диаграмма не уложилась в отведённое время. Попробуйте ещё раз позже.")
+        except Exception as exc:
+            logger.error("Diagram generation error: %s", exc)
+            st.error(f"Ошибка при генерации диаграммы: {exc}")
+        else:
+            st.session_state.documents = replace(bundle, plantuml=plantuml, diagram_deferred=False)
+            st.rerun()
+
+
+def render_document_tabs(bundle: DocumentBundle, state: ConversationState) -> None:
     tabs = st.tabs(["BRD", "Use Case", "User Stories", "PlantUML"])
     for tab, (label, content) in zip(tabs, bundle.as_dict().items(), strict=False):
         with tab:
@@ -239,7 +387,7 @@ def render_document_tabs(bundle: DocumentBundle) -> None:
                     from app.utils.plantuml_renderer import render_plantuml_to_png
                     
                     try:
-                        with st.spinner("Рендеринг диаграммы..."):
+                        with st.spinner("Рендеринг диаграммы..."), deadline_after(settings.timeouts.render_seconds):
                             png_bytes = render_plantuml_to_png(content)
                         
                         if png_bytes:
@@ -260,6 +408,9 @@ def render_document_tabs(bundle: DocumentBundle) -> None:
                     st.info("Проверьте логи приложения или убедитесь, что установлены Java и plantuml.jar")
             else:
                 st.markdown(content)
+    if bundle.diagram_deferred:
+        with tabs[-1]:
+            render_deferred_diagram(bundle, state)
 
 
 def main() -> None:
@@ -570,6 +721,12 @@ def main() -> None:
     """, unsafe_allow_html=True)
     
     init_session_state()
+    # LLM calls made during this run are accounted to the session
+    with call_context(user=st.session_state.user_id):
+        render_app()
+
+
+def render_app() -> None:
     state: ConversationState = st.session_state.conversation_state
     manager: DialogManager = st.session_state.dialog_manager
     orchestrator: Orchestrator = st.session_state.orchestrator
@@ -577,6 +734,7 @@ def main() -> None:
     render_sidebar(state)
 
     st.title(PAGE_TITLE)
+    render_overload_banner()
     mode = st.session_state.get("dialog_mode", "intelligent")
     mode_label = "Свободный диалог" if mode == "intelligent" else "Структурированная форма"
     st.caption(f"Диалоговый AI-аналитик: собираем требования и генерируем документы. Режим: {mode_label}")
@@ -606,7 +764,7 @@ def main() -> None:
                         
                     if success:
                         # Rebuild chat history to show all Q&A
-                        st.session_state.chat_history = []
+                        st.session_state.chat_history = BoundedHistory()
                         temp_manager = DialogManager(state)
                         
                         # Build history by simulating the conversation
@@ -674,10 +832,7 @@ def main() -> None:
                     st.rerun()
         else:
             # Разговор начат - показываем весь чат
-            # Display chat history
-            for i, message in enumerate(st.session_state.chat_history):
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
+            render_chat_history()
                     
             # Handle user input
             analytical_mode = st.session_state.get("analytical_mode", False)
@@ -689,30 +844,16 @@ def main() -> None:
                 # Если аналитический режим - обрабатываем вопросы на основе данных
                 if analytical_mode:
                     # НЕ сбрасываем документы в аналитическом режиме - они должны оставаться видимыми
-                    with st.spinner("Анализирую вопрос на основе собранных данных..."):
+                    with st.spinner("Анализирую вопрос на основе собранных данных..."), queue_feedback(), interactive_deadline():
                         try:
                             # Используем LLM для анализа вопроса на основе собранных данных
                             selected_model = st.session_state.get("selected_gemini_model", "gemini-2.5-flash")
                             llm_engine = create_engine(model_name=selected_model)
                             context = state.as_markdown_context()
                             
-                            analysis_prompt = f"""Ты — опытный бизнес-аналитик. У тебя есть полная информация о проекте, собранная в ходе диалога с пользователем.
-
-Собранные данные о проекте:
-{context}
-
-Вопрос пользователя: {prompt}
-
-Проанализируй вопрос пользователя на основе собранных данных и дай развернутый, полезный ответ. 
-Если в вопросе есть что-то, что не покрыто собранными данными, честно скажи об этом и предложи, как можно дополнить информацию.
-
-Ответ должен быть:
-- Конкретным и основанным на собранных данных
-- Полезным для пользователя
-- Написанным на русском языке
-- Структурированным (используй списки, если уместно)
-"""
-                            response = llm_engine.ask(analysis_prompt)
+                            analysis_prompt = prompt_templates.ANALYTICAL_QA_TEMPLATE.build(context=context, question=prompt)
+                            with call_context(profile=PROFILE_INTERACTIVE, task=TASK_QA):
+                                response = llm_engine.ask_prompt(analysis_prompt)
                             message_data = {"role": "assistant", "content": response}
                             st.session_state.chat_history.append(message_data)
                         except Exception as e:
@@ -726,7 +867,7 @@ def main() -> None:
                     st.session_state.documents = None
                     
                     # Process message through intelligent manager
-                    with st.spinner("Анализирую..."):
+                    with st.spinner("Анализирую..."), queue_feedback(), interactive_deadline():
                         try:
                             response, _ = intelligent_manager.process_message(prompt)
                             message_data = {"role": "assistant", "content": response}
@@ -746,40 +887,23 @@ def main() -> None:
         
         if analytical_mode:
             # Аналитический режим для структурированной формы
-            # Display chat history
-            for message in st.session_state.chat_history:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
+            render_chat_history()
             
             # Handle user input in analytical mode
             if prompt := st.chat_input("Задайте вопрос о проекте..."):
                 st.session_state.chat_history.append({"role": "user", "content": prompt})
                 
                 # НЕ сбрасываем документы в аналитическом режиме
-                with st.spinner("Анализирую вопрос на основе собранных данных..."):
+                with st.spinner("Анализирую вопрос на основе собранных данных..."), queue_feedback(), interactive_deadline():
                     try:
                         # Используем LLM для анализа вопроса на основе собранных данных
                         selected_model = st.session_state.get("selected_gemini_model", "gemini-2.5-flash")
                         llm_engine = create_engine(model_name=selected_model)
                         context = state.as_markdown_context()
                         
-                        analysis_prompt = f"""Ты — опытный бизнес-аналитик. У тебя есть полная информация о проекте, собранная в ходе диалога с пользователем.
-
-Собранные данные о проекте:
-{context}
-
-Вопрос пользователя: {prompt}
-
-Проанализируй вопрос пользователя на основе собранных данных и дай развернутый, полезный ответ. 
-Если в вопросе есть что-то, что не покрыто собранными данными, честно скажи об этом и предложи, как можно дополнить информацию.
-
-Ответ должен быть:
-- Конкретным и основанным на собранных данных
-- Полезным для пользователя
-- Написанным на русском языке
-- Структурированным (используй списки, если уместно)
-"""
-                        response = llm_engine.ask(analysis_prompt)
+                        analysis_prompt = prompt_templates.ANALYTICAL_QA_TEMPLATE.build(context=context, question=prompt)
+                        with call_context(profile=PROFILE_INTERACTIVE, task=TASK_QA):
+                            response = llm_engine.ask_prompt(analysis_prompt)
                         message_data = {"role": "assistant", "content": response}
                         st.session_state.chat_history.append(message_data)
                     except Exception as e:
@@ -795,9 +919,7 @@ def main() -> None:
             structured_manager: DialogManager = manager
             enqueue_next_question()
 
-            for message in st.session_state.chat_history:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
+            render_chat_history()
 
             if prompt := st.chat_input("Введите ответ"):
                 st.session_state.chat_history.append({"role": "user", "content": prompt})
@@ -815,6 +937,14 @@ def main() -> None:
         is_complete = state.is_complete()
     else:
         is_complete = manager.is_complete()
+
+    # Start the documents in the background as soon as the state is complete;
+    # any change of the state or the model cancels the run
+    pregenerator: Pregenerator = st.session_state.pregenerator
+    if st.session_state.get("documents"):
+        pregenerator.cancel()
+    else:
+        pregenerator.sync(state, st.session_state.get("selected_gemini_model", "gemini-2.5-flash"))
     
     # Показываем кнопки только если все поля заполнены
     if is_complete:
@@ -826,6 +956,8 @@ def main() -> None:
         # Кнопка генерации или скачивания в первой колонке
         with col1:
             if not st.session_state.get("documents"):
+                if pregenerator.running:
+                    st.caption("Документы уже готовятся в фоне")
                 # Кнопка генерации отчета (показываем если документов еще нет)
                 if st.button("Сгенерировать отчет", key="generate_docs", use_container_width=True):
                     try:
@@ -851,8 +983,13 @@ def main() -> None:
                         # Показываем спиннер и запускаем генерацию
                         # В Streamlit сложно обновлять UI во время блокирующей операции,
                         # поэтому время будет показано после завершения
-                        with st.spinner("LLM генерирует артефакты..."):
-                            bundle = orchestrator.generate_documents(state)
+                        with st.spinner("LLM генерирует артефакты..."), queue_feedback(), deadline_after(
+                            settings.timeouts.document_deadline_seconds
+                        ):
+                            # Берем готовый фоновый результат или дожидаемся его
+                            bundle = pregenerator.join(state, selected_model)
+                            if bundle is None:
+                                bundle = orchestrator.generate_documents(state)
                         
                         # Засекаем время окончания и вычисляем общее время
                         end_time = time.time()
@@ -883,6 +1020,15 @@ def main() -> None:
                             st.session_state.chat_history.append({"role": "assistant", "content": success_message})
                             st.rerun()
                         
+                    except OverloadRejected as exc:
+                        logger.warning("Generation rejected: %s", exc)
+                        st.error(
+                            "Сервис перегружен, генерация не запущена. "
+                            f"Повторите попытку через {exc.retry_after:.0f} сек."
+                        )
+                    except DeadlineExceeded as exc:
+                        logger.warning("Generation deadline exceeded: %s", exc)
+                        st.error("Генерация не уложилась в отведённое время. Попробуйте ещё раз позже.")
                     except ValueError as exc:
                         logger.warning("Generation blocked: %s", exc)
                         st.error(str(exc))
@@ -894,19 +1040,32 @@ def main() -> None:
                 bundle = st.session_state.documents
                 project_name = state.answers.get("goal", "Business Requirements Document")[:50]
                 
-                # Генерируем PDF данные один раз при загрузке страницы
-                # Используем кэширование через session_state чтобы избежать повторной генерации
-                if "pdf_data_cache" not in st.session_state or st.session_state.get("pdf_data_cache_id") != project_name:
-                    st.session_state.pdf_data_cache = bundle.to_pdf(project_name=project_name)
-                    st.session_state.pdf_data_cache_id = project_name
+                # PDF собирается в отдельном процессе и кэшируется по хэшу содержимого,
+                # поэтому одинаковые наборы документов из разных сессий собираются один раз
+                pdf_service = get_pdf_service()
+                pdf_key = pdf_service.submit(bundle.as_dict(), project_name)
+                with st.spinner("Формируется PDF..."):
+                    pdf_status = pdf_service.wait(pdf_key, timeout=settings.orchestrator.pdf_wait_seconds)
                 
-                st.download_button(
-                    "Скачать общий PDF",
-                    data=st.session_state.pdf_data_cache,
-                    file_name="ai_ba_documents.pdf",
-                    use_container_width=True,
-                    key="download_full_pdf"
-                )
+                pdf_file = pdf_service.open_result(pdf_key) if pdf_status.is_ready else None
+                if pdf_file is not None:
+                    # Отдаем файл из каталога артефактов без копии в session_state
+                    with pdf_file:
+                        st.download_button(
+                            "Скачать общий PDF",
+                            data=pdf_file,
+                            file_name="ai_ba_documents.pdf",
+                            mime="application/pdf",
+                            use_container_width=True,
+                            key="download_full_pdf"
+                        )
+                elif pdf_status.is_failed:
+                    st.error(f"Не удалось сформировать PDF: {pdf_status.error}")
+                else:
+                    status_label = "в очереди" if pdf_status.state == STATUS_PENDING else "собирается"
+                    st.info(f"PDF {status_label}, это может занять некоторое время.")
+                    if st.button("Обновить статус PDF", key="refresh_pdf_status", use_container_width=True):
+                        st.rerun()
     
     # Отображаем документы если они сгенерированы
     if st.session_state.get("documents"):
@@ -914,7 +1073,7 @@ def main() -> None:
         st.divider()
         
         # Отображаем вкладки с документами
-        render_document_tabs(bundle)
+        render_document_tabs(bundle, state)
 
 
 if __name__ == "__main__":
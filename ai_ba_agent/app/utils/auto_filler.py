@@ -116,7 +116,8 @@ def fill_form_directly(manager, state):
     logger.info(f"Filling form directly with {len(answers)} answers")
     
     # Reset state first
-    state.answers.clear()
+    for field_key in list(state.answers):
+        state.clear_field(field_key)
     
     # Fill each field directly through manager
     for i, (field_key, answer) in enumerate(zip(FIELD_SEQUENCE, answers), 1):
@@ -126,7 +127,7 @@ def fill_form_directly(manager, state):
         except ValueError as e:
             logger.warning(f"Error accepting answer for {field_key}: {e}")
             # Set directly if validation fails
-            state.answers[field_key] = answer
+            state.update_field(field_key, answer)
     
     logger.info("Direct form fill completed!")
     return True
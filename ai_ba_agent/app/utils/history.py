@@ -0,0 +1,107 @@
+"""Bounded chat history with a rolling summary of older turns.
+
+Keeps the last ``limit`` turns in a ring buffer and folds every evicted turn
+into a short running summary, so long sessions use constant memory and the
+analysis prompt stays the same size no matter how long the dialog is.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from typing import Callable, Deque, Iterator, List, Literal, Mapping, Optional, Union, overload
+
+from app.config import settings
+
+ROLE_LABELS = {"user": "Пользователь", "assistant": "Аналитик"}
+SUMMARY_MAX_CHARS = 1500
+SUMMARY_LINE_CHARS = 160
+
+
+class HistoryTurn:
+    """One chat message; supports ``turn["role"]`` / ``turn.get("field")`` like the old dicts."""
+
+    __slots__ = ("role", "content", "field")
+
+    def __init__(self, role: str, content: str, field: Optional[str] = None):
+        self.role = role
+        self.content = content
+        self.field = field
+
+    @overload
+    def __getitem__(self, key: Literal["role", "content"]) -> str: ...
+
+    @overload
+    def __getitem__(self, key: str) -> Optional[str]: ...
+
+    def __getitem__(self, key: str) -> Optional[str]:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __repr__(self) -> str:
+        return f"HistoryTurn(role={self.role!r}, content={self.content[:40]!r}, field={self.field!r})"
+
+
+# (current summary, evicted turn) -> new summary
+Summarizer = Callable[[str, HistoryTurn], str]
+
+
+def extractive_summary(summary: str, turn: HistoryTurn, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Append the first sentence of the turn and drop the oldest lines over ``max_chars``."""
+    text = " ".join(turn.content.split())
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(sentence) > SUMMARY_LINE_CHARS:
+        sentence = sentence[:SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    if not sentence:
+        return summary
+
+    lines = summary.splitlines() if summary else []
+    lines.append(f"{ROLE_LABELS.get(turn.role, turn.role)}: {sentence}")
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class BoundedHistory:
+    """Ring buffer of the last ``limit`` turns plus a summary of everything older."""
+
+    def __init__(self, limit: Optional[int] = None, summarizer: Summarizer = extractive_summary):
+        self.limit = limit or settings.app.chat_history_limit
+        self.summary = ""
+        self._summarizer = summarizer
+        self._turns: Deque[HistoryTurn] = deque(maxlen=self.limit)
+
+    def append(self, message: Union[HistoryTurn, Mapping[str, str]]) -> None:
+        """Add a turn; accepts ``{"role", "content", "field"}`` dicts for drop-in use."""
+        if not isinstance(message, HistoryTurn):
+            message = HistoryTurn(message["role"], message["content"], message.get("field"))
+        if len(self._turns) == self.limit:
+            self.summary = self._summarizer(self.summary, self._turns[0])
+        self._turns.append(message)
+
+    def recent(self, count: int) -> List[HistoryTurn]:
+        """Last ``count`` turns, oldest first."""
+        if count <= 0:
+            return []
+        return list(self._turns)[-count:]
+
+    def clear(self) -> None:
+        self._turns.clear()
+        self.summary = ""
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __iter__(self) -> Iterator[HistoryTurn]:
+        return iter(self._turns)
+
+    def __getitem__(self, index: int) -> HistoryTurn:
+        return self._turns[index]
+
+
+__all__ = ["BoundedHistory", "HistoryTurn", "extractive_summary"]
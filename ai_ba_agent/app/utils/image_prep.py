@@ -0,0 +1,140 @@
+"""Preparation of diagram images before they are embedded into the PDF.
+
+PlantUML renders diagrams at screen resolution and often much larger than the
+page box, so embedding them as-is bloats the PDF and makes ReportLab decode
+huge bitmaps. This module reads dimensions straight from the PNG header,
+downsamples to the target DPI of the page box, optionally palette-quantizes the
+result and caches prepared images by source hash.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.utils.logger import logger
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+POINTS_PER_INCH = 72.0
+_CACHE_SIZE = 32
+
+_cache: "OrderedDict[tuple, PreparedImage]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """Image bytes ready for embedding plus the size to draw them at (points)."""
+
+    data: bytes
+    width_px: int
+    height_px: int
+    display_width: float
+    display_height: float
+
+
+def png_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return ``(width, height)`` from the PNG IHDR chunk without decoding pixels."""
+    if len(data) < 24 or not data.startswith(PNG_SIGNATURE) or data[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
+
+
+def _fit_box(width: float, height: float, max_width: float, max_height: float) -> float:
+    """Scale factor that fits the image into the box without enlarging it."""
+    width_scale = max_width / width if width > 0 else 1.0
+    height_scale = max_height / height if height > 0 else 1.0
+    return min(width_scale, height_scale, 1.0)
+
+
+def _resample(
+    png_bytes: bytes, width_px: int, height_px: int, quantize: bool
+) -> Optional[Tuple[bytes, int, int]]:
+    """Downsample/quantize with Pillow; ``None`` if Pillow is unavailable."""
+    try:
+        from PIL import Image as PILImage
+    except ImportError:
+        return None
+
+    with PILImage.open(io.BytesIO(png_bytes)) as source:
+        image = source
+        if (width_px, height_px) != source.size:
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA")
+            image = image.resize((width_px, height_px), PILImage.Resampling.LANCZOS)
+        if quantize and image.mode != "P":
+            # Diagrams are mostly flat colours, 256 palette entries are plenty
+            image = image.convert("RGBA").quantize(colors=256, method=PILImage.Quantize.FASTOCTREE)
+        output = io.BytesIO()
+        image.save(output, format="PNG", optimize=True)
+    return output.getvalue(), width_px, height_px
+
+
+def prepare_diagram_image(
+    png_bytes: bytes,
+    max_width: float,
+    max_height: float,
+    dpi: int = 150,
+    quantize: bool = False,
+) -> PreparedImage:
+    """Fit a PNG into a ``max_width`` x ``max_height`` point box at ``dpi``.
+
+    Source pixels are treated as points (72 DPI), as the PDF layout always did;
+    the bitmap is only downsampled when it carries more pixels than ``dpi``
+    needs for the final drawn size. Results are cached by source hash.
+    """
+    cache_key = (hashlib.sha256(png_bytes).hexdigest(), round(max_width, 2), round(max_height, 2), dpi, quantize)
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            _cache.move_to_end(cache_key)
+            return cached
+
+    size = png_dimensions(png_bytes)
+    if size is None:
+        # Not a PNG: fall back to a full decode just to learn the size
+        from PIL import Image as PILImage
+
+        with PILImage.open(io.BytesIO(png_bytes)) as pil_img:
+            size = pil_img.size
+    width_px, height_px = size
+
+    scale = _fit_box(width_px, height_px, max_width, max_height)
+    display_width = width_px * scale
+    display_height = height_px * scale
+
+    data = png_bytes
+    target_width = max(1, round(display_width / POINTS_PER_INCH * dpi))
+    target_height = max(1, round(display_height / POINTS_PER_INCH * dpi))
+    needs_resize = target_width < width_px
+    if needs_resize or quantize:
+        if not needs_resize:
+            target_width, target_height = width_px, height_px
+        resampled = _resample(png_bytes, target_width, target_height, quantize)
+        if resampled is not None and len(resampled[0]) < len(png_bytes):
+            data, width_px, height_px = resampled
+            logger.debug(
+                "Prepared diagram image: %s -> %s bytes, %sx%s px",
+                len(png_bytes), len(data), width_px, height_px,
+            )
+
+    prepared = PreparedImage(data, width_px, height_px, display_width, display_height)
+    with _cache_lock:
+        _cache[cache_key] = prepared
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return prepared
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+__all__ = ["PreparedImage", "png_dimensions", "prepare_diagram_image", "clear_cache"]
@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import Optional
 import shutil
 
+from app.config import settings
+from app.core.call_context import remaining_time
 from app.utils.logger import logger
 
 
@@ -23,6 +25,15 @@ def render_plantuml_to_png(plantuml_code: str) -> Optional[bytes]:
     Returns:
         PNG image bytes or None if rendering failed
     """
+    # Rendering inherits the deadline of the UI action that asked for it
+    timeout = settings.timeouts.render_seconds
+    remaining = remaining_time()
+    if remaining is not None:
+        if remaining <= 0:
+            logger.warning("Skipping PlantUML rendering, the deadline has passed")
+            return None
+        timeout = min(timeout, remaining)
+
     try:
         # Clean and prepare PlantUML code
         code = plantuml_code.strip()
@@ -156,7 +167,7 @@ def render_plantuml_to_png(plantuml_code: str) -> Optional[bytes]:
                     cmd,
                     capture_output=True,
                     text=True,
-                    timeout=30,
+                    timeout=timeout,
                     cwd=input_dir  # Set working directory
                 )
                 
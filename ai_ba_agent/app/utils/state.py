@@ -2,8 +2,13 @@
 
 from __future__ import annotations
 
+import hashlib
+import itertools
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
 
 FIELD_SEQUENCE: List[str] = [
     "description",
@@ -82,59 +87,109 @@ FIELD_METADATA: Dict[str, Dict[str, str]] = {
 }
 
 
+PLACEHOLDER_VALUES = frozenset({"—", "-", "не указано", "не заполнено", ""})
+
+# Shared by all states so a version number never repeats within the process
+_versions = itertools.count(1)
+
+
 def field_label(field_key: str) -> str:
     return FIELD_METADATA.get(field_key, {}).get("label", field_key.title())
 
 
+def is_placeholder(value: Optional[str]) -> bool:
+    """True if the value is empty or only a placeholder like "—"."""
+    return not value or value.strip() in PLACEHOLDER_VALUES
+
+
 @dataclass
 class ConversationState:
-    """Mutable dialog state stored in Streamlit session."""
+    """Mutable dialog state stored in Streamlit session.
+
+    Answers must be changed through ``update_field``/``clear_field``/``reset``:
+    they keep the set of missing fields up to date and bump ``version``, which
+    is unique within the process and keys the cached context render.
+    """
 
     answers: Dict[str, str] = field(default_factory=dict)
-    history: List[Tuple[str, str]] = field(default_factory=list)
+    # Only the last ``chat_history_limit`` updates are kept
+    history: Deque[Tuple[str, str]] = field(
+        default_factory=lambda: deque(maxlen=settings.app.chat_history_limit)
+    )
     generated_bundle_id: Optional[str] = None
+    version: int = field(default=0, init=False)
+    _missing: Set[str] = field(default_factory=set, init=False, repr=False, compare=False)
+    _context_cache: Optional[Tuple[int, str, str]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._missing = {name for name in FIELD_SEQUENCE if is_placeholder(self.answers.get(name))}
+        self.version = next(_versions)
+
+    def _touch(self, field_key: str) -> None:
+        if field_key in FIELD_METADATA:
+            if is_placeholder(self.answers.get(field_key)):
+                self._missing.add(field_key)
+            else:
+                self._missing.discard(field_key)
+        self.version = next(_versions)
 
     def reset(self) -> None:
         self.answers.clear()
         self.history.clear()
         self.generated_bundle_id = None
+        self._missing = set(FIELD_SEQUENCE)
+        self.version = next(_versions)
 
     def update_field(self, field_key: str, value: str) -> None:
         self.answers[field_key] = value
         self.history.append((field_key, value))
+        self._touch(field_key)
+
+    def clear_field(self, field_key: str) -> None:
+        self.answers.pop(field_key, None)
+        self._touch(field_key)
 
     def get_missing_fields(self) -> List[str]:
         """Get list of fields that are not filled or contain only empty/whitespace."""
-        missing = []
-        for field in FIELD_SEQUENCE:
-            value = self.answers.get(field, "").strip()
-            # Field is missing if it's empty, None, or contains only placeholder text
-            if not value or value in ["—", "-", "не указано", "не заполнено", ""]:
-                missing.append(field)
-        return missing
+        return [name for name in FIELD_SEQUENCE if name in self._missing]
+
+    def filled_count(self) -> int:
+        return len(FIELD_SEQUENCE) - len(self._missing)
 
     def is_complete(self) -> bool:
-        return not self.get_missing_fields()
+        return not self._missing
+
+    def _render_context(self) -> Tuple[str, str]:
+        if self._context_cache is None or self._context_cache[0] != self.version:
+            sections: List[str] = []
+            for name in FIELD_SEQUENCE:
+                label = field_label(name)
+                value = self.answers.get(name, "—")
+                sections.append(f"### {label}\n{value or '—'}")
+            text = "\n\n".join(sections)
+            fingerprint = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            self._context_cache = (self.version, text, fingerprint)
+        return self._context_cache[1], self._context_cache[2]
 
     def as_markdown_context(self) -> str:
-        sections: List[str] = []
-        for field in FIELD_SEQUENCE:
-            label = field_label(field)
-            value = self.answers.get(field, "—")
-            sections.append(f"### {label}\n{value or '—'}")
-        return "\n\n".join(sections)
+        return self._render_context()[0]
+
+    def context_fingerprint(self) -> str:
+        """Content hash of ``as_markdown_context()``, stable across instances."""
+        return self._render_context()[1]
 
     def progress_ratio(self) -> float:
         total = len(FIELD_SEQUENCE)
-        filled = total - len(self.get_missing_fields())
         if total == 0:
             return 0.0
-        return filled / total
+        return self.filled_count() / total
 
 
 __all__ = [
     "ConversationState",
     "FIELD_SEQUENCE",
     "FIELD_METADATA",
+    "PLACEHOLDER_VALUES",
     "field_label",
+    "is_placeholder",
 ]
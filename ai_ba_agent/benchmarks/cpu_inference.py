@@ -0,0 +1,92 @@
+"""Tokens/s micro-benchmark for the CPU inference profile.
+
+Loads a small causal LM twice, once as-is and once with the CPU profile
+(threads, SDPA, dynamic int8, torch.compile), runs greedy generation on a
+BRD-like prompt and reports prefill time and decode tokens/s for both.
+
+Requires ``torch`` and ``transformers``. Run from ``ai_ba_agent/``::
+
+    python -m benchmarks.cpu_inference
+    python -m benchmarks.cpu_inference --model HuggingFaceTB/SmolLM2-135M-Instruct --int8 --threads 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+from typing import Dict, List
+
+from app.config import CpuInferenceProfile, settings
+from app.core.llm_engine import _generate, load_transformers_model
+from app.core.prompt_templates import BRD_TEMPLATE
+
+DEFAULT_MODEL = "HuggingFaceTB/SmolLM2-135M-Instruct"
+CONTEXT = "### Цель\nСократить время обработки заявок на кредит\n\n### Проблема\nРучная проверка документов"
+
+
+def measure(profile: CpuInferenceProfile, model_name: str, new_tokens: int, repeat: int) -> Dict[str, float]:
+    model_cfg = settings.model.model_copy(update={
+        "model_name": model_name,
+        "device": "cpu",
+        "dtype": "auto",
+        "cpu_profile": profile,
+    })
+    tokenizer, model = load_transformers_model(model_cfg)
+    inputs = tokenizer(BRD_TEMPLATE.format(context=CONTEXT), return_tensors="pt")
+    generation_kwargs = {
+        "max_new_tokens": new_tokens,
+        "min_new_tokens": new_tokens,
+        "do_sample": False,
+        "pad_token_id": tokenizer.pad_token_id,
+        "eos_token_id": tokenizer.eos_token_id,
+    }
+
+    # Warm-up run (and torch.compile tracing) is not measured
+    _generate(model, tokenizer, inputs["input_ids"], inputs["attention_mask"], generation_kwargs)
+    prefill: List[float] = []
+    speed: List[float] = []
+    for _ in range(repeat):
+        _, (stats,) = _generate(model, tokenizer, inputs["input_ids"], inputs["attention_mask"], generation_kwargs)
+        prefill.append(stats.prefill_seconds)
+        speed.append(stats.decode_tokens_per_second)
+    return {
+        "prompt_tokens": int(inputs["input_ids"].shape[-1]),
+        "prefill_s": statistics.median(prefill),
+        "decode_tok_s": statistics.median(speed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tokens/s micro-benchmark for the CPU inference profile")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--interop-threads", type=int)
+    parser.add_argument("--int8", action="store_true", help="Dynamic int8 quantization")
+    parser.add_argument("--sdpa", action="store_true", help="attn_implementation=sdpa")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the forward pass")
+    args = parser.parse_args()
+
+    tuned = CpuInferenceProfile(
+        enabled=True,
+        quantize_int8=args.int8,
+        num_threads=args.threads,
+        num_interop_threads=args.interop_threads,
+        attn_implementation="sdpa" if args.sdpa else "auto",
+        torch_compile=args.compile,
+    )
+    results = {
+        "baseline": measure(CpuInferenceProfile(), args.model, args.new_tokens, args.repeat),
+        "cpu_profile": measure(tuned, args.model, args.new_tokens, args.repeat),
+    }
+
+    print(f"{'profile':>12} {'prompt tok':>10} {'prefill, s':>11} {'decode tok/s':>13}")
+    for name, item in results.items():
+        print(f"{name:>12} {item['prompt_tokens']:>10} {item['prefill_s']:>11.3f} {item['decode_tok_s']:>13.1f}")
+    speedup = results["cpu_profile"]["decode_tok_s"] / max(results["baseline"]["decode_tok_s"], 1e-9)
+    print(f"decode speedup: x{speedup:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Benchmark and regression suite for ``markdown_to_pdf_bytes``.
+
+Each case is a document bundle (BRD / Use Case / User Stories / PlantUML),
+either synthetic or derived from ``scenarios/*.txt``, ranging from a couple of
+pages to 200+ pages, table-heavy documents and documents with big diagrams.
+For every case the suite records wall time (median of ``--repeat`` runs), peak
+Python heap via ``tracemalloc`` and output size, writes them as JSON and can
+compare them against a baseline, failing when a metric regresses by more than
+the threshold.
+
+PlantUML rendering is replaced by a stub returning a synthetic PNG, so the
+suite runs offline and without Java.
+
+Run from ``ai_ba_agent/``::
+
+    python -m benchmarks.pdf_generation --output bench.json
+    python -m benchmarks.pdf_generation --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pdf_generation --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.generators.pdf_generator import markdown_to_pdf_bytes
+from app.utils import plantuml_renderer
+from app.utils.state import FIELD_SEQUENCE, field_label
+
+SCENARIOS_DIR = Path(__file__).resolve().parents[1] / "scenarios"
+
+# Wall-time differences below this are noise on any machine
+MIN_TIME_DELTA_S = 0.05
+
+Sections = Dict[str, str]
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    build: Callable[[], Sections]
+    diagram_size: tuple = (800, 600)
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    wall_time_s: float
+    peak_memory_bytes: int
+    output_bytes: int
+    pages: int
+
+
+# --- Inputs -----------------------------------------------------------------
+
+PARAGRAPH = (
+    "Система должна обеспечивать обработку платежей клиентов банка в режиме реального "
+    "времени с контролем лимитов, уведомлениями и журналированием всех операций. "
+)
+
+DIAGRAM = "@startuml\nstart\n:Клиент совершает операцию;\n:Система проверяет лимиты;\nstop\n@enduml"
+
+
+def _table(rows: int, columns: int = 4) -> str:
+    header = "| " + " | ".join(f"Колонка {idx}" for idx in range(1, columns + 1)) + " |"
+    separator = "|" + "---|" * columns
+    body = [
+        "| " + " | ".join(f"Значение {row}.{col} — {PARAGRAPH[:60]}" for col in range(1, columns + 1)) + " |"
+        for row in range(1, rows + 1)
+    ]
+    return "\n".join([header, separator, *body])
+
+
+def synthetic_bundle(chapters: int, paragraphs: int, table_rows: int = 0) -> Sections:
+    """Build a bundle with ``chapters`` numbered sections per document."""
+    def document(title: str) -> str:
+        parts = [f"# {title}"]
+        for chapter in range(1, chapters + 1):
+            parts.append(f"## {chapter}. Раздел {chapter}")
+            parts.extend(PARAGRAPH * 2 for _ in range(paragraphs))
+            parts.append(f"- Требование {chapter}.1: {PARAGRAPH}")
+            parts.append(f"1. Шаг {chapter}.1 — {PARAGRAPH}")
+            if table_rows:
+                parts.append(_table(table_rows))
+        return "\n\n".join(parts)
+
+    return {
+        "BRD": document("Business Requirements Document"),
+        "Use Case": document("Use Case"),
+        "User Stories": document("User Stories"),
+        "PlantUML": DIAGRAM,
+    }
+
+
+def scenario_bundle(path: Path) -> Sections:
+    """Turn a 14-line scenario file into BRD/Use Case/User Stories markdown."""
+    lines = [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    answers = dict(zip(FIELD_SEQUENCE, lines))
+
+    brd = ["# Business Requirements Document"]
+    for idx, field in enumerate(FIELD_SEQUENCE, 1):
+        brd.append(f"## {idx}. {field_label(field)}\n\n{answers.get(field, '—')}")
+    brd.append("| Поле | Значение |\n|---|---|\n" + "\n".join(
+        f"| {field_label(field)} | {answers.get(field, '—')} |" for field in FIELD_SEQUENCE
+    ))
+    use_case = [
+        "# Use Case",
+        f"## 1. Название\n\n{answers.get('goal', '')}",
+        f"## 2. Акторы\n\n{answers.get('roles', '')}",
+        "## 3. Основной поток\n\n" + "\n".join(
+            f"{idx}. {step.strip()}" for idx, step in enumerate(answers.get("process_description", "").split(","), 1)
+        ),
+    ]
+    stories = ["# User Stories"] + [
+        f"## {idx}. История {idx}\n\nКак пользователь, я хочу {answers.get('scope', '')[:200]}, "
+        f"чтобы {answers.get('goal', '')[:200]}."
+        for idx in range(1, 6)
+    ]
+    return {
+        "BRD": "\n\n".join(brd),
+        "Use Case": "\n\n".join(use_case),
+        "User Stories": "\n\n".join(stories),
+        "PlantUML": DIAGRAM,
+    }
+
+
+def default_cases() -> List[BenchmarkCase]:
+    cases = [
+        BenchmarkCase("small", lambda: synthetic_bundle(chapters=2, paragraphs=2)),
+        BenchmarkCase("medium", lambda: synthetic_bundle(chapters=10, paragraphs=5)),
+        BenchmarkCase("table_heavy", lambda: synthetic_bundle(chapters=5, paragraphs=1, table_rows=60)),
+        BenchmarkCase("large_diagram", lambda: synthetic_bundle(chapters=2, paragraphs=2), diagram_size=(4000, 3000)),
+        BenchmarkCase("xlarge_200_pages", lambda: synthetic_bundle(chapters=60, paragraphs=10)),
+    ]
+    for path in sorted(SCENARIOS_DIR.glob("scenario_*.txt"))[:3]:
+        cases.append(BenchmarkCase(f"scenario_{path.stem.split('_', 2)[-1]}", lambda path=path: scenario_bundle(path)))
+    return cases
+
+
+# --- Measurement --------------------------------------------------------------
+
+def _synthetic_png(width: int, height: int) -> bytes:
+    from PIL import Image as PILImage, ImageDraw
+
+    image = PILImage.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for offset in range(0, max(width, height), 50):
+        draw.line([(offset, 0), (0, offset)], fill="black", width=3)
+        draw.rectangle([offset, offset, offset + 40, offset + 20], outline="darkred")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@contextmanager
+def stub_plantuml_renderer(width: int, height: int) -> Iterator[None]:
+    """Replace the Java-based renderer with a synthetic PNG of the given size."""
+    png_bytes = _synthetic_png(width, height)
+    original = plantuml_renderer.render_plantuml_to_png
+    plantuml_renderer.render_plantuml_to_png = lambda _code: png_bytes
+    try:
+        yield
+    finally:
+        plantuml_renderer.render_plantuml_to_png = original
+
+
+def _count_pages(pdf_bytes: bytes) -> int:
+    return len(re.findall(rb"/Type\s*/Page\b", pdf_bytes))
+
+
+def run_case(case: BenchmarkCase, repeat: int) -> BenchmarkResult:
+    sections = case.build()
+    project_name = f"Benchmark {case.name}"
+    with stub_plantuml_renderer(*case.diagram_size):
+        timings = []
+        pdf_bytes = b""
+        for _ in range(repeat):
+            started = time.perf_counter()
+            pdf_bytes = markdown_to_pdf_bytes(sections, project_name=project_name)
+            timings.append(time.perf_counter() - started)
+
+        # Separate run: tracemalloc slows allocation-heavy code down noticeably
+        tracemalloc.start()
+        try:
+            markdown_to_pdf_bytes(sections, project_name=project_name)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return BenchmarkResult(
+        name=case.name,
+        wall_time_s=statistics.median(timings),
+        peak_memory_bytes=peak,
+        output_bytes=len(pdf_bytes),
+        pages=_count_pages(pdf_bytes),
+    )
+
+
+def run_suite(cases: List[BenchmarkCase], repeat: int = 3) -> dict:
+    results = []
+    for case in cases:
+        result = run_case(case, repeat)
+        results.append(asdict(result))
+        print(
+            f"{result.name:>22} {result.wall_time_s:>8.3f}s "
+            f"{result.peak_memory_bytes / 1e6:>8.1f}MB {result.output_bytes / 1e3:>9.1f}KB "
+            f"{result.pages:>5}p",
+            flush=True,
+        )
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+# --- Baseline comparison --------------------------------------------------------
+
+def compare_results(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return human-readable regressions exceeding ``threshold`` (0.2 == +20%)."""
+    baseline_by_name = {item["name"]: item for item in baseline.get("results", [])}
+    regressions = []
+    for item in current.get("results", []):
+        reference = baseline_by_name.get(item["name"])
+        if reference is None:
+            continue
+        for metric in ("wall_time_s", "peak_memory_bytes", "output_bytes"):
+            old, new = reference[metric], item[metric]
+            if old <= 0:
+                continue
+            if metric == "wall_time_s" and new - old < MIN_TIME_DELTA_S:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(f"{item['name']}.{metric}: {old} -> {new} (+{change:.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PDF generation benchmark")
+    parser.add_argument("--cases", nargs="*", help="Run only these case names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Compare against this results JSON")
+    parser.add_argument("--save-baseline", type=Path, help="Write results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    cases = default_cases()
+    if args.cases:
+        cases = [case for case in cases if case.name in set(args.cases)]
+
+    current = run_suite(cases, repeat=args.repeat)
+    for target in (args.output, args.save_baseline):
+        if target:
+            target.write_text(json.dumps(current, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare_results(current, baseline, args.threshold)
+        if regressions:
+            print("Regressions over threshold:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions over threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
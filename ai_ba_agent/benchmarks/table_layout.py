@@ -0,0 +1,101 @@
+"""Layout benchmark for markdown tables in the PDF generator.
+
+Compares the standard mode (equal column widths, tables chunked by 30 rows)
+with the large-table mode (single ``LongTable`` with repeated header and
+content-aware column widths) on 10/100/1000-row risk tables.
+
+Run from ``ai_ba_agent/``::
+
+    python -m benchmarks.table_layout
+    python -m benchmarks.table_layout --rows 10 100 1000 5000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import statistics
+import time
+from typing import List, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate
+
+from app.generators.pdf_generator import _render_table
+
+# Standard mode never switches to LongTable, large mode switches for any table
+STANDARD_MODE = 0
+LARGE_MODE = 1
+
+HEADER = ["ID", "Риск", "Описание", "Вероятность", "Влияние"]
+
+
+def make_risk_table(rows: int) -> List[List[str]]:
+    """Build a KPI/risk-like table similar to what the LLM writes into a BRD."""
+    table = [HEADER]
+    for idx in range(1, rows + 1):
+        table.append([
+            f"R-{idx:04d}",
+            f"Риск интеграции №{idx}",
+            (
+                "Задержка ответа внешнего процессинга приводит к повторным списаниям "
+                "и обращениям клиентов в контакт-центр; требуется идемпотентность "
+                f"операций и мониторинг SLA (сценарий {idx})."
+            ),
+            "Средняя" if idx % 2 else "Высокая",
+            "Высокое",
+        ])
+    return table
+
+
+def measure(table_data: List[List[str]], large_table_rows: int) -> Tuple[float, int]:
+    """Return (seconds, pages) for building a document with one table."""
+    story: List = []
+    started = time.perf_counter()
+    _render_table(story, table_data, large_table_rows=large_table_rows)
+    doc = SimpleDocTemplate(
+        io.BytesIO(),
+        pagesize=A4,
+        rightMargin=15*mm,
+        leftMargin=15*mm,
+        topMargin=15*mm,
+        bottomMargin=15*mm,
+    )
+    doc.build(story)
+    return time.perf_counter() - started, doc.page
+
+
+def run(row_counts: List[int], repeat: int) -> List[dict]:
+    results = []
+    for rows in row_counts:
+        table_data = make_risk_table(rows)
+        for mode_name, threshold in (("standard", STANDARD_MODE), ("longtable", LARGE_MODE)):
+            timings = []
+            pages = 0
+            for _ in range(repeat):
+                seconds, pages = measure(table_data, threshold)
+                timings.append(seconds)
+            results.append({
+                "rows": rows,
+                "mode": mode_name,
+                "median_s": statistics.median(timings),
+                "pages": pages,
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Layout benchmark for markdown tables in the PDF generator")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    print(f"{'rows':>6} {'mode':>10} {'median, s':>10} {'pages':>6}")
+    for item in results:
+        print(f"{item['rows']:>6} {item['mode']:>10} {item['median_s']:>10.3f} {item['pages']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Test doubles shared by the LLM engine wrapper tests."""
+
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+from app.core.call_context import CallCancelled, current_call
+from app.core.llm_engine import LLMEngine
+
+
+class FakeClock:
+    """Stand-in for ``time.monotonic`` that only moves when a test advances ``now``."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeEngine(LLMEngine):
+    """Answers with its name.
+
+    Each call advances ``clock`` by ``latency``. ``error`` or ``failing``
+    make calls raise; with ``stall`` a call blocks until ``released`` is set
+    or its cancel event fires.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        clock: Optional[FakeClock] = None,
+        latency: float = 1.0,
+        model_name: Optional[str] = None,
+        stall: bool = False,
+    ):
+        self.name = name
+        self.clock = clock
+        self.latency = latency
+        self.model_name = model_name
+        self.stall = stall
+        self.failing = False
+        self.error: Optional[BaseException] = None
+        self.calls = 0
+        self.released = threading.Event()
+        self.cancelled = threading.Event()
+
+    def ask(self, prompt: str) -> str:
+        self.calls += 1
+        if self.clock is not None:
+            self.clock.now += self.latency
+        cancel = current_call().cancel
+        while self.stall and not self.released.wait(0.01):
+            if cancel is not None and cancel.is_set():
+                self.cancelled.set()
+                raise CallCancelled("lost the race")
+        if self.error is not None:
+            raise self.error
+        if self.failing:
+            raise RuntimeError(f"{self.name} is down")
+        return self.name
@@ -0,0 +1,36 @@
+"""Unit tests for the CPU inference profile."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.config import CpuInferenceProfile, ModelSettings
+from app.core.cpu_profile import loading_kwargs
+
+
+class TestCpuProfile:
+    """Test profile parsing and load-time validation."""
+
+    def test_profile_from_model_config(self):
+        """The profile is read from the nested model config."""
+        model_cfg = ModelSettings(cpu_profile={"enabled": True, "num_threads": 8, "attn_implementation": "sdpa"})
+        assert model_cfg.cpu_profile.num_threads == 8
+        assert loading_kwargs(model_cfg.cpu_profile) == {"attn_implementation": "sdpa"}
+        assert loading_kwargs(CpuInferenceProfile(attn_implementation="sdpa")) == {}
+
+    def test_unsupported_combinations_are_rejected(self):
+        """Quantization needs float32 on CPU and cannot be combined with compile."""
+        pytest.importorskip("torch")
+        from app.core.cpu_profile import prepare_cpu_profile, validate_cpu_profile
+
+        model_cfg = ModelSettings(
+            device="cuda",
+            dtype="float16",
+            cpu_profile={"enabled": True, "quantize_int8": True, "torch_compile": True},
+        )
+        problems = validate_cpu_profile(model_cfg)
+        assert any("device" in problem for problem in problems)
+        assert any("float32" in problem for problem in problems)
+        assert any("torch_compile" in problem for problem in problems)
+        with pytest.raises(ValueError):
+            prepare_cpu_profile(model_cfg)
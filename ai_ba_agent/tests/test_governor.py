@@ -0,0 +1,218 @@
+"""Unit tests for the LLM call governor."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.config import GovernorSettings, ProviderLimits
+from app.core.call_context import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from app.core.governor import (
+    GovernedEngine,
+    LLMGovernor,
+    LLMQueueTimeout,
+    ProviderGovernor,
+    Ticket,
+    UserUsage,
+)
+from app.core.llm_engine import MockLLMEngine
+from tests.conftest import FakeClock
+
+
+class _SlowEngine(MockLLMEngine):
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def ask(self, prompt: str) -> str:
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self._lock:
+            self.active -= 1
+        return "ok"
+
+
+class TestProviderGovernor:
+    """Test in-flight cap, throttling and counters."""
+
+    def test_in_flight_cap_is_respected(self):
+        governor = LLMGovernor(GovernorSettings(providers={"ollama": ProviderLimits(max_in_flight=2)}))
+        engine = _SlowEngine()
+        governed = GovernedEngine(engine, "ollama", governor)
+        threads = [threading.Thread(target=governed.ask, args=("prompt",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert engine.peak <= 2
+        snapshot = governor.snapshot()["ollama"]
+        assert snapshot["admitted"] == 6
+        assert snapshot["in_flight"] == 0
+        assert snapshot["queue_depth"] == 0
+        assert snapshot["throttled"] >= 1
+
+    def test_rpm_limit_times_out_queued_call(self):
+        governor = ProviderGovernor("gemini", ProviderLimits(requests_per_minute=1))
+        with governor.slot(10, timeout=1):
+            pass
+        with pytest.raises(LLMQueueTimeout):
+            with governor.slot(10, timeout=0.05):
+                pass
+        snapshot = governor.snapshot()
+        assert snapshot["admitted"] == 1
+        assert snapshot["throttled"] == 1
+        assert snapshot["timed_out"] == 1
+        assert snapshot["queue_depth"] == 0
+
+    def test_completion_tokens_are_charged_on_release(self):
+        governor = ProviderGovernor("gemini", ProviderLimits(tokens_per_minute=1000), clock=FakeClock())
+        with governor.slot(100, timeout=1) as ticket:
+            ticket.completion_tokens = 400
+        assert governor._tokens is not None
+        assert governor._tokens.level == 500
+
+    def test_stream_holds_a_slot_until_it_ends(self):
+        class _Streaming(MockLLMEngine):
+            def stream(self, prompt: str):
+                yield "abc"
+                yield "def"
+
+        governor = LLMGovernor(GovernorSettings(providers={"llama.cpp": ProviderLimits(max_in_flight=1)}))
+        chunks = GovernedEngine(_Streaming(), "llama.cpp", governor).stream("prompt")
+        assert next(chunks) == "abc"
+        assert governor.snapshot()["llama.cpp"]["in_flight"] == 1
+        assert list(chunks) == ["def"]
+        snapshot = governor.snapshot()["llama.cpp"]
+        assert snapshot["in_flight"] == 0
+        assert snapshot["admitted"] == 1
+
+
+def _admission_order(governor: ProviderGovernor, priorities):
+    order = []
+
+    def worker(priority: int) -> None:
+        with governor.slot(1, timeout=5, priority=priority):
+            order.append(priority)
+
+    with governor.slot(1, timeout=1):
+        threads = []
+        for priority in priorities:
+            threads.append(threading.Thread(target=worker, args=(priority,)))
+            threads[-1].start()
+            while governor.queue_depth < len(threads):
+                time.sleep(0.001)
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+class TestPriorityScheduling:
+    """Test priority order, aging and queue metrics."""
+
+    def test_interactive_calls_jump_the_queue(self):
+        governor = ProviderGovernor("ollama", ProviderLimits(max_in_flight=1), aging_seconds=3600)
+        assert _admission_order(governor, [PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH]) == [
+            PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW,
+        ]
+        assert governor.snapshot()["queued_by_priority"] == {"high": 0, "normal": 0, "low": 0}
+
+    def test_aging_prevents_starvation(self):
+        governor = ProviderGovernor("ollama", ProviderLimits(max_in_flight=1), aging_seconds=0.001)
+        assert _admission_order(governor, [PRIORITY_LOW, PRIORITY_HIGH]) == [PRIORITY_LOW, PRIORITY_HIGH]
+
+    def test_aged_normal_call_never_takes_the_interactive_reserve(self):
+        clock = FakeClock()
+        governor = ProviderGovernor(
+            "ollama", ProviderLimits(max_in_flight=2), clock, aging_seconds=30, interactive_reserve=1
+        )
+        governor.acquire(1, timeout=1)
+        aged = Ticket(1, clock.now, PRIORITY_NORMAL)
+        governor._waiting.append(aged)
+        clock.now = 60.0
+        assert governor._admission_wait(aged) is None
+
+        governor._waiting.remove(aged)
+        chat = Ticket(1, clock.now, PRIORITY_HIGH)
+        governor._waiting.append(chat)
+        assert governor._admission_wait(chat) == 0
+
+    def test_aged_document_call_does_not_block_interactive_calls_behind_it(self):
+        clock = FakeClock()
+        governor = ProviderGovernor(
+            "ollama", ProviderLimits(max_in_flight=2), clock, aging_seconds=30, interactive_reserve=1
+        )
+        governor.acquire(1, timeout=1, priority=PRIORITY_NORMAL)
+        aged = Ticket(1, clock.now, PRIORITY_NORMAL)
+        governor._waiting.append(aged)
+        clock.now = 31.0
+        chat = Ticket(1, clock.now, PRIORITY_HIGH)
+        governor._waiting.append(chat)
+
+        assert governor._next_ticket() is chat
+        assert governor._admission_wait(chat) == 0
+        assert governor._admission_wait(aged) is None
+
+
+class TestFairShare:
+    """Test per-user fairness, caps and queue feedback."""
+
+    def test_light_user_goes_before_heavy_user(self):
+        usage = UserUsage()
+        governor = ProviderGovernor("gemini", ProviderLimits(max_in_flight=1), usage=usage, aging_seconds=3600)
+        usage.record("heavy", 50000)
+        order, positions = [], []
+
+        def worker(user: str, on_queued=None) -> None:
+            with governor.slot(1, timeout=5, user=user, on_queued=on_queued):
+                order.append(user)
+
+        with governor.slot(1, timeout=1, user="heavy"):
+            heavy = threading.Thread(target=worker, args=("heavy", positions.append))
+            heavy.start()
+            while governor.queue_depth < 1:
+                time.sleep(0.001)
+            light = threading.Thread(target=worker, args=("light",))
+            light.start()
+            while len(positions) < 2:
+                time.sleep(0.001)
+        heavy.join()
+        light.join()
+        assert order == ["light", "heavy"]
+        assert positions[:2] == [0, 1]
+
+    def test_queue_callback_runs_without_the_provider_lock(self):
+        governor = ProviderGovernor("gemini", ProviderLimits(max_in_flight=1))
+        unblocked = []
+
+        def on_queued(ahead: int) -> None:
+            probe = threading.Thread(target=governor.snapshot)
+            probe.start()
+            probe.join(1)
+            unblocked.append(not probe.is_alive())
+
+        with governor.slot(1, timeout=1):
+            with pytest.raises(LLMQueueTimeout):
+                governor.acquire(1, timeout=0.1, on_queued=on_queued)
+        assert unblocked == [True]
+
+    def test_users_with_an_empty_window_are_forgotten(self):
+        clock = FakeClock()
+        usage = UserUsage(window_seconds=60, clock=clock)
+        usage.record("closed-session", 100)
+        clock.now = 61.0
+        usage.record("active", 10)
+        assert usage.snapshot() == {"active": 10}
+
+    def test_per_user_cap_does_not_block_other_users(self):
+        governor = ProviderGovernor("ollama", ProviderLimits(max_in_flight=4), per_user_max_in_flight=1)
+        with governor.slot(1, timeout=1, user="a"):
+            with pytest.raises(LLMQueueTimeout):
+                governor.acquire(1, timeout=0.05, user="a")
+            with governor.slot(1, timeout=0.05, user="b"):
+                assert governor.in_flight == 2
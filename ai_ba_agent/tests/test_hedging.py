@@ -0,0 +1,63 @@
+"""Unit tests for hedged interactive requests."""
+
+from __future__ import annotations
+
+import threading
+
+from app.config import HedgingSettings
+from app.core.call_context import PROFILE_INTERACTIVE, call_context, current_call
+from app.core.hedging import HedgedEngine, HedgePolicy
+from tests.conftest import FakeEngine
+
+
+def _policy(**overrides) -> HedgePolicy:
+    config = {"enabled": True, "initial_delay_seconds": 0.1, "budget_ratio": 1.0, **overrides}
+    return HedgePolicy(HedgingSettings(**config))
+
+
+class TestHedgedEngine:
+    """Test when duplicates are sent and who wins."""
+
+    def test_slow_interactive_call_is_hedged_to_backup(self):
+        primary, backup = FakeEngine("primary", stall=True), FakeEngine("backup")
+        policy = _policy()
+        policy.record(PROFILE_INTERACTIVE, 0.05, hedged=False, hedge_won=False)
+        engine = HedgedEngine(primary, backup, policy)
+        try:
+            with call_context(profile=PROFILE_INTERACTIVE):
+                assert engine.ask("q") == "backup"
+            # The losing primary is cancelled instead of holding its slot
+            assert primary.cancelled.wait(1)
+            # Non-interactive calls run directly, without a duplicate
+            backup.calls = 0
+            assert HedgedEngine(FakeEngine("doc"), backup, policy).ask("q") == "doc"
+            assert backup.calls == 0
+        finally:
+            primary.released.set()
+        assert policy.snapshot() == {"calls": 2, "hedged": 1, "hedge_wins": 1}
+
+    def test_budget_caps_duplicates(self):
+        primary, backup = FakeEngine("primary", stall=True), FakeEngine("backup")
+        engine = HedgedEngine(primary, backup, _policy(budget_ratio=0.0))
+        threading.Timer(0.3, primary.released.set).start()
+        with call_context(profile=PROFILE_INTERACTIVE):
+            assert engine.ask("q") == "primary"
+        assert backup.calls == 0
+
+    def test_queue_callbacks_run_on_the_calling_thread(self):
+        class _Queued(FakeEngine):
+            def ask(self, prompt: str) -> str:
+                on_queued = current_call().on_queued
+                assert on_queued is not None
+                on_queued(2)
+                return super().ask(prompt)
+
+        threads = []
+
+        def on_queued(ahead: int) -> None:
+            threads.append(threading.current_thread())
+
+        engine = HedgedEngine(_Queued("primary"), policy=_policy())
+        with call_context(profile=PROFILE_INTERACTIVE, on_queued=on_queued):
+            assert engine.ask("q") == "primary"
+        assert threads == [threading.current_thread()]
@@ -0,0 +1,42 @@
+"""Unit tests for the bounded chat history."""
+
+from __future__ import annotations
+
+from app.core.intelligent_dialog_manager import IntelligentDialogManager
+from app.core.llm_engine import MockLLMEngine
+from app.utils.history import BoundedHistory, HistoryTurn
+from app.utils.state import ConversationState
+
+
+class TestBoundedHistory:
+    """Test the ring buffer, rolling summary and prompt size."""
+
+    def test_old_turns_fold_into_summary(self):
+        """Only ``limit`` turns are kept, evicted ones end up in the summary."""
+        history = BoundedHistory(limit=5)
+        for idx in range(12):
+            history.append({"role": "user" if idx % 2 else "assistant", "content": f"Сообщение {idx}. Детали."})
+
+        assert len(history) == 5
+        assert [turn["content"] for turn in history][0] == "Сообщение 7. Детали."
+        assert "Сообщение 0." in history.summary and "Детали" not in history.summary
+        assert "Сообщение 7." not in history.summary
+        assert history.recent(2)[-1].content == "Сообщение 11. Детали."
+        assert history[-1].get("field") is None
+        assert not hasattr(HistoryTurn("user", "x"), "__dict__")
+
+        history.clear()
+        assert len(history) == 0 and history.summary == ""
+
+    def test_summary_and_prompt_stay_bounded(self):
+        """A long dialog does not grow the summary or the analysis prompt."""
+        manager = IntelligentDialogManager(ConversationState(), MockLLMEngine())
+        sizes = []
+        for idx in range(200):
+            manager.conversation_history.append({"role": "user", "content": f"Ответ номер {idx} " + "текст " * 50})
+            sizes.append(len(manager._build_analysis_prompt("Новое сообщение").text))
+
+        assert len(manager.conversation_history) == manager.conversation_history.limit
+        assert len(manager.conversation_history.summary) <= 1500
+        assert "Кратко о более ранних сообщениях" in manager._build_analysis_prompt("x").text
+        assert max(sizes[100:]) - min(sizes[100:]) < 50
@@ -0,0 +1,57 @@
+"""Unit tests for diagram image preparation."""
+
+from __future__ import annotations
+
+import io
+
+from PIL import Image as PILImage, ImageDraw
+
+from app.utils.image_prep import clear_cache, png_dimensions, prepare_diagram_image
+
+
+def _make_png(width: int, height: int) -> bytes:
+    image = PILImage.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for x in range(0, width, 40):
+        draw.line([(x, 0), (x, height)], fill="black", width=2)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestImagePrep:
+    """Test header parsing, downsampling and caching of diagram images."""
+
+    def test_png_dimensions_from_header(self):
+        """Dimensions are read from IHDR, non-PNG data is rejected."""
+        assert png_dimensions(_make_png(320, 200)) == (320, 200)
+        assert png_dimensions(b"GIF89a" + b"\x00" * 30) is None
+
+    def test_oversized_image_is_downsampled(self):
+        """A 4000px wide diagram is scaled to the page box at the target DPI."""
+        clear_cache()
+        source = _make_png(4000, 1000)
+        prepared = prepare_diagram_image(source, max_width=500, max_height=700, dpi=144)
+
+        assert prepared.display_width == 500
+        assert prepared.display_height == 125
+        # 500pt at 144 DPI -> 1000px
+        assert png_dimensions(prepared.data) == (1000, 250)
+        assert len(prepared.data) < len(source)
+
+    def test_small_image_is_left_alone(self):
+        """Images that already fit are embedded unchanged."""
+        clear_cache()
+        source = _make_png(300, 200)
+        prepared = prepare_diagram_image(source, max_width=500, max_height=700, dpi=150)
+
+        assert prepared.data == source
+        assert (prepared.display_width, prepared.display_height) == (300, 200)
+
+    def test_prepared_images_are_cached(self):
+        """Same source and parameters return the cached result."""
+        clear_cache()
+        source = _make_png(2000, 2000)
+        first = prepare_diagram_image(source, max_width=400, max_height=400, dpi=100, quantize=True)
+        second = prepare_diagram_image(source, max_width=400, max_height=400, dpi=100, quantize=True)
+        assert first is second
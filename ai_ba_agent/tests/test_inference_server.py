@@ -0,0 +1,116 @@
+"""Unit tests for the dynamic batching inference server."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.call_context import DeadlineExceeded
+from app.core.inference_server import BatchingInferenceServer
+
+
+class TestBatchingInferenceServer:
+    """Test batching of concurrent prompts and error propagation."""
+
+    def test_concurrent_prompts_share_batches(self):
+        """Prompts arriving together are generated in one call, results keep order."""
+        batches = []
+        release = threading.Event()
+
+        def generate_batch(prompts, limits):
+            release.wait(5)
+            batches.append(list(prompts))
+            return [prompt.upper() for prompt in prompts]
+
+        server = BatchingInferenceServer(generate_batch, max_batch_size=4, max_wait_ms=200)
+        try:
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                futures = [server.submit(f"prompt {idx}") for idx in range(6)]
+                release.set()
+                results = list(pool.map(lambda future: future.result(timeout=10), futures))
+        finally:
+            server.shutdown()
+
+        assert results == [f"PROMPT {idx}" for idx in range(6)]
+        assert server.requests_served == 6
+        assert server.largest_batch == 4
+        assert len(batches) < 6
+
+    def test_batch_failure_reaches_every_caller(self):
+        """An exception in generate fails all futures of the batch."""
+        def generate_batch(prompts, limits):
+            raise RuntimeError("out of memory")
+
+        server = BatchingInferenceServer(generate_batch, max_batch_size=2, max_wait_ms=50)
+        try:
+            future = server.submit("x")
+            with pytest.raises(RuntimeError, match="out of memory"):
+                future.result(timeout=5)
+        finally:
+            server.shutdown()
+
+    def test_only_requests_with_the_same_cap_share_a_batch(self):
+        """Each batch runs under its requests' own cap; expired requests are not run."""
+        seen = []
+        release = threading.Event()
+
+        def generate_batch(prompts, limits):
+            release.wait(5)
+            seen.append((sorted(prompts), limits.max_new_tokens))
+            return list(prompts)
+
+        server = BatchingInferenceServer(generate_batch, max_batch_size=4, max_wait_ms=200)
+        try:
+            blocker = server.submit("blocker", max_new_tokens=512)
+            expired = server.submit("expired", max_new_tokens=512, max_seconds=0)
+            short = server.submit("short", max_new_tokens=64, max_seconds=30)
+            long = server.submit("long", max_new_tokens=512)
+            release.set()
+            assert [blocker.result(timeout=5), short.result(timeout=5), long.result(timeout=5)] == [
+                "blocker", "short", "long",
+            ]
+            with pytest.raises(DeadlineExceeded):
+                expired.result(timeout=5)
+        finally:
+            server.shutdown()
+
+        assert (["short"], 64) in seen
+        assert all(cap == 512 for prompts, cap in seen if prompts != ["short"])
+        assert all("expired" not in prompts for prompts, _ in seen)
+
+    def test_deadline_stop_fails_only_expired_requests(self):
+        """Requests with time left are retried in the next batch."""
+        batches = []
+
+        def generate_batch(prompts, limits):
+            batches.append((list(prompts), limits.max_seconds))
+            if limits.max_seconds is not None:
+                time.sleep(limits.max_seconds)
+                raise DeadlineExceeded("stopped at the batch limit")
+            return list(prompts)
+
+        server = BatchingInferenceServer(generate_batch, max_batch_size=2, max_wait_ms=200)
+        try:
+            short = server.submit("short", max_seconds=0.1)
+            long = server.submit("long")
+            with pytest.raises(DeadlineExceeded):
+                short.result(timeout=5)
+            assert long.result(timeout=5) == "long"
+        finally:
+            server.shutdown()
+
+        assert [prompts for prompts, _ in batches] == [["short", "long"], ["long"]]
+
+    def test_missing_completions_fail_the_batch(self):
+        """A generator returning too few completions never leaves a caller waiting."""
+        server = BatchingInferenceServer(lambda prompts, limits: prompts[:1], max_batch_size=2, max_wait_ms=200)
+        try:
+            futures = [server.submit("a"), server.submit("b")]
+            for future in futures:
+                with pytest.raises(RuntimeError, match="completions"):
+                    future.result(timeout=5)
+        finally:
+            server.shutdown()
@@ -0,0 +1,40 @@
+"""Unit tests for the prefix KV cache bookkeeping."""
+
+from __future__ import annotations
+
+from app.core.kv_cache import PrefixEntry, PrefixKVCache
+
+
+class _Ids:
+    def __init__(self, tokens: int):
+        self.shape = (1, tokens)
+
+
+def _entry(tokens: int, nbytes: int) -> PrefixEntry:
+    return PrefixEntry(_Ids(tokens), past_key_values=object(), nbytes=nbytes)
+
+
+class TestPrefixKVCache:
+    """Test LRU eviction by bytes and saved-token accounting."""
+
+    def test_lru_bounded_by_bytes(self):
+        """Least recently used prefixes are evicted when over budget."""
+        cache = PrefixKVCache(max_bytes=100)
+        cache.put("a", _entry(10, 40))
+        cache.put("b", _entry(20, 40))
+        assert cache.get("a") is not None  # "b" is now the oldest
+        cache.put("c", _entry(30, 40))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.total_bytes == 80
+        assert not cache.put("huge", _entry(5, 1000))
+
+    def test_hits_count_saved_prefill_tokens(self):
+        """Each hit saves the prefix length worth of prefill."""
+        cache = PrefixKVCache(max_bytes=1000)
+        assert cache.get("brd") is None
+        cache.put("brd", _entry(3000, 10))
+        cache.get("brd")
+        cache.get("brd")
+        assert (cache.hits, cache.misses, cache.tokens_saved) == (2, 1, 6000)
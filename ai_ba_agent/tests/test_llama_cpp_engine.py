@@ -0,0 +1,97 @@
+"""Unit tests for the llama.cpp engine."""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+from app.config import ModelSettings
+from app.core import llm_engine
+from app.core.call_context import CallCancelled, DeadlineExceeded, call_context, deadline_after
+from app.core.llm_engine import LlamaCppEngine, _llama_model_path
+
+
+class _FakeLlama:
+    """Emits one token per step and consults the stopping criteria like llama.cpp."""
+
+    n_threads = 1
+
+    def __init__(self, tokens: int = 5, step_seconds: float = 0.0):
+        self.tokens = tokens
+        self.step_seconds = step_seconds
+
+    def _generate(self, stopping_criteria):
+        for index in range(self.tokens):
+            if any(criterion(None, None) for criterion in stopping_criteria):
+                return
+            time.sleep(self.step_seconds)
+            yield f"t{index} "
+
+    def __call__(self, prompt, stream=False, stopping_criteria=(), **kwargs):
+        if stream:
+            return ({"choices": [{"text": text}]} for text in self._generate(stopping_criteria))
+        texts = list(self._generate(stopping_criteria))
+        return {"choices": [{"text": "".join(texts)}], "usage": {"prompt_tokens": 3, "completion_tokens": len(texts)}}
+
+
+@pytest.fixture
+def make_engine(monkeypatch):
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(StoppingCriteriaList=list))
+
+    def make(**fake) -> LlamaCppEngine:
+        monkeypatch.setattr(llm_engine, "_load_llama", lambda: _FakeLlama(**fake))
+        return LlamaCppEngine()
+
+    return make
+
+
+class TestLlamaCppConfig:
+    """Test GGUF model path resolution."""
+
+    def test_model_path_resolution(self):
+        """Explicit path wins, a .gguf model_name is accepted, anything else fails."""
+        assert _llama_model_path(ModelSettings(llama_model_path="/models/a.gguf")) == Path("/models/a.gguf")
+        assert _llama_model_path(ModelSettings(model_name="/models/b.gguf")) == Path("/models/b.gguf")
+        with pytest.raises(ValueError):
+            _llama_model_path(ModelSettings(model_name="gemma:latest"))
+
+
+class TestLlamaCppEngine:
+    """Test generation, timeouts and cancellation with a fake model."""
+
+    def test_ask_and_stream_generate(self, make_engine):
+        engine = make_engine(tokens=3)
+        assert engine.ask("q") == "t0 t1 t2"
+        assert engine.last_stats.completion_tokens == 3
+        assert "".join(engine.stream("q")) == "t0 t1 t2 "
+
+    def test_deadline_and_cancel_stop_ask_and_stream(self, make_engine):
+        engine = make_engine(tokens=100, step_seconds=0.01)
+        with deadline_after(0.05):
+            with pytest.raises(DeadlineExceeded):
+                engine.ask("q")
+        with deadline_after(0.05):
+            with pytest.raises(DeadlineExceeded):
+                list(engine.stream("q"))
+
+        cancel = threading.Event()
+        chunks = []
+        with call_context(cancel=cancel):
+            with pytest.raises(CallCancelled):
+                for chunk in engine.stream("q"):
+                    chunks.append(chunk)
+                    cancel.set()
+        assert chunks == ["t0 "]
+        assert not engine._lock.locked()
+
+    def test_generation_time_leaves_out_the_lock_wait(self, make_engine):
+        engine = make_engine(tokens=3)
+        engine._lock.acquire()
+        threading.Timer(0.2, engine._lock.release).start()
+        engine.ask("q")
+        assert engine.last_stats.decode_seconds < 0.1
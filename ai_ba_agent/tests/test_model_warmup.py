@@ -0,0 +1,48 @@
+"""Unit tests for background model warm-up."""
+
+from __future__ import annotations
+
+import threading
+
+from app.core.llm_engine import LLMEngine
+from app.core.model_warmup import ModelWarmer
+
+
+class _Engine(LLMEngine):
+    def __init__(self, failures: int = 0):
+        self.calls = 0
+        self.failures = failures
+        self.pinged = threading.Event()
+
+    def warm_up(self) -> None:
+        self.calls += 1
+        if self.calls > 2:
+            self.pinged.set()
+        if self.calls <= self.failures:
+            raise RuntimeError("connection refused")
+
+
+class TestModelWarmer:
+    """Test readiness and keep-warm pings."""
+
+    def test_preload_sets_ready_and_keeps_pinging(self):
+        """The model is preloaded once and re-pinged at the interval."""
+        engine = _Engine()
+        warmer = ModelWarmer(engine, interval_seconds=0.01)
+        warmer.start()
+        warmer.start()
+        try:
+            assert warmer.wait_ready(timeout=5)
+            assert engine.pinged.wait(timeout=5)
+        finally:
+            warmer.stop()
+        assert warmer.last_error is None
+
+    def test_failure_is_reported_until_recovery(self):
+        """A failed preload clears readiness and keeps the error for the UI."""
+        warmer = ModelWarmer(_Engine(failures=1), interval_seconds=0)
+        assert not warmer.warm_once()
+        assert not warmer.is_ready
+        assert warmer.last_error is not None and "refused" in warmer.last_error
+        assert warmer.warm_once()
+        assert warmer.is_ready and warmer.last_error is None
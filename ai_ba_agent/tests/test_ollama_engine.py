@@ -0,0 +1,48 @@
+"""Unit tests for the Ollama engine request layout."""
+
+from __future__ import annotations
+
+from app.core import llm_engine
+from app.core.llm_engine import OllamaEngine
+from app.core.prompt_builder import PromptTemplate
+
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class TestOllamaEngine:
+    """Test that dialog turns keep the cached prefix on the server."""
+
+    def test_split_prompt_uses_chat_with_stable_system_message(self, monkeypatch):
+        """The prefix is the system message, the model is kept alive between turns."""
+        calls = []
+
+        def fake_post(url, json, timeout):
+            calls.append((url, json))
+            return _Response({
+                "message": {"role": "assistant", "content": " Ответ "},
+                "prompt_eval_count": 12,
+                "eval_count": 3,
+            })
+
+        monkeypatch.setattr(llm_engine.requests, "post", fake_post)
+        engine = OllamaEngine()
+        template = PromptTemplate(prefix="Правила анализа\n", suffix="Сообщение: {message}")
+
+        assert engine.ask_prompt(template.build(message="первое")) == "Ответ"
+        engine.ask_prompt(template.build(message="второе"))
+
+        (first_url, first), (_, second) = calls
+        assert first_url.endswith("/api/chat")
+        assert first["messages"][0] == second["messages"][0] == {"role": "system", "content": "Правила анализа\n"}
+        assert second["messages"][1]["content"] == "Сообщение: второе"
+        assert first["keep_alive"] == engine.keep_alive
+        assert (engine.last_stats.prompt_tokens, engine.last_stats.completion_tokens) == (12, 3)
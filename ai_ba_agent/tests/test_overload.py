@@ -0,0 +1,91 @@
+"""Unit tests for the overload controller and degraded generation."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pytest
+
+from app.config import OverloadSettings, TieringSettings, settings
+from app.core.call_context import TASK_DOCUMENT, call_context, current_call
+from app.core.llm_engine import LLMEngine
+from app.core.overload import (
+    LEVEL_FAST_MODEL,
+    LEVEL_REJECT,
+    OverloadController,
+    OverloadRejected,
+)
+from app.core.tiering import TaskLatencyStats, TieredEngine
+
+
+class _Queues:
+    def __init__(self) -> None:
+        self.llm = 0
+        self.render = 0
+        self.now = 0.0
+
+    def signals(self):
+        return self.llm, self.render
+
+    def clock(self) -> float:
+        return self.now
+
+
+@dataclass
+class _Engine(LLMEngine):
+    model_name: str
+    limits: List[Optional[int]] = field(default_factory=list)
+
+    def ask(self, prompt: str) -> str:
+        self.limits.append(current_call().max_new_tokens)
+        return prompt
+
+
+class TestOverloadController:
+    """Test level changes, hysteresis and rejection."""
+
+    def test_steps_up_at_once_and_down_one_level_after_hold(self):
+        queues = _Queues()
+        config = OverloadSettings(llm_queue_levels=[2, 4, 6, 8], render_queue_levels=[1, 2, 3, 4], hold_seconds=10)
+        controller = OverloadController(config, queues.signals, queues.clock)
+
+        queues.render = 4
+        with pytest.raises(OverloadRejected) as rejected:
+            controller.admit()
+        assert rejected.value.retry_after == config.retry_after_seconds
+
+        queues.render = 0
+        queues.now = 5.0
+        assert controller.evaluate() == LEVEL_REJECT
+        queues.now = 10.0
+        assert controller.evaluate() == LEVEL_REJECT - 1
+        queues.now = 15.0
+        assert controller.evaluate() == LEVEL_REJECT - 1
+
+        snapshot = controller.snapshot()
+        assert snapshot["rejected"] == 1
+        assert snapshot["transitions"]["reject"] == 1
+        assert snapshot["seconds_in_level"]["reject"] == 10.0
+
+    def test_degraded_calls_use_fast_model_and_short_output(self):
+        queues = _Queues()
+        controller = OverloadController(
+            OverloadSettings(llm_queue_levels=[1, 2, 3, 4]), queues.signals, queues.clock
+        )
+        pro, flash = _Engine("pro"), _Engine("flash")
+        engine = TieredEngine(pro, flash, TieringSettings(), TaskLatencyStats(), controller)
+
+        with call_context(task=TASK_DOCUMENT):
+            engine.ask("норма")
+            queues.llm = 1
+            engine.ask("короче")
+            queues.llm = 2
+            engine.ask("быстрая модель")
+
+        short = int(settings.model.max_new_tokens * controller.config.short_output_ratio)
+        assert pro.limits == [None, short]
+        assert flash.limits == [short]
+        degraded = controller.snapshot()["degraded_calls"]
+        assert degraded["short_output"] == 1 and degraded["fast_model"] == 1
+        assert controller.level == LEVEL_FAST_MODEL
@@ -0,0 +1,37 @@
+"""Unit tests for the PDF generation benchmark suite."""
+
+from __future__ import annotations
+
+from benchmarks.pdf_generation import BenchmarkCase, compare_results, run_case, synthetic_bundle
+
+
+def _results(wall_time_s: float, peak: int, size: int) -> dict:
+    return {"results": [{
+        "name": "small",
+        "wall_time_s": wall_time_s,
+        "peak_memory_bytes": peak,
+        "output_bytes": size,
+        "pages": 5,
+    }]}
+
+
+class TestPdfBenchmark:
+    """Test benchmark measurement and baseline comparison."""
+
+    def test_run_case_is_offline(self):
+        """A small case renders with the stubbed diagram renderer."""
+        result = run_case(BenchmarkCase("small", lambda: synthetic_bundle(chapters=1, paragraphs=1)), repeat=1)
+        assert result.output_bytes > 0
+        assert result.pages >= 1
+        assert result.peak_memory_bytes > 0
+
+    def test_compare_results_flags_regressions_over_threshold(self):
+        """Only metrics above the threshold are reported, tiny time deltas are ignored."""
+        baseline = _results(1.0, 1_000_000, 50_000)
+        assert compare_results(_results(1.1, 1_100_000, 55_000), baseline, threshold=0.2) == []
+
+        regressions = compare_results(_results(1.5, 1_000_000, 80_000), baseline, threshold=0.2)
+        assert [line.split(":")[0] for line in regressions] == ["small.wall_time_s", "small.output_bytes"]
+
+        # +100% of 10 ms is still below the noise floor
+        assert compare_results(_results(0.02, 1, 1), _results(0.01, 1, 1), threshold=0.2) == []
@@ -6,8 +6,14 @@ import tempfile
 import os
 from pathlib import Path
 
+from reportlab.platypus import LongTable, Table
+
 from app.generators.pdf_generator import (
+    _compute_column_widths,
+    _render_table,
     markdown_to_pdf_bytes,
+    markdown_to_pdf_spooled,
+    write_pdf,
     _register_cyrillic_font,
     CYRILLIC_FONT_NAME,
 )
@@ -129,6 +135,42 @@ class TestPDFCyrillicSupport:
         
         print("✅ Таблицы правильно рендерятся в PDF")
 
+    def test_streaming_output(self):
+        """Test that PDF can be written to a path, a stream and a spooled file."""
+        test_sections = {"Test": "# Тест\n\nПотоковая запись PDF."}
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            target = Path(tmp_dir) / "out.pdf"
+            assert write_pdf(test_sections, target, project_name="Тест") == target
+            assert target.read_bytes().startswith(b'%PDF')
+            
+            with open(Path(tmp_dir) / "stream.pdf", "w+b") as stream:
+                write_pdf(test_sections, stream, project_name="Тест")
+                stream.seek(0)
+                assert stream.read(4) == b'%PDF'
+        
+        with markdown_to_pdf_spooled(test_sections, project_name="Тест") as spooled:
+            assert spooled.read(4) == b'%PDF'
+
+    def test_large_table_mode(self):
+        """Test that big tables use LongTable with content-aware column widths."""
+        table_data = [["ID", "Описание", "Приоритет"]]
+        for idx in range(40):
+            table_data.append([f"R-{idx}", "Подробное описание риска и его влияния на проект " * 3, "Высокий"])
+        
+        story = []
+        _render_table(story, table_data, large_table_rows=30)
+        assert isinstance(story[0], LongTable)
+        assert story[0].repeatRows == 1
+        
+        story = []
+        _render_table(story, table_data[:10], large_table_rows=30)
+        assert type(story[0]) is Table
+        
+        widths = _compute_column_widths(table_data, 500)
+        assert abs(sum(widths) - 500) < 1e-6
+        assert widths[1] > widths[0] and widths[1] > widths[2]
+
 
 if __name__ == "__main__":
     # Run tests manually
@@ -0,0 +1,88 @@
+"""Unit tests for the out-of-process PDF build service."""
+
+from __future__ import annotations
+
+from concurrent.futures import Future
+
+from app.generators.pdf_service import (
+    STATUS_FAILED,
+    STATUS_MISSING,
+    STATUS_READY,
+    PdfBuildService,
+    bundle_hash,
+)
+
+SECTIONS = {
+    "BRD": "# BRD\n\n## 1. Обзор\n\nСистема лояльности для клиентов банка.",
+    "Use Case": "## 1. Название\n\nНакопление баллов",
+}
+
+
+class _FailingExecutor:
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, *args) -> Future:
+        self.submitted += 1
+        future: Future = Future()
+        future.set_exception(RuntimeError("layout error"))
+        return future
+
+
+class TestPdfBuildService:
+    """Test PDF builds in worker processes and the shared result cache."""
+
+    def test_bundle_hash_depends_on_content_and_order(self):
+        """Hash changes with content, project name and section order."""
+        reordered = dict(reversed(list(SECTIONS.items())))
+        assert bundle_hash(SECTIONS, "A") == bundle_hash(dict(SECTIONS), "A")
+        assert bundle_hash(SECTIONS, "A") != bundle_hash(SECTIONS, "B")
+        assert bundle_hash(SECTIONS, "A") != bundle_hash(reordered, "A")
+
+    def test_identical_bundles_build_once(self, tmp_path):
+        """Concurrent submits of one bundle share a single build."""
+        service = PdfBuildService(cache_dir=tmp_path, max_workers=1, cache_size=4)
+        try:
+            assert service.status("unknown").state == STATUS_MISSING
+            key = service.submit(SECTIONS, "Система лояльности")
+            same_key = service.submit(dict(SECTIONS), "Система лояльности")
+            assert key == same_key
+
+            status = service.wait(key, timeout=120)
+            assert status.state == STATUS_READY, status
+            pdf_file = service.open_result(key)
+            assert pdf_file is not None
+            with pdf_file:
+                assert pdf_file.read(4) == b"%PDF"
+
+            service.submit(SECTIONS, "Система лояльности")
+            assert service.builds_started == 1
+        finally:
+            service.shutdown()
+
+        # A new process finds the artifact on disk instead of rebuilding it
+        restarted = PdfBuildService(cache_dir=tmp_path, max_workers=1)
+        assert restarted.submit(SECTIONS, "Система лояльности") == key
+        assert restarted.status(key).state == STATUS_READY
+        assert restarted.builds_started == 0
+
+    def test_failed_build_backs_off_and_errors_are_bounded(self, tmp_path, monkeypatch):
+        """A failed bundle is not rebuilt before the retry delay; old errors are evicted."""
+        now = [0.0]
+        service = PdfBuildService(cache_dir=tmp_path, cache_size=1, retry_seconds=30, clock=lambda: now[0])
+        executor = _FailingExecutor()
+        monkeypatch.setattr(service, "_executor", executor)
+
+        key = service.submit(SECTIONS, "A")
+        assert service.status(key).state == STATUS_FAILED
+        assert service.submit(SECTIONS, "A") == key
+        assert executor.submitted == 1
+        assert service.status(key).error == "layout error"
+
+        now[0] = 30.0
+        service.submit(SECTIONS, "A")
+        assert executor.submitted == 2
+
+        other = service.submit(SECTIONS, "B")
+        assert service.status(other).state == STATUS_FAILED
+        assert service.status(key).state == STATUS_MISSING
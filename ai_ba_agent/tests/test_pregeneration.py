@@ -0,0 +1,94 @@
+"""Unit tests for speculative background generation."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from app.config import ProviderLimits
+from app.core.call_context import PRIORITY_LOW, PRIORITY_NORMAL, check_deadline, current_call
+from app.core.governor import ProviderGovernor
+from app.core.orchestrator import DocumentBundle, Orchestrator
+from app.core.pregeneration import Pregenerator
+from app.utils.state import FIELD_SEQUENCE, ConversationState
+
+
+def _complete_state() -> ConversationState:
+    return ConversationState(answers={name: f"значение {name}" for name in FIELD_SEQUENCE})
+
+
+class _Orchestrator(Orchestrator):
+    def __init__(self, release: threading.Event):
+        self.release = release
+        self.priorities: List[int] = []
+
+    def generate_documents(self, state: ConversationState) -> DocumentBundle:
+        self.priorities.append(current_call().priority)
+        self.release.wait(5)
+        self.priorities.append(current_call().priority)
+        check_deadline()
+        return DocumentBundle(state.answers[FIELD_SEQUENCE[0]], "", "", "")
+
+
+class TestPregenerator:
+    """Test that the button joins the background job and edits cancel it."""
+
+    def test_join_returns_background_bundle_and_promotes_it(self):
+        release = threading.Event()
+        orchestrator = _Orchestrator(release)
+        pregenerator = Pregenerator(lambda model_name: orchestrator, ThreadPoolExecutor(max_workers=1))
+        state = _complete_state()
+
+        pregenerator.sync(state, "flash")
+        pregenerator.sync(state, "flash")
+        threading.Timer(0.1, release.set).start()
+        bundle = pregenerator.join(state, "flash")
+
+        assert bundle is not None
+        assert bundle.brd == state.answers[FIELD_SEQUENCE[0]]
+        assert pregenerator.started == 1 and pregenerator.joined == 1
+        assert orchestrator.priorities == [PRIORITY_LOW, PRIORITY_NORMAL]
+
+    def test_state_change_cancels_the_job(self):
+        release = threading.Event()
+        orchestrator = _Orchestrator(release)
+        pregenerator = Pregenerator(lambda model_name: orchestrator, ThreadPoolExecutor(max_workers=2))
+        state = _complete_state()
+
+        pregenerator.sync(state, "flash")
+        stale = pregenerator._job
+        assert stale is not None
+        state.clear_field(FIELD_SEQUENCE[0])
+        pregenerator.sync(state, "flash")
+        release.set()
+
+        assert stale.cancel.is_set() and pregenerator.cancelled == 1
+        assert pregenerator.join(state, "flash") is None
+        assert not pregenerator.running
+
+    def test_promotion_reorders_an_already_queued_call(self):
+        governor = ProviderGovernor("gemini", ProviderLimits(max_in_flight=1), aging_seconds=3600)
+        promoted = threading.Event()
+        order = []
+
+        def worker(name: str, priority: int, event=None) -> None:
+            with governor.slot(1, timeout=5, priority=priority, promoted=event, cancel=threading.Event()):
+                order.append(name)
+
+        held = governor.acquire(1, timeout=1)
+        threads = [
+            threading.Thread(target=worker, args=("background", PRIORITY_LOW, promoted)),
+            threading.Thread(target=worker, args=("document", PRIORITY_NORMAL)),
+        ]
+        for expected_depth, thread in enumerate(threads, start=1):
+            thread.start()
+            while governor.queue_depth < expected_depth:
+                time.sleep(0.001)
+        promoted.set()
+        governor.release(held)
+        for thread in threads:
+            thread.join()
+
+        assert order == ["background", "document"]
@@ -0,0 +1,55 @@
+"""Unit tests for prefix-stable prompt assembly."""
+
+from __future__ import annotations
+
+from app.core import prompt_templates
+from app.core.intelligent_dialog_manager import IntelligentDialogManager
+from app.core.llm_engine import MockLLMEngine
+from app.core.prompt_builder import Prompt, PromptTemplate
+from app.utils.state import ConversationState
+
+
+class TestPromptBuilder:
+    """Test that variable data never leaks into the static prefix."""
+
+    def test_template_builds_prefix_and_suffix(self):
+        """Prefix is used verbatim, suffix is formatted, text joins them."""
+        template = PromptTemplate(prefix='Верни JSON: {"a": 1}\n', suffix="Контекст: {context}")
+        prompt = template.build(context="X")
+
+        assert prompt == Prompt('Верни JSON: {"a": 1}\n', "Контекст: X")
+        assert prompt.text == template.format(context="X") == str(prompt)
+        assert prompt.prefix_hash == template.prefix_hash
+        assert len(prompt.prefix_hash) == 16
+
+    def test_document_prompts_share_prefix(self):
+        """Different contexts and diagram types keep byte-identical prefixes."""
+        for template in (
+            prompt_templates.BRD_TEMPLATE,
+            prompt_templates.USE_CASE_TEMPLATE,
+            prompt_templates.USER_STORIES_TEMPLATE,
+            prompt_templates.PLANTUML_DIAGRAM_TYPE_ANALYSIS,
+        ):
+            first = template.build(context="Проект А")
+            second = template.build(context="Проект Б")
+            assert first.prefix == second.prefix
+            assert first.prefix.startswith(template.prefix)
+            assert "Проект" not in first.prefix and "Проект А" in first.suffix
+
+        activity = prompt_templates.PLANTUML_TEMPLATE.build(context="A", diagram_type="activity")
+        sequence = prompt_templates.PLANTUML_TEMPLATE.build(context="B", diagram_type="sequence")
+        assert activity.prefix_hash == sequence.prefix_hash
+        assert "activity" in activity.suffix
+
+    def test_dialog_turns_share_prefix(self):
+        """Analysis prompts of different turns differ only in the suffix."""
+        state = ConversationState()
+        manager = IntelligentDialogManager(state, MockLLMEngine())
+        first = manager._build_analysis_prompt("Хотим систему лояльности")
+        state.update_field("goal", "Рост удержания клиентов")
+        manager.conversation_history.append({"role": "user", "content": "Хотим систему лояльности"})
+        second = manager._build_analysis_prompt("Метрика — NPS")
+
+        assert first.prefix_hash == second.prefix_hash
+        assert "Метрика — NPS" in second.suffix
+        assert '"extracted_info": {' in first.prefix
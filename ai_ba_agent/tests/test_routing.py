@@ -0,0 +1,99 @@
+"""Unit tests for provider failover and circuit breakers."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from app.config import RoutingSettings
+from app.core.call_context import CallCancelled, DeadlineExceeded, call_context
+from app.core.routing import CLOSED, OPEN, ProviderRouter, RoutedEngine
+from tests.conftest import FakeClock, FakeEngine
+
+
+class TestRoutedEngine:
+    """Test latency routing, failover and circuit recovery."""
+
+    def test_fails_over_opens_circuit_and_recovers_after_probe(self):
+        clock = FakeClock()
+        router = ProviderRouter(RoutingSettings(failure_threshold=2, open_seconds=10), clock)
+        gemini = FakeEngine("gemini", clock, latency=1.0)
+        ollama = FakeEngine("ollama", clock, latency=3.0)
+        engine = RoutedEngine([("gemini", gemini), ("ollama", ollama)], router)
+
+        # Both get measured once, then the faster one wins
+        assert {engine.ask("q"), engine.ask("q")} == {"gemini", "ollama"}
+        assert engine.ask("q") == "gemini"
+
+        gemini.failing = True
+        assert engine.ask("q") == "ollama"
+        assert engine.ask("q") == "ollama"
+        assert router.health("gemini").state == OPEN
+        calls = gemini.calls
+        assert engine.ask("q") == "ollama"
+        assert gemini.calls == calls
+
+        gemini.failing = False
+        router.probe_once()
+        assert router.health("gemini").state == OPEN
+        clock.now += 10
+        router.probe_once()
+        assert router.health("gemini").state == CLOSED
+        assert engine.ask("q") == "gemini"
+        assert 0 < router.health("gemini").error_rate < 1
+
+    def test_cancelled_call_is_not_a_provider_failure(self):
+        clock = FakeClock()
+        router = ProviderRouter(RoutingSettings(failure_threshold=1), clock)
+        gemini, ollama = FakeEngine("gemini", clock), FakeEngine("ollama", clock)
+        gemini.error = CallCancelled("edited")
+        engine = RoutedEngine([("gemini", gemini), ("ollama", ollama)], router)
+        cancel = threading.Event()
+        cancel.set()
+
+        with call_context(cancel=cancel), pytest.raises(CallCancelled):
+            engine.ask("q")
+
+        assert ollama.calls == 0
+        assert router.health("gemini").state == CLOSED
+        assert router.health("gemini").error_rate == 0
+
+    def test_provider_timeout_is_a_failure_and_fails_over(self):
+        clock = FakeClock()
+        router = ProviderRouter(RoutingSettings(failure_threshold=1), clock)
+        gemini, ollama = FakeEngine("gemini", clock), FakeEngine("ollama", clock, latency=3.0)
+        gemini.error = DeadlineExceeded("Gemini request timed out")
+        engine = RoutedEngine([("gemini", gemini), ("ollama", ollama)], router)
+
+        assert [engine.ask("q") for _ in range(3)] == ["ollama"] * 3
+
+        assert gemini.calls == 1
+        assert router.health("gemini").state == OPEN
+        assert router.health("gemini").error_rate == 1
+
+    def test_provider_with_only_failures_ranks_last(self):
+        clock = FakeClock()
+        router = ProviderRouter(RoutingSettings(failure_threshold=5), clock)
+        gemini, ollama = FakeEngine("gemini", clock), FakeEngine("ollama", clock, latency=3.0)
+        engine = RoutedEngine([("gemini", gemini), ("ollama", ollama)], router)
+        router.health("gemini").record(False, 1.0)
+        router.health("ollama").record(True, 3.0)
+
+        assert [provider for provider, _ in engine.route()] == ["ollama", "gemini"]
+
+    def test_fast_model_failures_do_not_open_the_selected_model_circuit(self):
+        clock = FakeClock()
+        router = ProviderRouter(RoutingSettings(failure_threshold=1), clock)
+        pro = FakeEngine("pro", clock, model_name="gemini-2.5-pro")
+        flash = FakeEngine("flash", clock, model_name="gemini-2.5-flash")
+        selected = RoutedEngine([("gemini", pro), ("ollama", FakeEngine("ollama", clock))], router)
+        fast = RoutedEngine([("gemini", flash), ("ollama", FakeEngine("ollama", clock))], router)
+
+        flash.failing = True
+        assert fast.ask("q") == "ollama"
+
+        assert router.health("gemini", "gemini-2.5-flash").state == OPEN
+        assert router.health("gemini", "gemini-2.5-pro").state == CLOSED
+        assert selected.ask("q") == "pro"
+        assert "gemini/gemini-2.5-flash" in router.snapshot()
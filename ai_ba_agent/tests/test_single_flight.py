@@ -0,0 +1,117 @@
+"""Unit tests for coalescing identical in-flight LLM requests."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import List, Union
+
+import pytest
+
+from app.core.call_context import PROFILE_BATCH, PROFILE_INTERACTIVE, CallCancelled, call_context
+from app.core.governor import LLMQueueTimeout
+from app.core.llm_engine import LLMEngine
+from app.core.single_flight import SingleFlight, SingleFlightEngine
+
+
+class _BlockingEngine(LLMEngine):
+    """Numbers its answers; every call blocks until ``release`` is set."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def ask(self, prompt: str) -> str:
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if prompt.startswith("fail"):
+            raise RuntimeError("provider error")
+        return f"answer {self.calls}"
+
+
+def _run_concurrently(
+    engine: SingleFlightEngine, inner: _BlockingEngine, prompts: List[str]
+) -> List[Union[str, Exception, None]]:
+    results: List[Union[str, Exception, None]] = [None] * len(prompts)
+
+    def worker(index: int) -> None:
+        try:
+            results[index] = engine.ask(prompts[index])
+        except RuntimeError as exc:
+            results[index] = exc
+
+    first = threading.Thread(target=worker, args=(0,))
+    first.start()
+    inner.started.wait(5)
+    others = [threading.Thread(target=worker, args=(i,)) for i in range(1, len(prompts))]
+    for thread in others:
+        thread.start()
+    while engine.flight.snapshot()["calls"] < len(prompts):
+        time.sleep(0.001)
+    inner.release.set()
+    for thread in [first, *others]:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """Test that duplicates share one call and its outcome."""
+
+    def test_identical_prompts_share_one_call(self):
+        inner = _BlockingEngine()
+        engine = SingleFlightEngine(inner, "ollama", SingleFlight())
+        results = _run_concurrently(engine, inner, ["Опиши  процесс\n", "Опиши процесс", " Опиши процесс"])
+        assert results == ["answer 1"] * 3
+        assert inner.calls == 1
+        assert engine.flight.snapshot() == {"calls": 3, "coalesced": 2, "in_flight": 0}
+
+        # Completed calls are not cached
+        assert engine.ask("Опиши процесс") == "answer 2"
+
+    def test_error_is_shared_with_waiters(self):
+        inner = _BlockingEngine()
+        engine = SingleFlightEngine(inner, "ollama", SingleFlight())
+        results = _run_concurrently(engine, inner, ["fail", "fail"])
+        assert all(isinstance(item, RuntimeError) for item in results)
+        assert inner.calls == 1
+        with pytest.raises(RuntimeError):
+            engine.ask("fail")
+
+    @pytest.mark.parametrize("error", [CallCancelled("state edited"), LLMQueueTimeout("no capacity")])
+    def test_follower_retries_when_leader_gives_up(self, error):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        results = []
+
+        def cancelled_leader() -> str:
+            started.set()
+            release.wait(5)
+            raise error
+
+        def lead() -> None:
+            with pytest.raises(type(error)):
+                flight.do("k", cancelled_leader)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flight.do("k", lambda: "own answer")))
+        follower.start()
+        while flight.snapshot()["coalesced"] < 1:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+
+        assert results == ["own answer"]
+        assert flight.snapshot()["in_flight"] == 0
+
+    def test_priorities_are_not_coalesced(self):
+        engine = SingleFlightEngine(_BlockingEngine(), "ollama", SingleFlight())
+        with call_context(profile=PROFILE_BATCH):
+            batch = engine.request_key("Опиши процесс")
+        with call_context(profile=PROFILE_INTERACTIVE):
+            interactive = engine.request_key("Опиши процесс")
+        assert batch != interactive
@@ -0,0 +1,56 @@
+"""Unit tests for the versioned conversation state."""
+
+from __future__ import annotations
+
+from app.utils.state import FIELD_SEQUENCE, ConversationState
+
+
+class TestConversationState:
+    """Test incremental missing-field tracking and the cached context render."""
+
+    def test_missing_fields_tracked_incrementally(self):
+        """Updates and clears keep missing fields in FIELD_SEQUENCE order."""
+        state = ConversationState()
+        assert state.get_missing_fields() == FIELD_SEQUENCE
+
+        state.update_field("problem", "Долгая обработка заявок")
+        state.update_field("goal", "не указано")
+        assert "problem" not in state.get_missing_fields()
+        assert "goal" in state.get_missing_fields()
+        assert state.filled_count() == 1
+
+        state.clear_field("problem")
+        assert state.get_missing_fields() == FIELD_SEQUENCE
+
+        for name in FIELD_SEQUENCE:
+            state.update_field(name, f"Значение {name}")
+        assert state.is_complete()
+        assert state.progress_ratio() == 1.0
+
+        prefilled = ConversationState(answers={"goal": "Рост продаж", "kpi": "—"})
+        assert prefilled.filled_count() == 1
+
+    def test_version_keys_cached_context(self):
+        """Context is rendered once per version, versions never go back."""
+        state = ConversationState()
+        state.update_field("goal", "Рост продаж")
+        version = state.version
+        context = state.as_markdown_context()
+        fingerprint = state.context_fingerprint()
+
+        assert state.as_markdown_context() is context
+        assert state.version == version
+
+        state.update_field("kpi", "NPS +10")
+        assert state.version > version
+        assert "NPS +10" in state.as_markdown_context()
+        assert state.context_fingerprint() != fingerprint
+
+        other = ConversationState()
+        other.update_field("goal", "Рост продаж")
+        assert other.version != version
+        assert other.context_fingerprint() == fingerprint
+
+        state.reset()
+        assert state.version > version
+        assert not state.answers and state.filled_count() == 0
@@ -0,0 +1,63 @@
+"""Unit tests for task-aware model tiering."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List
+
+from app import config
+from app.config import TieringSettings
+from app.core.llm_engine import LLMEngine
+from app.core.tiering import TaskLatencyStats, TieredEngine
+
+
+@dataclass
+class _Engine(LLMEngine):
+    model_name: str
+    prompts: List[str] = field(default_factory=list)
+
+    def ask(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return "activity" if "тип" in prompt else prompt
+
+
+class TestTieredEngine:
+    """Test that tasks reach the configured tier and are timed."""
+
+    def test_classification_uses_fast_model_and_documents_selected(self):
+        pro, flash = _Engine("gemini-2.5-pro"), _Engine("gemini-2.5-flash")
+        stats = TaskLatencyStats()
+        engine = TieredEngine(pro, flash, TieringSettings(), stats)
+
+        engine.generate_plantuml("### Цель\nТест")
+        engine.generate_brd("### Цель\nТест")
+        engine.ask("общий вопрос")
+
+        assert len(flash.prompts) == 1
+        assert len(pro.prompts) == 3
+        report = stats.snapshot()
+        assert report["classification"]["gemini-2.5-flash"]["calls"] == 1
+        assert report["document"]["gemini-2.5-pro"]["calls"] == 2
+        assert report["general"]["gemini-2.5-pro"]["calls"] == 1
+
+    def test_disabled_tiering_keeps_selected_model(self):
+        pro, flash = _Engine("pro"), _Engine("flash")
+        engine = TieredEngine(pro, flash, TieringSettings(enabled=False), TaskLatencyStats())
+        engine.generate_plantuml("контекст")
+        assert flash.prompts == []
+
+
+class TestFastModelSetting:
+    """Test that AI_BA_FAST_MODEL targets the provider in use."""
+
+    def test_fast_model_applies_to_the_file_config_provider(self, monkeypatch):
+        monkeypatch.setenv("AI_BA_FAST_MODEL", "gemini-2.0-flash-lite")
+        monkeypatch.delenv("AI_BA_MODEL_PROVIDER", raising=False)
+        monkeypatch.setattr(config, "_load_model_config_from_disk", lambda: {"provider": "gemini"})
+        config.get_settings.cache_clear()
+        try:
+            fast_models = config.get_settings().tiering.fast_models
+        finally:
+            config.get_settings.cache_clear()
+
+        assert fast_models == {"gemini": "gemini-2.0-flash-lite"}
@@ -0,0 +1,72 @@
+"""Unit tests for adaptive timeouts and deadline propagation."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from app.config import ProviderLimits, TimeoutSettings
+from app.core.call_context import (
+    PROFILE_INTERACTIVE,
+    CallCancelled,
+    DeadlineExceeded,
+    call_context,
+    check_deadline,
+    deadline_after,
+    remaining_time,
+)
+from app.core.governor import LLMQueueTimeout, ProviderGovernor
+from app.core.timeouts import AdaptiveTimeouts
+
+
+class TestAdaptiveTimeouts:
+    """Test the timeout estimate and its clamps."""
+
+    def test_timeout_follows_observed_speed(self):
+        timeouts = AdaptiveTimeouts(TimeoutSettings())
+        assert timeouts.timeout_for("ollama", "qwen", "document", 512) == 120.0
+        timeouts.observe("ollama", "qwen", 100, 10.0)
+        # 5s overhead + 512 tokens / 10 tok/s * 2
+        assert timeouts.timeout_for("ollama", "qwen", "document", 512) == pytest.approx(107.4)
+        assert timeouts.timeout_for("ollama", "qwen", PROFILE_INTERACTIVE, 512) == 60.0
+        timeouts.observe("gemini", "gemini-2.5-flash", 1000, 1.0)
+        assert timeouts.timeout_for("gemini", "gemini-2.5-flash", "document", 512) == 10.0
+
+    def test_speed_is_per_model_and_long_prompts_get_longer(self):
+        timeouts = AdaptiveTimeouts(TimeoutSettings())
+        timeouts.observe("gemini", "gemini-2.5-flash", 1000, 1.0)
+        assert timeouts.timeout_for("gemini", "gemini-2.5-pro", "document", 512) == 120.0
+
+        timeouts.observe("ollama", "qwen", 100, 5.0, prompt_tokens=1000, prefill_seconds=2.0)
+        short = timeouts.timeout_for("ollama", "qwen", "document", 100)
+        # 4000 prompt tokens at 500 tok/s add 8s, doubled by the safety factor
+        assert timeouts.timeout_for("ollama", "qwen", "document", 100, prompt_tokens=4000) == pytest.approx(short + 16)
+
+
+class TestDeadlines:
+    """Test nesting, cancellation and fail-fast queueing."""
+
+    def test_inner_deadline_never_extends_outer(self):
+        with deadline_after(1.0):
+            with deadline_after(100.0):
+                remaining = remaining_time()
+                assert remaining is not None and remaining <= 1.0
+        assert remaining_time() is None
+
+    def test_expired_or_cancelled_call_fails_fast(self):
+        with deadline_after(-1.0):
+            with pytest.raises(DeadlineExceeded):
+                check_deadline()
+        cancel = threading.Event()
+        cancel.set()
+        with call_context(cancel=cancel):
+            with pytest.raises(CallCancelled):
+                check_deadline()
+        governor = ProviderGovernor("ollama", ProviderLimits(max_in_flight=1))
+        with governor.slot(1, timeout=1):
+            with pytest.raises(CallCancelled):
+                governor.acquire(1, timeout=5, cancel=cancel)
+            with pytest.raises(LLMQueueTimeout):
+                governor.acquire(1, timeout=0.05)
+        assert governor.snapshot()["queue_depth"] == 0
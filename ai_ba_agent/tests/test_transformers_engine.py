@@ -0,0 +1,161 @@
+"""Unit tests for TransformersEngine decoding and stats with a fake model."""
+
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+import pytest
+
+from app.core import llm_engine
+from app.core.kv_cache import PrefixKVCache
+from app.core.llm_engine import MIN_PREFIX_TOKENS, TransformersEngine, _generate
+from app.core.prompt_builder import Prompt
+
+torch = pytest.importorskip("torch")
+
+PAD = 0
+
+
+class _Encoding(dict):
+    def to(self, device: Any) -> "_Encoding":
+        return self
+
+    @property
+    def input_ids(self) -> Any:
+        return self["input_ids"]
+
+
+class _Tokenizer:
+    """One token per character, ids are code points; pads on the left like decoder-only models."""
+
+    pad_token_id = PAD
+    eos_token_id = PAD
+
+    def __call__(self, text, return_tensors="pt", padding=False, add_special_tokens=True) -> _Encoding:
+        texts = [text] if isinstance(text, str) else list(text)
+        width = max(len(item) for item in texts)
+        ids = [[PAD] * (width - len(item)) + [ord(char) for char in item] for item in texts]
+        mask = [[0] * (width - len(item)) + [1] * len(item) for item in texts]
+        return _Encoding(input_ids=torch.tensor(ids), attention_mask=torch.tensor(mask))
+
+    def batch_decode(self, ids, skip_special_tokens=True) -> List[str]:
+        return ["".join(chr(int(token)) for token in row if int(token) != PAD) for row in ids]
+
+
+def _kv(tokens: int) -> Any:
+    """Legacy KV cache of one layer holding ``tokens`` positions."""
+    return [(torch.zeros(1, 1, tokens, 1), torch.zeros(1, 1, tokens, 1))]
+
+
+class _Model:
+    """Appends one reply per row to the prompt ids, like ``generate`` does.
+
+    ``prefilled`` records how many tokens each forward pass had to process,
+    ``past_lengths`` the cached positions ``generate`` started from.
+    """
+
+    device = "cpu"
+
+    def __init__(self, replies: List[str], forward_seconds: float = 0.0):
+        self.replies = replies
+        self.forward_seconds = forward_seconds
+        self.prefilled: List[int] = []
+        self.past_lengths: List[int] = []
+
+    def __call__(self, input_ids, use_cache=True) -> Any:
+        time.sleep(self.forward_seconds)
+        self.prefilled.append(input_ids.shape[-1])
+        return SimpleNamespace(past_key_values=_kv(input_ids.shape[-1]))
+
+    def generate(self, input_ids, attention_mask, streamer, past_key_values=None, **kwargs):
+        past = 0 if past_key_values is None else past_key_values[0][0].shape[-2]
+        self.past_lengths.append(past)
+        self.prefilled.append(input_ids.shape[-1] - past)
+        streamer.put(input_ids)
+        width = max(len(reply) for reply in self.replies)
+        new = torch.tensor(
+            [[ord(char) for char in reply] + [PAD] * (width - len(reply)) for reply in self.replies]
+        )
+        for step in range(width):
+            streamer.put(new[:, step])
+        if past_key_values is not None:
+            # DynamicCache grows in place during generation
+            past_key_values[0] = _kv(input_ids.shape[-1] + width)[0]
+        return torch.cat([input_ids, new], dim=-1)
+
+
+@pytest.fixture
+def make_engine(monkeypatch):
+    def make(model: _Model, prefix_cache: Optional[PrefixKVCache] = None) -> TransformersEngine:
+        monkeypatch.setattr(llm_engine, "_load_transformers_model", lambda: (_Tokenizer(), model))
+        monkeypatch.setattr(llm_engine, "_shared_prefix_cache", lambda: prefix_cache)
+        engine = TransformersEngine()
+        engine.server = None
+        return engine
+
+    return make
+
+
+class TestGenerateDecoding:
+    """Test that only new tokens are decoded and counted."""
+
+    def test_completion_does_not_echo_the_prompt(self, make_engine):
+        engine = make_engine(_Model(["xyz"]))
+
+        completion, stats = engine.ask_with_stats("abcd")
+
+        assert completion == "xyz"
+        assert stats.prompt_tokens == 4
+        assert stats.completion_tokens == 3
+        assert stats.prefill_seconds >= 0 and stats.decode_seconds >= 0
+        assert engine.last_stats is stats
+
+    def test_left_padded_batch_counts_tokens_per_row(self):
+        tokenizer = _Tokenizer()
+        inputs = tokenizer(["a", "abc"], padding=True)
+
+        completions, stats = _generate(
+            _Model(["xy", "z"]), tokenizer, inputs["input_ids"], inputs["attention_mask"], {}
+        )
+
+        assert completions == ["xy", "z"]
+        assert [row.prompt_tokens for row in stats] == [1, 3]
+        assert [row.completion_tokens for row in stats] == [2, 1]
+
+
+class TestPrefixReuse:
+    """Test that the prefix KV state is computed once and forked per call."""
+
+    def test_miss_prefills_the_prefix_and_hit_only_the_suffix(self, make_engine):
+        model = _Model(["ok"], forward_seconds=0.05)
+        cache = PrefixKVCache(10**6)
+        engine = make_engine(model, cache)
+        prefix = "p" * MIN_PREFIX_TOKENS
+
+        completion, miss = engine.ask_with_stats(Prompt(prefix, "abc"))
+        assert completion == "ok"
+        assert model.prefilled == [MIN_PREFIX_TOKENS, 3]
+        assert miss.prefill_tokens_saved == 0
+        assert miss.prompt_tokens == MIN_PREFIX_TOKENS + 3
+        # The separate prefix pass counts as prefill
+        assert miss.prefill_seconds >= 0.05
+
+        completion, hit = engine.ask_with_stats(Prompt(prefix, "de"))
+        assert completion == "ok"
+        assert model.prefilled[2:] == [2]
+        assert hit.prefill_tokens_saved == MIN_PREFIX_TOKENS
+        # Each call starts from a copy; the first generation did not grow the cached state
+        assert model.past_lengths == [MIN_PREFIX_TOKENS, MIN_PREFIX_TOKENS]
+        assert cache.hits == 1
+
+    def test_short_prefix_is_not_cached(self, make_engine):
+        model = _Model(["ok"])
+        cache = PrefixKVCache(10**6)
+        engine = make_engine(model, cache)
+
+        assert engine.ask_prompt(Prompt("short", "abc")) == "ok"
+
+        assert model.past_lengths == [0]
+        assert len(cache) == 0